@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import asyncio
 
-from services.mistral_service import MistralService
+from ..services.mistral_service import MistralService
+from .dependencies import get_mistral_service
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -24,8 +25,8 @@ class QueryRequest(BaseModel):
 class ChatResponse(BaseModel):
     message: str
 
-def get_chatbot() -> MistralService:
-    return MistralService()
+def get_chatbot(request: Request) -> MistralService:
+    return get_mistral_service(request)
 
 @router.post("/complete", response_model = ChatResponse)
 async def chat_complete(
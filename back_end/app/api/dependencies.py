@@ -0,0 +1,21 @@
+from typing import Optional
+
+from fastapi import Request
+
+from ..services.answer_cache import AnswerCache
+from ..services.mistral_service import MistralService
+from ..services.service_registry import ServiceRegistry
+from ..services.vector_service import VectorService
+
+
+def get_registry(request: Request) -> ServiceRegistry:
+    return request.app.state.registry
+
+def get_vector_service(request: Request) -> VectorService:
+    return get_registry(request).get_vector_service()
+
+def get_mistral_service(request: Request) -> MistralService:
+    return get_registry(request).get_mistral_service()
+
+def get_answer_cache(request: Request) -> Optional[AnswerCache]:
+    return get_registry(request).get_answer_cache()
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import List, Dict, Any, Literal, Optional, Tuple
 from pydantic import BaseModel
 import asyncio
+import inspect
+import json
 import os
+import uuid
 
-from services.vector_service import VectorService
+from ..services.search_filters import build_where
+from ..services.vector_service import VectorService
+from .dependencies import get_registry
 
 class DocumentInput(BaseModel):
     text: str
@@ -12,9 +17,19 @@ class DocumentInput(BaseModel):
 class DocumentsInput(BaseModel):
     texts: List[str]
 
-class SearchInput(BaseModel):
+class SearchQuery(BaseModel):
     query: str
     n_results: Optional[int] = 10
+    path_prefix: Optional[str] = None
+    language: Optional[str] = None
+    doc_type: Optional[str] = None
+
+class SearchInput(SearchQuery):
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+
+class BatchSearchInput(BaseModel):
+    queries: List[SearchQuery]
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
 
 class DocumentOutput(BaseModel):
     id: str
@@ -23,17 +38,29 @@ class DocumentOutput(BaseModel):
 class SearchResult(BaseModel):
     id: str
     text: str
-    score: float
+    distance: Optional[float] = None
+    score: Optional[float] = None
+    metadata: Dict[str, Any] = {}
 
 class SearchResponse(BaseModel):
     query: str
-    results: List[SearchResult]
+    result: List[SearchResult]
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
 
 
 router = APIRouter(prefix="/vector", tags=["Vector Database"])
 
-def get_db() -> VectorService:
-    return VectorService(collection_name="documents")
+# Nombre d'enregistrements NDJSON traités (encodés puis écrits) à la fois
+STREAM_WINDOW_SIZE = 256
+# Taille maximale d'une ligne NDJSON (borne la mémoire du tampon de lecture)
+STREAM_MAX_LINE_BYTES = 1024 * 1024
+
+def get_db(request: Request) -> VectorService:
+    return get_registry(request).get_vector_service(
+        collection_name="documents", persist_directory="data/doc"
+    )
 
 
 @router.post("/documents", response_model= Dict[str, str])
@@ -41,34 +68,196 @@ async def add_document(document: DocumentInput, db: VectorService = Depends(get_
     doc_id = await db.add(document.text)
     return {"id": doc_id}
 
-@router.post("/documents/batch", response_model= Dict[str, str])
+@router.post("/documents/batch", response_model= Dict[str, Any])
 async def add_documents(documents: DocumentsInput, db: VectorService = Depends(get_db)):
-    for document in documents.texts:
-        await db.add(document)
-    return {"status": "success"}
+    if not documents.texts:
+        return {"status": "success", "ids": []}
+    # Un encode_batch (découpé en sous-batches) et une seule écriture ChromaDB
+    doc_ids = await db.add_batch(documents.texts)
+    return {"status": "success", "ids": doc_ids}
+
+
+class _NDJSONLines:
+    """
+    Découpe un flux d'octets en lignes NDJSON numérotées.
+
+    Le tampon est borné : une ligne plus longue que `max_line_bytes` est
+    abandonnée (signalée par None) au lieu de croître sans limite.
+    """
+
+    def __init__(self, max_line_bytes: int):
+        self.max_line_bytes = max_line_bytes
+        self.buffer = b""
+        self.line_number = 0
+        self.skipping = False
+
+    def _emit(self, line: bytes) -> List[Tuple[int, Optional[bytes]]]:
+        self.line_number += 1
+        if self.skipping or len(line) > self.max_line_bytes:
+            self.skipping = False
+            return [(self.line_number, None)]
+        if line.strip():
+            return [(self.line_number, line)]
+        return []
+
+    def feed(self, data: bytes) -> List[Tuple[int, Optional[bytes]]]:
+        lines = []
+        *complete, self.buffer = (self.buffer + data).split(b"\n")
+        for line in complete:
+            lines.extend(self._emit(line))
+        if len(self.buffer) > self.max_line_bytes:
+            self.buffer = b""
+            self.skipping = True
+        return lines
+
+    def close(self) -> List[Tuple[int, Optional[bytes]]]:
+        if self.buffer.strip() or self.skipping:
+            return self._emit(self.buffer)
+        return []
+
+
+def _parse_record(raw: Optional[bytes], window_ids: set) -> Dict[str, Any]:
+    if raw is None:
+        raise ValueError(f"line longer than {STREAM_MAX_LINE_BYTES} bytes")
+    record = json.loads(raw)
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        raise ValueError("expected an object with a 'text' string")
+    doc_id = record.get("id")
+    if doc_id is None:
+        return {"text": record["text"], "id": str(uuid.uuid4())}
+    if not isinstance(doc_id, str) or not doc_id:
+        raise ValueError("'id' must be a non-empty string")
+    if doc_id in window_ids:
+        raise ValueError(f"duplicate id '{doc_id}' in the same window")
+    return {"text": record["text"], "id": doc_id}
+
+
+async def _commit_window(db: VectorService, window: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    texts = [record["text"] for _, record in window]
+    doc_ids = [record["id"] for _, record in window]
+    try:
+        await db.upsert_batch(texts, doc_ids)
+    except Exception as e:
+        return [{"line": line, "error": str(e)} for line, _ in window]
+    return [{"line": line, "id": record["id"]} for line, record in window]
+
+
+def _resolve_db(request: Request) -> VectorService:
+    provider = request.app.dependency_overrides.get(get_db, get_db)
+    if inspect.signature(provider).parameters:
+        return provider(request)
+    return provider()
+
+
+async def stream_documents(scope, receive, send):
+    """
+    Ingestion NDJSON : une ligne `{"text": ..., "id": optionnel}` par document.
+
+    Les enregistrements sont traités par fenêtres de taille bornée et la réponse
+    (NDJSON) renvoie l'ID de chaque ligne dès que sa fenêtre est écrite.
+
+    Handler ASGI brut : lecture du corps et écriture de la réponse sont
+    entrelacées dans une seule coroutine, propriétaire de `receive`. Une
+    StreamingResponse lirait le corps en concurrence avec l'écoute de la
+    déconnexion (spec ASGI < 2.4) et bloquerait.
+    """
+    db = _resolve_db(Request(scope, receive))
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson")],
+    })
+
+    async def emit(outputs: List[Dict[str, Any]]):
+        if outputs:
+            body = "".join(json.dumps(output) + "\n" for output in outputs)
+            await send({"type": "http.response.body", "body": body.encode("utf-8"), "more_body": True})
+
+    lines = _NDJSONLines(STREAM_MAX_LINE_BYTES)
+    window: List[Tuple[int, Dict[str, Any]]] = []
+    window_ids: set = set()
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        more_body = message.get("more_body", False)
+        parsed = lines.feed(message.get("body", b""))
+        if not more_body:
+            parsed.extend(lines.close())
+
+        errors = []
+        for line_number, raw in parsed:
+            try:
+                record = _parse_record(raw, window_ids)
+            except ValueError as e:
+                errors.append({"line": line_number, "error": str(e)})
+                continue
+            window.append((line_number, record))
+            window_ids.add(record["id"])
+            if len(window) >= STREAM_WINDOW_SIZE:
+                await emit(errors)
+                errors = []
+                await emit(await _commit_window(db, window))
+                window = []
+                window_ids = set()
+        await emit(errors)
+
+    if window:
+        await emit(await _commit_window(db, window))
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class _RawASGIEndpoint:
+    """Indique à Starlette un handler ASGI brut plutôt qu'une fonction Request -> Response."""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send):
+        await self.handler(scope, receive, send)
+
+
+router.add_route(
+    router.prefix + "/documents/stream",
+    _RawASGIEndpoint(stream_documents),
+    methods=["POST"],
+)
 
 @router.post("/search", response_model= SearchResponse)
 async def search(search: SearchInput, db: VectorService = Depends(get_db)):
-    results = await db.search(search.query, search.n_results)
+    where = build_where(search.path_prefix, search.language, search.doc_type)
+    results = await db.search(search.query, search.n_results, where=where, mode=search.mode)
     return results
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(search: BatchSearchInput, db: VectorService = Depends(get_db)):
+    # Un seul encode_batch et une requête multi-vecteurs par filtre distinct
+    results = await db.search_many(
+        [item.query for item in search.queries],
+        [item.n_results for item in search.queries],
+        [build_where(item.path_prefix, item.language, item.doc_type) for item in search.queries],
+        mode=search.mode,
+    )
+    return {"results": results}
+
 @router.get('/documents/{doc_id}', response_model=DocumentOutput)
-def get_document(doc_id:str, db:VectorService = Depends(get_db)):
-    document = db.get_document(doc_id)
+async def get_document(doc_id:str, db:VectorService = Depends(get_db)):
+    document = await db.get_document(doc_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     return document
 
 @router.delete('/documents/{doc_id}', response_model= Dict[str, bool])
-def delete_document(doc_id:str, db:VectorService = Depends(get_db)):
-    success = db.delete_document(doc_id)
+async def delete_document(doc_id:str, db:VectorService = Depends(get_db)):
+    success = await db.delete_document(doc_id)
     if not success:
         raise HTTPException(status_code=404, detail="Document not found")
     return {"success": success}
 
 @router.put("/documents/{doc_id}", response_model= Dict[str, bool])
-def update_document(doc_id: str, document: DocumentInput, db: VectorService = Depends(get_db)):
-    success = db.update_document(doc_id, document.text)
+async def update_document(doc_id: str, document: DocumentInput, db: VectorService = Depends(get_db)):
+    success = await db.update_document(doc_id, document.text)
     if not success:
         raise HTTPException(status_code=404, detail="Document not found")
     return {"success": success}
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import json
+
+from app.services.retrieval_benchmark import (
+    HashingEncoder,
+    StoredEncoder,
+    default_configs,
+    format_report,
+    run_benchmark,
+)
+
+
+def int_list(value: str):
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare rappel et latence de configurations d'index, hors ligne")
+    parser.add_argument("--data-dir", default="data/scraping", help="Corpus markdown")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de résultats évalués")
+    parser.add_argument("--max-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ef-search", type=int_list, default=[10, 50, 200], help="ex: 10,50,200")
+    parser.add_argument("--m", type=int_list, default=[16, 32], help="Voisins HNSW (M), ex: 16,32")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[500, 1000, 2000], help="ex: 500,1000")
+    parser.add_argument(
+        "--embeddings", choices=["hashing", "stored"], default="hashing",
+        help="Embeddings déterministes ou lus dans le cache d'embeddings",
+    )
+    parser.add_argument("--output", metavar="PATH", help="Écrit le rapport en JSON")
+    args = parser.parse_args()
+
+    encoder = StoredEncoder() if args.embeddings == "stored" else HashingEncoder()
+    results = asyncio.run(run_benchmark(
+        args.data_dir,
+        default_configs(args.ef_search, args.m, args.chunk_sizes),
+        encoder=encoder,
+        k=args.k,
+        max_queries=args.max_queries,
+        seed=args.seed,
+    ))
+    print(format_report(results, args.k))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"config": result.config.__dict__, "metrics": result.metrics} for result in results],
+                f, indent=2,
+            )
@@ -1,15 +1,85 @@
-
-
+import argparse
 import asyncio
 import sys
 import os
 from pathlib import Path
 
-from app.services.document_indexer import DocumentIndexingService
+from app.services.document_indexer import DocumentIndexingService, build_generation
+from app.services.index_watcher import IndexWatcher
+from app.services.indexing_telemetry import MetricsServer
 
 
 if __name__ == "__main__":
-    indexer = DocumentIndexingService()
-    asyncio.run(indexer.index_all_documents(force_reindex=False))
+    parser = argparse.ArgumentParser(description="Indexe la documentation dans la base vectorielle")
+    parser.add_argument("--force", action="store_true", help="Réindexe tous les fichiers")
+    parser.add_argument("--compact", action="store_true", help="Supprime les vecteurs orphelins et réconcilie le journal")
+    parser.add_argument("--resume", action="store_true", help="Reprend la dernière indexation interrompue")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit l'index dans une nouvelle génération, la valide puis la publie")
+    parser.add_argument("--smoke-query", help="Requête de validation de --rebuild (défaut : texte d'un chunk indexé)")
+    parser.add_argument("--min-ratio", type=float, default=0.5, help="Part minimale des chunks de la génération précédente (--rebuild)")
+    parser.add_argument("--grace", type=float, default=600.0, help="Secondes avant suppression des générations retirées (--rebuild)")
+    parser.add_argument("--watch", action="store_true", help="Surveille data/scraping et réindexe les fichiers modifiés en continu")
+    parser.add_argument("--debounce", type=float, default=2.0, help="Secondes de calme avant d'indexer un lot (--watch)")
+    parser.add_argument("--poll-interval", type=float, help="Force le polling avec cette période en secondes (--watch)")
+    parser.add_argument("--shard", help="Ne (ré)indexe que ce shard (VECTOR_SHARDING)")
+    parser.add_argument("--export-snapshot", metavar="PATH", help="Exporte l'index dans un snapshot")
+    parser.add_argument("--load-snapshot", metavar="PATH", help="Charge l'index depuis un snapshot")
+    parser.add_argument("--float16", action="store_true", help="Embeddings du snapshot en float16")
+    parser.add_argument("--chunk-workers", type=int, help="Processus de découpage (0 : aucun pool)")
+    parser.add_argument("--embed-batch-size", type=int, default=128, help="Chunks par appel d'embeddings")
+    parser.add_argument("--embed-concurrency", type=int, default=4, help="Appels d'embeddings simultanés")
+    parser.add_argument("--metrics-port", type=int, help="Expose les métriques Prometheus de l'exécution en cours sur ce port")
+    parser.add_argument("--queue-size", type=int, default=32, help="Capacité des files du pipeline")
+    args = parser.parse_args()
 
+    pipeline_options = dict(
+        chunk_workers=args.chunk_workers,
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        queue_size=args.queue_size,
+    )
+    if args.rebuild:
+        # L'index actif n'est pas ouvert : l'API continue de le servir
+        result = asyncio.run(build_generation(
+            smoke_query=args.smoke_query,
+            min_ratio=args.min_ratio,
+            grace_seconds=args.grace,
+            **pipeline_options,
+        ))
+        print(f"Génération publiée : {result['generation']} ({result['validation']})")
+        sys.exit(0)
 
+    indexer = DocumentIndexingService(**pipeline_options)
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(lambda: indexer.telemetry, port=args.metrics_port)
+        print(f"Métriques Prometheus sur http://localhost:{metrics_server.port}/metrics")
+    try:
+        if args.watch:
+            watcher = IndexWatcher(
+                indexer,
+                debounce=args.debounce,
+                poll_interval=args.poll_interval or 1.0,
+                force_polling=args.poll_interval is not None,
+            )
+            try:
+                asyncio.run(watcher.run())
+            except KeyboardInterrupt:
+                print("Surveillance arrêtée.")
+        elif args.compact:
+            asyncio.run(indexer.compact())
+        elif args.load_snapshot:
+            asyncio.run(indexer.load_snapshot(args.load_snapshot))
+        elif args.export_snapshot:
+            summary = asyncio.run(indexer.export_snapshot(
+                args.export_snapshot, dtype="float16" if args.float16 else "float32"
+            ))
+            print(f"Snapshot écrit : {summary}")
+        else:
+            asyncio.run(indexer.index_all_documents(
+                force_reindex=args.force, shard=args.shard, resume=args.resume
+            ))
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        indexer.close()
@@ -1,14 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+import os
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 
 
-from .services.mistral_service import MistralService
-from .services.vector_service import VectorService, Encoder
+from .api.dependencies import get_answer_cache, get_mistral_service, get_vector_service
+from .services.answer_cache import AnswerCache
+from .services.mistral_service import ERROR_PREFIX, MistralService
+from .services.vector_service import VectorService
+from .services.context_builder import ContextBuilder
 from .services.message_builder import MessageBuilder
-
-app = FastAPI(title="Documentation Assistant API")
+from .services.search_filters import build_where
+from .services.service_registry import ServiceRegistry
+from .services.startup import StartupState, warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services créés une fois par processus, fermés à l'arrêt
+    state = StartupState()
+    app.state.startup = state
+    with state.phase("registry"):
+        registry = ServiceRegistry()
+    app.state.registry = registry
+    # Préchauffage en tâche de fond : uvicorn accepte les connexions sans attendre
+    warmup_task = asyncio.create_task(
+        warm_up(registry, state, warmup_query=os.getenv("WARMUP_QUERY") or None)
+    )
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+        await registry.aclose()
+
+app = FastAPI(title="Documentation Assistant API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,28 +60,71 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
-mistral_service = MistralService()
-vector_service = VectorService(collection_name = "mistral_docs", 
-                               persist_directory="data/mistral_doc")
 message_builder = MessageBuilder()
-persist_directory = "data/doc"
+# Sélection MMR et fusion des chunks voisins avant le prompt
+context_builder = ContextBuilder(
+    max_chars=int(os.getenv("CONTEXT_MAX_CHARS", "6000")),
+    mmr_lambda=float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7")),
+)
 
 @app.get("/")
 def read_root():
     return {"status": "API is running"}
 
+@app.get("/healthz")
+def healthz():
+    # Vivacité : le processus répond, même pendant le préchauffage
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz(request: Request):
+    # Préparation : index ouvert et chargé en mémoire
+    state = getattr(request.app.state, "startup", None)
+    if state is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return JSONResponse(status_code=200 if state.ready else 503, content=state.to_dict())
+
 @app.get("/api/search")
-async def search(query: str, n_results: int = 5):
-    results = await vector_service.search(query, n_results)
+async def search(
+    query: str,
+    n_results: int = 5,
+    path_prefix: Optional[str] = None,
+    language: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None,
+    vector_service: VectorService = Depends(get_vector_service),
+):
+    where = build_where(path_prefix, language, doc_type)
+    results = await vector_service.search(query, n_results, where=where, mode=mode)
     return results 
 
 @app.post("/api/chat", response_model = ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(
+    request: ChatRequest,
+    vector_service: VectorService = Depends(get_vector_service),
+    mistral_service: MistralService = Depends(get_mistral_service),
+    answer_cache: Optional[AnswerCache] = Depends(get_answer_cache),
+):
     history_and_query = request.messages
     query = history_and_query[-1].content
     history = history_and_query[:-1]
 
-    retrieving_results = await search(query, n_results=5) if request.useRag else {"result": []}
+    # La génération est lue avant la recherche, comme pour le cache de résultats
+    generation = vector_service.generation.current()
+    retrieving_results = (
+        await vector_service.retrieve_context(query, n_results=5, builder=context_builder)
+        if request.useRag else {"result": []}
+    )
+
+    # Cache sémantique : seulement pour une question autonome avec RAG
+    use_answer_cache = answer_cache is not None and request.useRag and not history
+    if use_answer_cache:
+        # Embedding déjà calculé par la recherche : servi par le cache d'embeddings
+        query_embedding = (await vector_service.query_encoder.encode(query))[0]
+        chunk_ids = [chunk_id for block in retrieving_results["result"] for chunk_id in block["ids"]]
+        cached_answer = answer_cache.lookup(query_embedding, chunk_ids, generation)
+        if cached_answer is not None:
+            return {"response": cached_answer}
     
     message_builder.set_rag(request.useRag)
     
@@ -59,12 +133,19 @@ async def chat_endpoint(request: ChatRequest):
         message_builder.build_user_message(query, retrieving_results, history)
     ]
     response = await mistral_service.generate_response(messages)
+    if use_answer_cache and not response.startswith(ERROR_PREFIX):
+        answer_cache.store(query_embedding, chunk_ids, generation, response)
     return {"response": response}
 
 
 @app.post("/api/chat/complete", response_model=ChatResponse)
-async def chat_complete(request: ChatRequest):
-    return await chat_endpoint(request)
+async def chat_complete(
+    request: ChatRequest,
+    vector_service: VectorService = Depends(get_vector_service),
+    mistral_service: MistralService = Depends(get_mistral_service),
+    answer_cache: Optional[AnswerCache] = Depends(get_answer_cache),
+):
+    return await chat_endpoint(request, vector_service, mistral_service, answer_cache)
 
 
 def main():
@@ -0,0 +1,158 @@
+"""
+Cache sémantique des réponses du chat (optionnel).
+
+La génération par `MistralService` est l'étape la plus lente et la plus
+coûteuse de `/api/chat`. Une question autonome (sans historique) très
+proche d'une question déjà traitée, et qui récupère exactement les mêmes
+chunks, reçoit la réponse déjà générée.
+
+Une entrée conserve (embedding de la question, IDs des chunks, réponse,
+génération d'index). Elle n'est servie que si :
+    - la similarité cosinus avec la nouvelle question atteint le seuil ;
+    - l'ensemble des chunks récupérés est identique ;
+    - la génération d'index n'a pas changé depuis son enregistrement.
+
+Les distances des plus proches voisins en cas d'échec (« near-misses »)
+sont conservées pour aider à régler le seuil.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Cache en mémoire des réponses, interrogé par similarité d'embedding.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        near_miss_window: int = 1000,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_key = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.chunk_mismatches = 0
+        self.invalidations = 0
+        self._hit_distances: deque = deque(maxlen=near_miss_window)
+        self._near_miss_distances: deque = deque(maxlen=near_miss_window)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self, generation: int):
+        # Toutes les entrées proviennent de la même collection : un changement
+        # de génération les rend toutes périmées
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def lookup(
+        self, embedding: List[float], chunk_ids: List[str], generation: int
+    ) -> Optional[str]:
+        """
+        Cherche une réponse pour une question autonome.
+
+        Returns:
+            La réponse en cache, ou None
+        """
+        query = self._normalize(embedding)
+        chunk_set: FrozenSet[str] = frozenset(chunk_ids)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            for key in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+                del self._entries[key]
+
+            nearest = None
+            best_key, best_similarity, mismatch = None, 0.0, False
+            for key, entry in self._entries.items():
+                similarity = float(query @ entry["embedding"])
+                nearest = similarity if nearest is None else max(nearest, similarity)
+                if similarity < self.threshold:
+                    continue
+                if entry["chunk_ids"] != chunk_set:
+                    mismatch = True
+                elif best_key is None or similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is not None:
+                self.hits += 1
+                self._hit_distances.append(1.0 - best_similarity)
+                self._entries.move_to_end(best_key)
+                return self._entries[best_key]["answer"]
+
+            self.misses += 1
+            if mismatch:
+                self.chunk_mismatches += 1
+            if nearest is not None:
+                self._near_miss_distances.append(1.0 - nearest)
+            return None
+
+    def store(
+        self, embedding: List[float], chunk_ids: List[str], generation: int, answer: str
+    ):
+        """Enregistre une réponse générée pour une question autonome."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[self._next_key] = {
+                "embedding": self._normalize(embedding),
+                "chunk_ids": frozenset(chunk_ids),
+                "answer": answer,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache (ex: bascule sur une autre génération d'index)."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    @staticmethod
+    def _percentiles(values) -> Dict[str, float]:
+        if not values:
+            return {}
+        p10, p50, p90 = np.percentile(np.asarray(values), [10, 50, 90])
+        return {"p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+    def stats(self) -> Dict[str, object]:
+        """Compteurs et distances cosinus (hits et near-misses) pour régler le seuil."""
+        total = self.hits + self.misses
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "chunk_mismatches": self.chunk_mismatches,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+                "threshold": self.threshold,
+                "hit_distance": self._percentiles(self._hit_distances),
+                "near_miss_distance": self._percentiles(self._near_miss_distances),
+            }
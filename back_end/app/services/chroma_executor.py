@@ -0,0 +1,126 @@
+"""
+Exécution des appels ChromaDB hors de la boucle asyncio.
+
+L'API de ChromaDB est synchrone : un appel `collection.query` lent ou une
+insertion volumineuse bloquerait toutes les requêtes en cours du worker.
+Les opérations passent donc par un pool de threads dédié et borné, avec un
+timeout par opération et une mesure du temps d'attente dans la file.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+# Seules les lectures ont un timeout par défaut : un thread ne peut pas être
+# interrompu, une écriture « expirée » serait quand même appliquée et un
+# client qui la rejoue créerait des doublons.
+DEFAULT_TIMEOUTS: Dict[str, Optional[float]] = {
+    "query": 10.0,
+    "get": 10.0,
+    "add": None,
+    "upsert": None,
+    "update": None,
+    "delete": None,
+    "lexical_query": 10.0,
+    "lexical_write": None,
+}
+
+
+class ChromaExecutor:
+    """
+    Façade asynchrone au-dessus d'un pool de threads borné.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        default_timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, Optional[float]]] = None,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="chroma"
+        )
+        self.default_timeout = default_timeout
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    async def run(
+        self,
+        operation: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Exécute `fn` dans le pool et attend son résultat.
+
+        Args:
+            operation: Nom de l'opération (sert aux timeouts et aux métriques)
+            fn: Appel ChromaDB synchrone
+            timeout: Timeout spécifique, sinon celui de l'opération (None : aucun)
+
+        Raises:
+            TimeoutError: si l'opération dépasse son timeout. Le thread ne peut
+                pas être interrompu, mais la requête cesse de l'attendre.
+        """
+        if timeout is None:
+            timeout = self.timeouts.get(operation, self.default_timeout)
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(operation, started - submitted, time.perf_counter() - started)
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, task)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._record_timeout(operation)
+            raise TimeoutError(
+                f"Chroma operation '{operation}' timed out after {timeout}s"
+            )
+
+    def _entry(self, operation: str) -> Dict[str, float]:
+        return self._stats.setdefault(operation, {
+            "count": 0,
+            "timeouts": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "run_time_total": 0.0,
+        })
+
+    def _record(self, operation: str, queue_wait: float, run_time: float):
+        with self._lock:
+            entry = self._entry(operation)
+            entry["count"] += 1
+            entry["queue_wait_total"] += queue_wait
+            entry["queue_wait_max"] = max(entry["queue_wait_max"], queue_wait)
+            entry["run_time_total"] += run_time
+
+    def _record_timeout(self, operation: str):
+        with self._lock:
+            self._entry(operation)["timeouts"] += 1
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Métriques par opération, dont le temps moyen d'attente dans la file."""
+        with self._lock:
+            metrics = {}
+            for operation, entry in self._stats.items():
+                count = entry["count"] or 1
+                metrics[operation] = {
+                    **entry,
+                    "queue_wait_avg": entry["queue_wait_total"] / count,
+                    "run_time_avg": entry["run_time_total"] / count,
+                }
+            return metrics
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,245 @@
+"""
+Post-traitement des résultats de recherche avant la construction du prompt.
+
+Les chunks de `MarkdownChunker` se chevauchent (200 caractères) et une
+recherche top-k renvoie souvent des chunks voisins d'une même section :
+`MessageBuilder.build_knowledge_base` recopierait alors le même texte
+plusieurs fois. `ContextBuilder` :
+    1. sélectionne les candidats par pertinence marginale maximale (MMR)
+       sur leurs embeddings ;
+    2. fusionne les chunks voisins ou chevauchants d'un même
+       `source_file`/`section_header` en un seul bloc, sans le chevauchement ;
+    3. remplit un budget de caractères ou de tokens, par ordre de pertinence.
+
+Les blocs gardent le format d'un résultat de `VectorService.search`
+(`id`, `text`, `distance`, `metadata`) et listent leurs chunks dans `ids`.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+# Préfixes ajoutés par `DocumentIndexingService._enhance_chunk_text`
+CONTEXT_HEADER_PREFIXES = ("Document: ", "Section: ")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière (≈3 caractères par token), comme `Encoder`."""
+    return len(text) // 3 + 1
+
+
+def mmr_select(
+    query_embedding: List[float],
+    embeddings: List[List[float]],
+    k: int,
+    lambda_: float = 0.7,
+) -> List[int]:
+    """
+    Sélection par pertinence marginale maximale.
+
+    Returns:
+        Les indices des `k` candidats retenus, dans l'ordre de sélection
+    """
+    if not embeddings or k <= 0:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+    selected: List[int] = []
+    remaining = list(range(len(embeddings)))
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def split_context_header(text: str) -> tuple[str, str]:
+    """Sépare l'en-tête "Document: ... / Section: ..." du contenu du chunk."""
+    lines = text.split("\n")
+    header_lines = 0
+    while header_lines < len(lines) and lines[header_lines].startswith(CONTEXT_HEADER_PREFIXES):
+        header_lines += 1
+    if header_lines == 0:
+        return "", text
+    # L'en-tête est suivi d'une ligne vide
+    body_start = header_lines + 1 if header_lines < len(lines) and not lines[header_lines] else header_lines
+    return "\n".join(lines[:body_start]) + "\n", "\n".join(lines[body_start:])
+
+
+def overlap_length(previous: str, following: str, min_overlap: int = 20) -> int:
+    """Longueur du plus long suffixe de `previous` qui commence `following`."""
+    for size in range(min(len(previous), len(following)), min_overlap - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+class ContextBuilder:
+    """
+    Sélectionne, fusionne et borne les chunks transmis au prompt.
+    """
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = 6000,
+        max_tokens: Optional[int] = None,
+        mmr_lambda: float = 0.7,
+        min_overlap: int = 20,
+    ):
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.min_overlap = min_overlap
+
+    def build(
+        self,
+        results: List[Dict[str, Any]],
+        k: int,
+        query_embedding: Optional[List[float]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Args:
+            results: Candidats au format de `VectorService.search`, par pertinence
+            k: Nombre de chunks à retenir
+            query_embedding, embeddings: Embeddings de la requête et des
+                candidats ; sans eux, les `k` premiers candidats sont gardés
+
+        Returns:
+            Les blocs retenus, par ordre de pertinence
+        """
+        if query_embedding is not None and embeddings is not None:
+            selected = mmr_select(query_embedding, embeddings, k, self.mmr_lambda)
+        else:
+            selected = list(range(min(k, len(results))))
+        ranked = [(rank, results[i]) for rank, i in enumerate(selected)]
+        return self.fit_budget(self.stitch(ranked))
+
+    async def retrieve(
+        self,
+        service,
+        query: str,
+        n_results: int,
+        candidates: Optional[int],
+        where: Optional[Dict[str, Any]],
+        mode: str,
+    ) -> Dict[str, Any]:
+        """
+        Recherche `candidates` résultats sur `service` (un `VectorService` ou
+        un index partitionné) puis construit les blocs du prompt.
+
+        En mode lexical, aucun embedding n'est calculé et la sélection MMR
+        est remplacée par l'ordre BM25.
+        """
+        results = (await service.search(query, candidates or 4 * n_results, where, mode))["result"]
+
+        query_embedding = embeddings = None
+        if results and mode != "lexical":
+            # Embedding déjà calculé par la recherche : servi par le cache d'embeddings
+            query_embedding = (await service.query_encoder.encode(query))[0]
+            stored = await service.get_embeddings([result["id"] for result in results])
+            embeddings = [stored[result["id"]] for result in results]
+
+        return {
+            'query': query,
+            'result': self.build(results, n_results, query_embedding, embeddings)
+        }
+
+    def _size(self, text: str) -> int:
+        return estimate_tokens(text) if self.max_tokens is not None else len(text)
+
+    def _follows(self, block: Dict[str, Any], result: Dict[str, Any], body: str) -> int:
+        """-1 si `result` ne prolonge pas le bloc, sinon la longueur du chevauchement."""
+        overlap = overlap_length(block["body"], body, self.min_overlap)
+        if overlap:
+            return overlap
+        last_index = block["last_index"]
+        index = result.get("metadata", {}).get("chunk_index")
+        if last_index is not None and index is not None and index == last_index + 1:
+            return 0
+        return -1
+
+    def stitch(self, ranked: List[tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Fusionne les chunks voisins ou chevauchants d'une même section."""
+        groups: Dict[tuple, List[tuple[int, Dict[str, Any]]]] = {}
+        for rank, result in ranked:
+            metadata = result.get("metadata") or {}
+            key = (metadata.get("source_file"), metadata.get("section_header"))
+            if key == (None, None):
+                key = ("id", result["id"])
+            groups.setdefault(key, []).append((rank, result))
+
+        blocks = []
+        for members in groups.values():
+            # Ordre du document quand il est connu, sinon celui de la recherche
+            members.sort(key=lambda member: (
+                (member[1].get("metadata") or {}).get("chunk_index", float("inf")), member[0]
+            ))
+            block = None
+            for rank, result in members:
+                header, body = split_context_header(result["text"])
+                overlap = self._follows(block, result, body) if block is not None else -1
+                if overlap < 0:
+                    if block is not None:
+                        blocks.append(block)
+                    block = {
+                        "id": result["id"],
+                        "ids": [result["id"]],
+                        "header": header,
+                        "body": body,
+                        "distance": result.get("distance"),
+                        "metadata": result.get("metadata") or {},
+                        "rank": rank,
+                        "last_index": (result.get("metadata") or {}).get("chunk_index"),
+                    }
+                    continue
+                separator = "" if overlap else "\n"
+                block["body"] += separator + body[overlap:]
+                block["ids"].append(result["id"])
+                block["rank"] = min(block["rank"], rank)
+                block["last_index"] = (result.get("metadata") or {}).get("chunk_index")
+                distance = result.get("distance")
+                if distance is not None and (block["distance"] is None or distance < block["distance"]):
+                    block["distance"] = distance
+            blocks.append(block)
+
+        blocks.sort(key=lambda block: block["rank"])
+        return [
+            {
+                "id": block["id"],
+                "ids": block["ids"],
+                "text": block["header"] + block["body"],
+                "distance": block["distance"],
+                "metadata": block["metadata"],
+            }
+            for block in blocks
+        ]
+
+    def fit_budget(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Garde les blocs les plus pertinents qui tiennent dans le budget."""
+        budget = self.max_tokens if self.max_tokens is not None else self.max_chars
+        if budget is None:
+            return blocks
+        kept, used = [], 0
+        for block in blocks:
+            size = self._size(block["text"])
+            if used + size <= budget:
+                kept.append(block)
+                used += size
+            elif not kept:
+                # Le bloc le plus pertinent est tronqué plutôt qu'écarté
+                limit = budget * 3 if self.max_tokens is not None else budget
+                kept.append({**block, "text": block["text"][:limit]})
+                used = budget
+        return kept
@@ -2,15 +2,19 @@
 Service d'indexation des documents markdown dans la base vectorielle.
 """
 
-import asyncio
-import json
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, Iterator, List, Dict, Any, Optional
 from tqdm import tqdm
-import hashlib
 
-from app.services.vector_service import VectorService
-from app.services.text_chunker import MarkdownChunker, TextChunk, DocumentIndexer
+from .index_generations import IndexGenerations, IndexValidationError
+from .index_journal import IndexJournal
+from .indexing_telemetry import IndexingTelemetry
+from .indexing_pipeline import FileJob, IndexingPipeline, enhance_chunk_text, hash_content, prepare_file
+from .search_filters import build_where
+from .sharded_vector_service import ShardedVectorService, create_vector_service
+from .vector_service import VectorService
+from .text_chunker import MarkdownChunker, TextChunk
 
 
 class DocumentIndexingService:
@@ -20,14 +24,23 @@ class DocumentIndexingService:
     
     def __init__(
         self,
-        vector_service: Optional[VectorService] = None,
+        vector_service: Optional[VectorService | ShardedVectorService] = None,
         chunker: Optional[MarkdownChunker] = None,
-        data_dir: str = "data/scraping"
+        data_dir: str = "data/scraping",
+        chunk_workers: Optional[int] = None,
+        embed_batch_size: int = 128,
+        embed_concurrency: int = 4,
+        queue_size: int = 32,
+        index_root: str = "data/mistral_doc",
+        state_dir: Optional[str] = None
     ):
-
-        self.vector_service = vector_service or VectorService(
-            collection_name='mistral_docs',
-            persist_directory="data/mistral_doc"
+        # Index actif : la génération publiée sous `index_root`, ou la racine
+        # elle-même pour un index antérieur aux générations
+        self.generations = IndexGenerations(index_root)
+        self.generation_id = self.generations.current_id()
+        self._owns_vector_service = vector_service is None
+        self.vector_service = vector_service or create_vector_service(
+            'mistral_docs', self.generations.path(self.generation_id)
         )
         self.chunker = chunker or MarkdownChunker(
             chunk_size=1000,
@@ -36,121 +49,173 @@ class DocumentIndexingService:
         )
 
         self.data_dir = Path(data_dir)
-        self.index_metadata_file = Path("data/mistral_doc/index_metadata.json")
+        # Journal à côté de la collection ; ancien manifeste JSON migré une fois
+        self.state_dir = Path(state_dir or self.generations.path(self.generation_id))
+        self.index_metadata_file = self.state_dir / "index_metadata.json"
+        self.index_journal_file = self.state_dir / "index_journal.db"
+        # Télémétrie de l'exécution en cours (ou de la dernière)
+        self.telemetry: Optional[IndexingTelemetry] = None
+        self._journal: Optional[IndexJournal] = None
+
+        # Réglages du pipeline de `index_all_documents`
+        self.chunk_workers = chunk_workers
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.queue_size = queue_size
         
-    def find_markdown_files(self) -> List[Path]:
-        """Trouve tous les fichiers markdown dans le répertoire de données."""
+    def iter_markdown_files(self) -> Iterator[Path]:
+        """Parcourt les fichiers markdown au fil de l'eau, sans les lister d'abord."""
         if not self.data_dir.exists():
             print(f"Le répertoire {self.data_dir} n'existe pas.")
-            return []
-        
-        markdown_files = list(self.data_dir.rglob("*.md"))
+            return iter(())
+        return self.data_dir.rglob("*.md")
+
+    def find_markdown_files(self) -> List[Path]:
+        """Trouve tous les fichiers markdown dans le répertoire de données."""
+        markdown_files = list(self.iter_markdown_files())
         print(f"Trouvé {len(markdown_files)} fichiers markdown.")
         return markdown_files
     
-    def load_index_metadata(self) -> Dict[str, Any]:
-        """Charge les métadonnées d'indexation existantes."""
-        if self.index_metadata_file.exists():
+    @property
+    def journal(self) -> IndexJournal:
+        """Journal d'indexation, ouvert au premier usage (migre l'ancien JSON)."""
+        if self._journal is None:
+            self._journal = IndexJournal(str(self.index_journal_file))
             try:
-                with open(self.index_metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                if self._journal.import_json(self.index_metadata_file):
+                    print(f"{self.index_metadata_file} migré dans {self.index_journal_file}.")
             except Exception as e:
-                print(f"Erreur lors du chargement des métadonnées: {e}")
-        
-        return {
-            "indexed_files": {},
-            "total_chunks": 0,
-            "last_update": None
-        }
+                print(f"Erreur lors de la migration des métadonnées: {e}")
+        return self._journal
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.vector_service.close()
+
+    def follow_generation(self) -> bool:
+        """
+        Passe sur la génération publiée si elle a changé (ex: `--watch`
+        pendant une reconstruction). Sans effet si le service vectoriel a été
+        fourni par l'appelant.
+
+        Returns:
+            True si l'indexeur a changé de génération
+        """
+        generation_id = self.generations.current_id()
+        if not self._owns_vector_service or generation_id == self.generation_id:
+            return False
+        self.close()
+        path = self.generations.path(generation_id)
+        self.vector_service = create_vector_service('mistral_docs', path)
+        self.state_dir = Path(path)
+        self.index_journal_file = self.state_dir / "index_journal.db"
+        self.index_metadata_file = self.state_dir / "index_metadata.json"
+        self.generation_id = generation_id
+        print(f"Génération d'index {generation_id} suivie.")
+        return True
+
+    def load_index_metadata(self) -> Dict[str, Any]:
+        """
+        Métadonnées d'indexation au format de l'ancien index_metadata.json
+        (lit tout le journal : préférer les requêtes de `self.journal`).
+        """
+        return self.journal.to_dict()
     
     def save_index_metadata(self, metadata: Dict[str, Any]):
-        """Sauvegarde les métadonnées d'indexation."""
-        self.index_metadata_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            with open(self.index_metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Erreur lors de la sauvegarde des métadonnées: {e}")
+        """Remplace le contenu du journal par `metadata` (ex: snapshot)."""
+        self.journal.load_dict(metadata)
     
     def get_file_hash(self, file_path: Path) -> str:
         """Calcule le hash SHA256 d'un fichier."""
         try:
-            content = file_path.read_text(encoding='utf-8')
-            return hashlib.sha256(content.encode('utf-8')).hexdigest()
+            return hash_content(file_path.read_text(encoding='utf-8'))
         except Exception as e:
             print(f"Erreur lors du calcul du hash pour {file_path}: {e}")
             return ""
     
+    @staticmethod
+    def stat_unchanged(file_info: Dict[str, Any], stat) -> bool:
+        """Taille et date de modification identiques à celles du manifeste."""
+        return (
+            file_info.get("size") == stat.st_size
+            and file_info.get("mtime_ns") == stat.st_mtime_ns
+        )
+
     def file_needs_reindexing(self, file_path: Path, metadata: Dict[str, Any]) -> bool:
-        """Vérifie si un fichier doit être réindexé."""
+        """Vérifie si un fichier doit être réindexé (le hash ne départage que si le stat a changé)."""
         file_key = str(file_path.relative_to(self.data_dir))
         
         if file_key not in metadata["indexed_files"]:
             return True
+        if self.stat_unchanged(metadata["indexed_files"][file_key], file_path.stat()):
+            return False
         
         current_hash = self.get_file_hash(file_path)
         stored_hash = metadata["indexed_files"][file_key].get("hash", "")
         
         return current_hash != stored_hash
     
-    async def index_file(self, file_path: Path) -> List[str]:
+    async def index_file(
+        self,
+        file_path: Path,
+        previous_chunk_ids: Optional[List[str]] = None
+    ) -> Optional[List[str]]:
         """
         Indexe un fichier markdown spécifique.
         
         Args:
             file_path: Chemin vers le fichier à indexer
+            previous_chunk_ids: Chunks déjà indexés pour ce fichier, remplacés
+                en une seule opération par le nouvel ensemble
             
         Returns:
-            Liste des IDs des chunks créés
+            Liste des IDs des chunks créés (vide si le fichier n'en produit
+            aucun), ou None en cas d'échec
         """
         print(f"Indexation de {file_path.name}...")
         
-
-        chunks = self.chunker.chunk_markdown_file(file_path)
+        try:
+            prepared = prepare_file(str(file_path), self.chunker)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du fichier {file_path}: {e}")
+            prepared = {"ids": []}
         
-        if not chunks:
+        if not prepared["ids"]:
             print(f"Aucun chunk généré pour {file_path}")
+            # Le fichier a été vidé : ses anciens chunks ne doivent pas rester dans l'index
+            try:
+                await self.vector_service.delete_many(previous_chunk_ids or [])
+            except Exception as e:
+                print(f" Error during indexation {file_path}: {e}")
+                return None
             return []
         
-        # Générer les IDs et préparer les données
-        chunk_ids = []
-        texts = []
-        
-        for i, chunk in enumerate(chunks):
-            chunk_id = DocumentIndexer.generate_chunk_id(chunk, i)
-            chunk.chunk_id = chunk_id
-            chunk_ids.append(chunk_id)
-            
-            # Ajouter les métadonnées au texte pour un meilleur contexte
-            enhanced_text = self._enhance_chunk_text(chunk)
-            texts.append(enhanced_text)
+        # IDs, textes enrichis du contexte des métadonnées, et métadonnées
+        # stockées à part pour pouvoir filtrer les recherches
+        chunk_ids = prepared["ids"]
+        texts = prepared["texts"]
+        metadatas = prepared["metadatas"]
         
         try:
             # Indexer par batch pour l'efficacité
-            await self.vector_service.add_batch(texts, chunk_ids)
-            print(f"{len(chunks)} chunks indexed for {file_path.name}")
+            if previous_chunk_ids:
+                await self.vector_service.replace_documents(
+                    previous_chunk_ids, texts, chunk_ids, metadatas
+                )
+            else:
+                await self.vector_service.upsert_batch(texts, chunk_ids, metadatas=metadatas)
+            print(f"{len(chunk_ids)} chunks indexed for {file_path.name}")
             return chunk_ids
             
         except Exception as e:
             print(f" Error during indexation {file_path}: {e}")
-            return []
+            return None
     
     def _enhance_chunk_text(self, chunk: TextChunk) -> str:
         """Améliore le texte du chunk avec du contexte des métadonnées."""
-        enhanced_text = chunk.content
-        
-        # Ajouter le titre de la section si disponible
-        section_header = chunk.metadata.get('section_header', '')
-        if section_header and section_header not in enhanced_text:
-            enhanced_text = f"Section: {section_header}\n\n{enhanced_text}"
-        
-        # Ajouter le titre du document si disponible
-        doc_title = chunk.metadata.get('title', '')
-        if doc_title and doc_title not in enhanced_text and doc_title != section_header:
-            enhanced_text = f"Document: {doc_title}\n{enhanced_text}"
-        
-        return enhanced_text
+        return enhance_chunk_text(chunk)
     
     async def remove_file_chunks(self, file_path: Path, metadata: Dict[str, Any]):
         """Supprime les chunks d'un fichier de l'index."""
@@ -159,93 +224,234 @@ class DocumentIndexingService:
         if file_key in metadata["indexed_files"]:
             chunk_ids = metadata["indexed_files"][file_key].get("chunk_ids", [])
             
-            for chunk_id in chunk_ids:
-                try:
-                    self.vector_service.delete_document(chunk_id)
-                except Exception as e:
-                    print(f"Erreur lors de la suppression du chunk {chunk_id}: {e}")
+            try:
+                await self.vector_service.delete_many(chunk_ids)
+            except Exception as e:
+                print(f"Erreur lors de la suppression des chunks de {file_path.name}: {e}")
+                return
             
             print(f"Supprimé {len(chunk_ids)} chunks pour {file_path.name}")
     
-    async def index_all_documents(self, force_reindex: bool = False) -> Dict[str, Any]:
+    def _new_stats(self, run_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "run_id": run_id,
+            "total_files": 0,
+            "indexed_files": 0,
+            "skipped_files": 0,
+            "deleted_files": 0,
+            "total_chunks": 0,
+            "embedded_chunks": 0,
+            "errors": []
+        }
+
+    def _make_pipeline(self) -> IndexingPipeline:
+        return IndexingPipeline(
+            self.vector_service,
+            self.chunker,
+            chunk_workers=self.chunk_workers,
+            embed_batch_size=self.embed_batch_size,
+            embed_concurrency=self.embed_concurrency,
+            queue_size=self.queue_size,
+            telemetry=self.telemetry,
+        )
+
+    def _start_telemetry(self, run_id: Optional[int] = None) -> IndexingTelemetry:
+        self.telemetry = IndexingTelemetry(self.vector_service.encoder, run_id)
+        return self.telemetry
+
+    def report_file(self, run_id: int) -> Path:
+        """Rapport de télémétrie JSON d'une exécution."""
+        return self.state_dir / "reports" / f"run-{run_id}.json"
+
+    def _make_job(
+        self,
+        file_key: str,
+        file_path: Path,
+        force_reindex: bool = False,
+        resumed_run: Optional[int] = None
+    ) -> Optional[FileJob]:
+        """
+        Tâche du pipeline pour un fichier, ou None si taille et date sont
+        inchangées (le fichier n'est pas lu). Sinon le hash connu départage,
+        dans le pipeline.
+        """
+        known = self.journal.get_file(file_key) or {}
+        # Stat relevé avant la lecture : une modification concurrente
+        # sera vue au passage suivant
+        stat = file_path.stat()
+        # Une exécution forcée reprise saute les fichiers qu'elle a déjà validés
+        already_done = resumed_run is not None and known.get("run_id") == resumed_run
+        if known and (already_done or not force_reindex) and self.stat_unchanged(known, stat):
+            return None
+        return FileJob(
+            key=file_key,
+            path=file_path,
+            previous_ids=self.journal.chunk_ids(file_key) if known else [],
+            known_hash=None if force_reindex else known.get("hash"),
+            reuse_existing=not force_reindex,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    def _on_done(self, stats: Dict[str, Any], run_id: Optional[int], progress=None):
+        """Valide chaque fichier terminé dans le journal et met à jour `stats`."""
+        def on_done(job: FileJob):
+            if progress is not None:
+                progress.update()
+            if job.error is not None:
+                print(job.error)
+                stats["errors"].append(job.error)
+                self.telemetry.count("files_failed")
+            elif job.unchanged:
+                # Contenu identique (fichier touché ou copié) : seul le stat change
+                self.journal.touch_file(job.key, job.size, job.mtime_ns, run_id)
+                stats["skipped_files"] += 1
+                self.telemetry.count("files_skipped")
+            else:
+                # Validé tout de suite : une interruption ne perd pas ce fichier
+                self.journal.record_file(job.key, job.hash, job.ids, job.size, job.mtime_ns, run_id)
+                stats["indexed_files"] += 1
+                self.telemetry.count("files_indexed")
+                stats["total_chunks"] += len(job.ids)
+                stats["embedded_chunks"] += job.new_chunks
+        return on_done
+
+    async def _delete_files(self, file_keys: List[str], stats: Dict[str, Any]):
+        """Supprime en une fois les chunks de fichiers disparus, puis leurs entrées."""
+        if not file_keys:
+            return
+        try:
+            chunk_ids = [
+                chunk_id for file_key in file_keys for chunk_id in self.journal.chunk_ids(file_key)
+            ]
+            with self.telemetry.stage("delete"):
+                await self.vector_service.delete_many(chunk_ids)
+            self.journal.remove_files(file_keys)
+            stats["deleted_files"] += len(file_keys)
+            self.telemetry.count("files_deleted", len(file_keys))
+            self.telemetry.count("chunks_deleted", len(chunk_ids))
+        except Exception as e:
+            error_msg = f"Erreur lors de la suppression des fichiers disparus: {e}"
+            print(error_msg)
+            stats["errors"].append(error_msg)
+
+    async def index_all_documents(
+        self,
+        force_reindex: bool = False,
+        shard: Optional[str] = None,
+        resume: bool = False
+    ) -> Dict[str, Any]:
         """
         Indexe tous les documents markdown.
+
+        Chaque fichier est validé dans le journal dès que ses chunks sont
+        écrits : une exécution interrompue (crash, Ctrl-C) ne perd que les
+        fichiers en cours.
         
         Args:
             force_reindex: Si True, réindexe tous les fichiers même s'ils n'ont pas changé
+            shard: Limite l'indexation aux fichiers d'un shard (index
+                partitionné) ; avec force_reindex, le shard est vidé puis
+                reconstruit sans toucher aux autres
+            resume: Reprend la dernière exécution interrompue avec ses
+                options ; les fichiers qu'elle a déjà validés sont ignorés
             
         Returns:
             Statistiques d'indexation
         """
         print("Begin indexing")
-        
-        # Charger les métadonnées existantes
-        metadata = self.load_index_metadata()
-        
-        # Trouver tous les fichiers markdown
-        markdown_files = self.find_markdown_files()
-        
-        if not markdown_files:
-            print("no file markdown found.")
+
+        # Sans répertoire source, tous les fichiers sembleraient supprimés
+        if not self.data_dir.exists():
+            print(f"Le répertoire {self.data_dir} n'existe pas.")
             return {"total_files": 0, "indexed_files": 0, "total_chunks": 0}
+
+        journal = self.journal
+        resumed = journal.resume_run() if resume else None
+        if resume and resumed is None:
+            print("Aucune exécution interrompue à reprendre.")
+        if resumed is not None:
+            force_reindex, shard = resumed["force"], resumed["shard"]
+            run_id = resumed["run_id"]
+            print(f"Reprise de l'exécution {run_id} (force={force_reindex}, shard={shard}).")
+        else:
+            run_id = journal.begin_run(force_reindex, shard)
+
+        # Rattraper l'index BM25 si la collection a été indexée sans lui
+        backfilled = await self.vector_service.sync_lexical_index()
+        if backfilled:
+            print(f"Index lexical reconstruit ({backfilled} chunks).")
         
-        stats = {
-            "total_files": len(markdown_files),
-            "indexed_files": 0,
-            "skipped_files": 0,
-            "total_chunks": 0,
-            "errors": []
-        }
-        
-        for file_path in tqdm(markdown_files, desc="Indexation des fichiers"):
-            try:
+        if shard is not None:
+            if not isinstance(self.vector_service, ShardedVectorService):
+                raise ValueError("shard requires a sharded vector index (VECTOR_SHARDING)")
+            # Shard déjà vidé par l'exécution reprise
+            if force_reindex and resumed is None:
+                cleared = await self.vector_service.clear_shard(shard)
+                print(f"Shard {shard} vidé ({cleared} chunks).")
+
+        stats = self._new_stats(run_id)
+        seen = set()
+
+        # Fichiers découverts au fil de l'eau. Taille et date inchangées : le
+        # fichier n'est pas lu. Sinon le hash connu départage, dans le pipeline
+        def jobs() -> Iterator[FileJob]:
+            for file_path in self.iter_markdown_files():
                 file_key = str(file_path.relative_to(self.data_dir))
-                
-                if not force_reindex and not self.file_needs_reindexing(file_path, metadata):
-                    print(f"File {file_path.name} up to date, ignored.")
+                if shard is not None and self.vector_service.shard_name(file_key) != shard:
+                    continue
+                seen.add(file_key)
+                stats["total_files"] += 1
+                job = self._make_job(
+                    file_key, file_path, force_reindex,
+                    resumed_run=run_id if resumed is not None else None,
+                )
+                if job is None:
                     stats["skipped_files"] += 1
+                    telemetry.count("files_skipped")
+                    progress.update()
                     continue
-                
-
-                if file_key in metadata["indexed_files"]:
-                    await self.remove_file_chunks(file_path, metadata)
-                
-
-                chunk_ids = await self.index_file(file_path)
-                
-                if chunk_ids:
-                    metadata["indexed_files"][file_key] = {
-                        "hash": self.get_file_hash(file_path),
-                        "chunk_ids": chunk_ids,
-                        "chunk_count": len(chunk_ids),
-                        "last_indexed": asyncio.get_event_loop().time()
-                    }
-                    
-                    stats["indexed_files"] += 1
-                    stats["total_chunks"] += len(chunk_ids)
-                else:
-                    stats["errors"].append(f"Échec de l'indexation de {file_path}")
-                
-            except Exception as e:
-                error_msg = f"Erreur avec {file_path}: {e}"
-                print(f"{error_msg}")
-                stats["errors"].append(error_msg)
-        
+                yield job
 
-        metadata["total_chunks"] = sum(
-            file_info["chunk_count"] 
-            for file_info in metadata["indexed_files"].values()
-        )
-        metadata["last_update"] = asyncio.get_event_loop().time()
-        
-        self.save_index_metadata(metadata)
+        telemetry = self._start_telemetry(run_id)
+        progress = tqdm(desc="Indexation des fichiers", unit="fichier")
+        status = "interrupted"
+        try:
+            try:
+                await self._make_pipeline().run(jobs(), self._on_done(stats, run_id, progress))
+            finally:
+                progress.close()
+
+            # Fichiers disparus de data/scraping : leurs chunks sont supprimés en une fois
+            deleted = [
+                file_key for file_key in journal.file_keys()
+                if file_key not in seen
+                and (shard is None or self.vector_service.shard_name(file_key) == shard)
+            ]
+            await self._delete_files(deleted, stats)
+            status = "completed"
+        finally:
+            # Exception, Ctrl-C ou annulation : l'exécution reste reprenable
+            journal.finish_run(run_id, status)
+            # Rapport écrit aussi pour une exécution interrompue
+            telemetry.finish()
+            stats["telemetry"] = telemetry.write_report(str(self.report_file(run_id)))
+
+        if not stats["total_files"] and not deleted:
+            print("no file markdown found.")
         
         # Afficher les statistiques finales
         print("\nStatistiques d'indexation:")
         print(f"   Fichiers traités: {stats['indexed_files']}/{stats['total_files']}")
         print(f"   Fichiers ignorés: {stats['skipped_files']}")
+        print(f"   Fichiers supprimés: {stats['deleted_files']}")
         print(f"   Total chunks créés: {stats['total_chunks']}")
+        print(f"   Chunks encodés: {stats['embedded_chunks']}")
         print(f"   Erreurs: {len(stats['errors'])}")
+        throughput = stats["telemetry"]["throughput"]
+        print(f"   Débit: {throughput['chunks_per_s']} chunks/s, {throughput['tokens_per_s']} tokens/s")
+        print(telemetry.summary())
+        print(f"   Rapport: {self.report_file(run_id)}")
         
         if stats["errors"]:
             print("\n❌ Erreurs rencontrées:")
@@ -258,18 +464,241 @@ class DocumentIndexingService:
         
         return stats
     
-    async def search_documents(self, query: str, n_results: int = 5) -> Dict[str, Any]:
+    async def validate_index(
+        self,
+        stats: Dict[str, Any],
+        smoke_query: Optional[str] = None,
+        previous_chunks: Optional[int] = None,
+        min_ratio: float = 0.5
+    ) -> Dict[str, Any]:
+        """
+        Vérifie un index reconstruit avant sa publication :
+            - aucune erreur d'indexation ;
+            - autant de vecteurs dans la collection que de chunks dans le journal ;
+            - au moins `min_ratio` fois les chunks de la génération
+              précédente (un corpus vidé par erreur n'est pas publié) ;
+            - une requête de test (par défaut, le texte d'un chunk indexé)
+              renvoie au moins un résultat.
+
+        Raises:
+            IndexValidationError: Si une vérification échoue
+        """
+        if stats.get("errors"):
+            raise IndexValidationError(f"{len(stats['errors'])} indexing errors: {stats['errors'][0]}")
+        # Charge aussi l'index en mémoire, comme au démarrage de l'API
+        count = await self.vector_service.warmup()
+        expected = self.journal.total_chunks()
+        if count == 0 or count != expected:
+            raise IndexValidationError(f"collection has {count} chunks, journal expects {expected}")
+        if previous_chunks and count < min_ratio * previous_chunks:
+            raise IndexValidationError(
+                f"{count} chunks, less than {min_ratio:.0%} of the previous generation ({previous_chunks})"
+            )
+
+        if smoke_query is None:
+            sample_id = next(iter(self.journal.all_chunk_ids()))
+            smoke_query = (await self.vector_service.get_document(sample_id))["text"][:500]
+        start = time.perf_counter()
+        results = await self.vector_service.search(smoke_query, n_results=1)
+        smoke_query_ms = (time.perf_counter() - start) * 1000
+        if not results["result"]:
+            raise IndexValidationError(f"smoke query returned no result: {smoke_query[:80]!r}")
+        return {"chunks": count, "smoke_query_ms": round(smoke_query_ms, 1)}
+
+    async def index_paths(self, paths: Iterable[Path]) -> Dict[str, Any]:
+        """
+        Réindexe seulement les chemins donnés, sans parcourir tout le
+        répertoire (mode --watch) : fichiers créés ou modifiés, répertoires
+        ajoutés, fichiers et répertoires supprimés.
+
+        Les chemins hors de `data_dir` et les fichiers non markdown sont ignorés.
+        """
+        journal = self.journal
+        stats = self._new_stats()
+        telemetry = self._start_telemetry()
+        root = self.data_dir.resolve()
+        files: Dict[str, Path] = {}
+        deleted = set()
+        for path in paths:
+            try:
+                file_key = Path(path).resolve().relative_to(root).as_posix()
+            except ValueError:
+                continue
+            file_path = self.data_dir / file_key
+            if file_path.is_dir():
+                for child in file_path.rglob("*.md"):
+                    files[str(child.relative_to(self.data_dir))] = child
+            elif file_path.is_file():
+                if file_path.suffix == ".md":
+                    files[file_key] = file_path
+            else:
+                # Fichier ou répertoire supprimé
+                deleted.update(journal.file_keys_under(file_key))
+
+        def jobs() -> Iterator[FileJob]:
+            for file_key, file_path in files.items():
+                stats["total_files"] += 1
+                try:
+                    job = self._make_job(file_key, file_path)
+                except FileNotFoundError:
+                    # Supprimé entre-temps : traité au lot suivant
+                    continue
+                if job is None:
+                    stats["skipped_files"] += 1
+                    telemetry.count("files_skipped")
+                    continue
+                yield job
+
+        await self._make_pipeline().run(jobs(), self._on_done(stats, None))
+        await self._delete_files(sorted(deleted - files.keys()), stats)
+        telemetry.finish()
+        stats["telemetry"] = telemetry.report()
+        return stats
+
+    async def compact(self) -> Dict[str, int]:
+        """
+        Réconcilie le journal d'indexation avec le contenu réel de la collection :
+            - les vecteurs qu'aucun fichier du manifeste ne référence
+              (orphelins) sont supprimés ;
+            - les fichiers disparus du disque perdent leurs chunks et leur
+              entrée ;
+            - une entrée dont des chunks manquent dans la collection est
+              retirée, pour que le fichier soit réindexé au passage suivant.
+
+        Returns:
+            Nombre de vecteurs orphelins supprimés et d'entrées retirées
+        """
+        journal = self.journal
+        stored_ids = set(await self.vector_service.list_ids())
+
+        missing_files = [
+            file_key for file_key in journal.file_keys()
+            if not (self.data_dir / file_key).exists()
+        ]
+        journal.remove_files(missing_files)
+
+        incomplete = [
+            file_key for file_key in journal.file_keys()
+            if not stored_ids.issuperset(journal.chunk_ids(file_key))
+        ]
+        journal.remove_files(incomplete)
+
+        referenced = journal.all_chunk_ids()
+        orphans = [doc_id for doc_id in stored_ids if doc_id not in referenced]
+        await self.vector_service.delete_many(orphans)
+
+        result = {
+            "orphan_chunks": len(orphans),
+            "missing_files": len(missing_files),
+            "incomplete_files": len(incomplete),
+        }
+        print(f"Compaction: {result}")
+        return result
+
+    async def export_snapshot(self, path: str, dtype: str = "float32") -> Dict[str, Any]:
+        """
+        Exporte l'index et ses métadonnées d'indexation dans un snapshot,
+        pour démarrer une réplique sans rien ré-encoder.
+        """
+        return await self.vector_service.export_snapshot(
+            path, dtype, extra={"index_metadata": self.load_index_metadata()}
+        )
+
+    async def load_snapshot(self, path: str) -> Dict[str, Any]:
+        """
+        Remplace l'index par le contenu d'un snapshot et restaure le
+        journal d'indexation : l'indexation incrémentale reprend ensuite
+        normalement.
+        """
+        extra = await self.vector_service.load_snapshot(path)
+        if "index_metadata" in extra:
+            self.save_index_metadata(extra["index_metadata"])
+        return extra
+
+    async def search_documents(
+        self,
+        query: str,
+        n_results: int = 5,
+        path_prefix: Optional[str] = None,
+        language: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        mode: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Recherche dans les documents indexés.
         
         Args:
             query: Requête de recherche
             n_results: Nombre de résultats à retourner
+            path_prefix: Limite la recherche à un répertoire ou un fichier source
+            language: Limite la recherche à une langue
+            doc_type: Limite la recherche à un type de document
+            mode: "vector", "lexical" ou "hybrid" (défaut du VectorService)
             
         Returns:
             Résultats de recherche avec métadonnées
         """
-        return await self.vector_service.search(query, n_results)
+        where = build_where(path_prefix, language, doc_type)
+        return await self.vector_service.search(query, n_results, where=where, mode=mode)
+
 
+async def build_generation(
+    index_root: str = "data/mistral_doc",
+    data_dir: str = "data/scraping",
+    collection_name: str = "mistral_docs",
+    smoke_query: Optional[str] = None,
+    min_ratio: float = 0.5,
+    grace_seconds: float = 600.0,
+    encoder=None,
+    **indexer_kwargs: Any
+) -> Dict[str, Any]:
+    """
+    Reconstruit l'index dans une nouvelle génération, la valide puis la
+    publie : l'API continue de servir l'index actif pendant toute la
+    reconstruction et bascule entre deux requêtes. Les générations retirées
+    depuis plus de `grace_seconds` sont ensuite supprimées.
+
+    Une génération rejetée à la validation est marquée FAILED et n'est
+    jamais publiée.
+
+    Returns:
+        Id de la génération publiée, statistiques et résultat de la validation
+    """
+    generations = IndexGenerations(index_root)
+    previous_id = generations.current_id()
+    previous_journal = Path(generations.path(previous_id)) / "index_journal.db"
+    previous_chunks = None
+    if previous_journal.exists():
+        journal = IndexJournal(str(previous_journal))
+        previous_chunks = journal.total_chunks()
+        journal.close()
 
+    generation_id, path = generations.create()
+    print(f"Construction de la génération {generation_id} dans {path}")
+    service_kwargs = {"encoder": encoder} if encoder is not None else {}
+    indexer = DocumentIndexingService(
+        vector_service=create_vector_service(collection_name, path, **service_kwargs),
+        data_dir=data_dir,
+        index_root=index_root,
+        state_dir=path,
+        **indexer_kwargs
+    )
+    try:
+        stats = await indexer.index_all_documents()
+        validation = await indexer.validate_index(stats, smoke_query, previous_chunks, min_ratio)
+    except BaseException:
+        generations.mark_failed(generation_id)
+        raise
+    finally:
+        indexer.close()
 
+    generations.publish(generation_id)
+    removed = generations.cleanup(grace_seconds)
+    print(f"Génération {generation_id} publiée ({validation['chunks']} chunks).")
+    return {
+        "generation": generation_id,
+        "previous": previous_id,
+        "stats": stats,
+        "validation": validation,
+        "removed": removed,
+    }
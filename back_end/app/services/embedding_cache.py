@@ -0,0 +1,228 @@
+"""
+Cache persistant des embeddings, adressé par le contenu.
+
+Deux niveaux : un LRU en mémoire propre au processus, puis une base SQLite
+(mode WAL) partagée entre les workers uvicorn et le script d'indexation.
+Les clés sont dérivées du couple (modèle, SHA-256 du texte).
+
+Les méthodes sont synchrones et peuvent bloquer sur le verrou SQLite : les
+appelants asynchrones doivent les exécuter hors de la boucle
+(`asyncio.to_thread`). Le chemin de lecture n'écrit jamais sur disque ;
+l'éviction du niveau disque se fait par ancienneté d'insertion.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join("data", "embedding_cache", "embeddings.sqlite3")
+
+
+def to_float32(embedding: List[float]) -> List[float]:
+    """Arrondit un vecteur à la précision stockée sur disque (float32)."""
+    return array("f", embedding).tolist()
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings à deux niveaux (mémoire LRU + SQLite sur disque).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_size: int = 10_000,
+        max_disk_entries: int = 500_000,
+    ):
+        self.path = Path(path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                inserted_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_inserted_at "
+            "ON embeddings(inserted_at)"
+        )
+        # Compteur approximatif (d'autres processus écrivent aussi) : le
+        # COUNT(*) exact n'est refait que lorsque la limite semble atteinte
+        (self._approx_count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Clé du cache : modèle + SHA-256 du texte."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Récupère les embeddings disponibles dans le cache.
+
+        Returns:
+            Une liste alignée sur `texts`, avec None pour chaque texte absent
+        """
+        keys = [self.make_key(model_name, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        disk_lookup: Dict[str, List[int]] = {}
+
+        with self._memory_lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+        if not disk_lookup:
+            return results
+
+        found = self._read_disk(list(disk_lookup))
+        with self._memory_lock:
+            for key, positions in disk_lookup.items():
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += len(positions)
+                    continue
+                self.disk_hits += len(positions)
+                self._remember(key, vector)
+                for i in positions:
+                    results[i] = vector
+        return results
+
+    def put_many(
+        self, model_name: str, texts: List[str], embeddings: List[List[float]]
+    ) -> List[List[float]]:
+        """
+        Enregistre des embeddings dans les deux niveaux du cache.
+
+        Returns:
+            Les vecteurs tels qu'ils seront relus (précision float32), pour
+            que l'appelant renvoie la même valeur quel que soit le niveau
+        """
+        if not texts:
+            return []
+        now = time.time()
+        rows = []
+        stored = []
+        for text, embedding in zip(texts, embeddings):
+            blob = array("f", embedding)
+            stored.append(blob.tolist())
+            rows.append((self.make_key(model_name, text), model_name, blob.tobytes(), now))
+
+        with self._memory_lock:
+            for (key, _, _, _), vector in zip(rows, stored):
+                self._remember(key, vector)
+
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, model, vector, inserted_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._approx_count += len(rows)
+                if self._approx_count > self.max_disk_entries:
+                    self._evict_disk()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return stored
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._db_lock:
+            # SQLite limite le nombre de paramètres par requête
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def _evict_disk(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._approx_count = count
+        if count <= self.max_disk_entries:
+            return
+        # Descendre sous la limite avec une marge de 10% pour espacer les évictions
+        target = self.max_disk_entries - self.max_disk_entries // 10
+        excess = count - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY inserted_at ASC LIMIT ?)",
+            (excess,),
+        )
+        self._approx_count = target
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs de hits/misses pour le suivi du cache."""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._memory_lock:
+            self._memory.clear()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._approx_count = 0
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
@@ -0,0 +1,137 @@
+"""
+Générations d'index bleu/vert.
+
+Une reconstruction complète n'écrit pas dans l'index servi par l'API : elle
+remplit un nouveau répertoire `<racine>/generations/<id>/` (collection,
+index BM25, journal d'indexation), le valide, puis le publie en remplaçant
+atomiquement le fichier `<racine>/CURRENT` qui contient l'id de la
+génération active.
+
+Les workers de l'API relisent `CURRENT` (un simple `stat` tant qu'il ne
+change pas) à chaque requête : les requêtes en cours terminent sur
+l'ancienne génération, les suivantes utilisent la nouvelle. Une génération
+remplacée reçoit un marqueur `RETIRED` daté ; elle est supprimée après un
+délai de grâce, de même qu'une génération rejetée à la validation
+(marqueur `FAILED`).
+
+Sans fichier `CURRENT` (index construit avant les générations), la racine
+elle-même est l'index actif.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+CURRENT_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+RETIRED_MARKER = "RETIRED"
+FAILED_MARKER = "FAILED"
+
+
+class IndexValidationError(RuntimeError):
+    """Une génération reconstruite ne passe pas la validation : elle n'est pas publiée."""
+
+
+class IndexGenerations:
+    """
+    Générations d'index sous une racine (ex: `data/mistral_doc`).
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.current_file = self.root / CURRENT_FILE
+        self.generations_dir = self.root / GENERATIONS_DIR
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._current_id: Optional[str] = None
+
+    def current_id(self) -> Optional[str]:
+        """Id de la génération publiée (un simple `stat` si `CURRENT` n'a pas changé)."""
+        try:
+            stat = os.stat(self.current_file)
+        except FileNotFoundError:
+            self._stamp, self._current_id = None, None
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            self._current_id = self.current_file.read_text(encoding="utf-8").strip() or None
+            self._stamp = stamp
+        return self._current_id
+
+    def path(self, generation_id: Optional[str]) -> str:
+        if generation_id is None:
+            return str(self.root)
+        return str(self.generations_dir / generation_id)
+
+    def current_path(self) -> str:
+        """Répertoire de l'index actif."""
+        return self.path(self.current_id())
+
+    def create(self) -> Tuple[str, str]:
+        """
+        Réserve un répertoire pour une nouvelle génération.
+
+        Returns:
+            (id, répertoire)
+        """
+        generation_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        path = self.generations_dir / generation_id
+        path.mkdir(parents=True)
+        return generation_id, str(path)
+
+    def publish(self, generation_id: str):
+        """Rend `generation_id` active d'un seul coup et date le retrait de la précédente."""
+        if not (self.generations_dir / generation_id).is_dir():
+            raise ValueError(f"Unknown index generation: {generation_id}")
+        previous = self.current_id()
+        # Remplacement atomique : un lecteur voit l'ancienne ou la nouvelle génération
+        tmp_path = self.root / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(generation_id)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.current_file)
+        if previous is not None and previous != generation_id:
+            self._mark(previous, RETIRED_MARKER)
+
+    def mark_failed(self, generation_id: str):
+        self._mark(generation_id, FAILED_MARKER)
+
+    def _mark(self, generation_id: str, marker: str):
+        path = self.generations_dir / generation_id
+        if path.is_dir():
+            (path / marker).write_text(str(time.time()), encoding="utf-8")
+
+    def list(self) -> List[str]:
+        if not self.generations_dir.exists():
+            return []
+        return sorted(path.name for path in self.generations_dir.iterdir() if path.is_dir())
+
+    def cleanup(self, grace_seconds: float = 600.0) -> List[str]:
+        """
+        Supprime les générations retirées ou rejetées depuis plus de
+        `grace_seconds`. Une génération sans marqueur (reconstruction en
+        cours ou interrompue) n'est jamais supprimée.
+
+        Returns:
+            Ids des générations supprimées
+        """
+        current = self.current_id()
+        removed = []
+        for generation_id in self.list():
+            if generation_id == current:
+                continue
+            path = self.generations_dir / generation_id
+            for marker in (RETIRED_MARKER, FAILED_MARKER):
+                marker_path = path / marker
+                if not marker_path.exists():
+                    continue
+                marked_at = float(marker_path.read_text(encoding="utf-8") or 0)
+                if time.time() - marked_at >= grace_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed.append(generation_id)
+                break
+        return removed
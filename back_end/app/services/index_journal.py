@@ -0,0 +1,311 @@
+"""
+Journal d'indexation transactionnel (SQLite, mode WAL).
+
+Remplace `index_metadata.json`, qui n'était écrit qu'à la fin d'une
+indexation complète : un arrêt en cours de route perdait la trace de tout ce
+qui avait déjà été encodé et écrit dans la collection. Ici chaque fichier
+est validé dans sa propre transaction dès que ses chunks sont écrits.
+
+Tables :
+    - `files(file_key, hash, size, mtime_ns, chunk_count, last_indexed, run_id)` ;
+    - `chunks(file_key, position, chunk_id)` : les IDs d'un fichier, dans
+      l'ordre du document ;
+    - `runs(run_id, started_at, finished_at, status, force, shard)` : une
+      exécution restée "running" a été interrompue (crash, Ctrl-C) et peut
+      être reprise.
+
+Les méthodes sont synchrones et rapides (une transaction par fichier) :
+l'indexeur les appelle depuis la boucle asyncio.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class IndexJournal:
+    """
+    État persistant de l'indexation : fichiers indexés, leurs chunks et les exécutions.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                file_key TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                chunk_count INTEGER NOT NULL,
+                last_indexed REAL NOT NULL,
+                run_id INTEGER
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                file_key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (file_key, position)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_last_indexed ON files(last_indexed)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                status TEXT NOT NULL,
+                force INTEGER NOT NULL,
+                shard TEXT
+            )
+            """
+        )
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                statements(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Fichiers
+
+    def get_file(self, file_key: str) -> Optional[Dict[str, Any]]:
+        """Entrée d'un fichier (sans ses chunks), ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash, size, mtime_ns, chunk_count, last_indexed, run_id"
+                " FROM files WHERE file_key = ?",
+                (file_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("hash", "size", "mtime_ns", "chunk_count", "last_indexed", "run_id"), row))
+
+    def chunk_ids(self, file_key: str) -> List[str]:
+        """IDs des chunks d'un fichier, dans l'ordre du document."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE file_key = ? ORDER BY position", (file_key,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def file_keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT file_key FROM files")]
+
+    def file_keys_under(self, file_key: str) -> List[str]:
+        """`file_key` lui-même et, s'il s'agit d'un répertoire, les fichiers qu'il contient."""
+        prefix = file_key.rstrip("/") + "/"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_key FROM files WHERE file_key = ? OR substr(file_key, 1, ?) = ?",
+                (file_key, len(prefix), prefix),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def all_chunk_ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks")}
+
+    def files_indexed_since(self, timestamp: float) -> List[str]:
+        """Fichiers (ré)indexés depuis `timestamp` (secondes epoch)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_key FROM files WHERE last_indexed >= ? ORDER BY last_indexed",
+                (timestamp,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def total_chunks(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM files").fetchone()[0]
+
+    def record_file(
+        self,
+        file_key: str,
+        file_hash: str,
+        chunk_ids: List[str],
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None,
+        run_id: Optional[int] = None,
+    ):
+        """Valide un fichier indexé et ses chunks en une transaction."""
+        def statements(conn):
+            conn.execute("DELETE FROM chunks WHERE file_key = ?", (file_key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO files"
+                " (file_key, hash, size, mtime_ns, chunk_count, last_indexed, run_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_key, file_hash, size, mtime_ns, len(chunk_ids), time.time(), run_id),
+            )
+            conn.executemany(
+                "INSERT INTO chunks (file_key, position, chunk_id) VALUES (?, ?, ?)",
+                [(file_key, position, chunk_id) for position, chunk_id in enumerate(chunk_ids)],
+            )
+        self._transaction(statements)
+
+    def touch_file(self, file_key: str, size: int, mtime_ns: int, run_id: Optional[int] = None):
+        """Contenu inchangé : seuls la taille, la date et l'exécution sont mises à jour."""
+        def statements(conn):
+            conn.execute(
+                "UPDATE files SET size = ?, mtime_ns = ?, run_id = COALESCE(?, run_id)"
+                " WHERE file_key = ?",
+                (size, mtime_ns, run_id, file_key),
+            )
+        self._transaction(statements)
+
+    def remove_files(self, file_keys: Iterable[str]):
+        file_keys = list(file_keys)
+
+        def statements(conn):
+            conn.executemany("DELETE FROM chunks WHERE file_key = ?", [(key,) for key in file_keys])
+            conn.executemany("DELETE FROM files WHERE file_key = ?", [(key,) for key in file_keys])
+        self._transaction(statements)
+
+    def clear(self):
+        def statements(conn):
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM files")
+        self._transaction(statements)
+
+    # Exécutions
+
+    def begin_run(self, force: bool = False, shard: Optional[str] = None) -> int:
+        """
+        Ouvre une exécution. Les exécutions restées "running" (processus
+        tué) sont d'abord marquées "interrupted".
+        """
+        with self._lock:
+            self._conn.execute("UPDATE runs SET status = 'interrupted' WHERE status = 'running'")
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started_at, status, force, shard) VALUES (?, 'running', ?, ?)",
+                (time.time(), int(force), shard),
+            )
+            return cursor.lastrowid
+
+    def resume_run(self) -> Optional[Dict[str, Any]]:
+        """
+        Rouvre la dernière exécution interrompue, ou None s'il n'y en a pas.
+
+        Returns:
+            {"run_id", "force", "shard"} de l'exécution reprise
+        """
+        with self._lock:
+            self._conn.execute("UPDATE runs SET status = 'interrupted' WHERE status = 'running'")
+            row = self._conn.execute(
+                "SELECT run_id, force, shard FROM runs ORDER BY run_id DESC LIMIT 1"
+            ).fetchone()
+            if row is None or self._conn.execute(
+                "SELECT status FROM runs WHERE run_id = ?", (row[0],)
+            ).fetchone()[0] != "interrupted":
+                return None
+            self._conn.execute("UPDATE runs SET status = 'running' WHERE run_id = ?", (row[0],))
+        return {"run_id": row[0], "force": bool(row[1]), "shard": row[2]}
+
+    def finish_run(self, run_id: int, status: str = "completed"):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id),
+            )
+
+    def interrupted_run(self) -> Optional[Dict[str, Any]]:
+        """Dernière exécution si elle n'a pas terminé normalement."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, started_at, status, force, shard FROM runs ORDER BY run_id DESC LIMIT 1"
+            ).fetchone()
+        if row is None or row[2] == "completed":
+            return None
+        return dict(zip(("run_id", "started_at", "status", "force", "shard"), row))
+
+    # Import / export au format de l'ancien index_metadata.json
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            files = self._conn.execute(
+                "SELECT file_key, hash, size, mtime_ns, chunk_count, last_indexed FROM files"
+            ).fetchall()
+            chunks = self._conn.execute(
+                "SELECT file_key, chunk_id FROM chunks ORDER BY file_key, position"
+            ).fetchall()
+        chunk_ids: Dict[str, List[str]] = {}
+        for file_key, chunk_id in chunks:
+            chunk_ids.setdefault(file_key, []).append(chunk_id)
+        indexed_files = {
+            file_key: {
+                "hash": file_hash,
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "chunk_ids": chunk_ids.get(file_key, []),
+                "chunk_count": chunk_count,
+                "last_indexed": last_indexed,
+            }
+            for file_key, file_hash, size, mtime_ns, chunk_count, last_indexed in files
+        }
+        return {
+            "indexed_files": indexed_files,
+            "total_chunks": sum(info["chunk_count"] for info in indexed_files.values()),
+            "last_update": max((info["last_indexed"] for info in indexed_files.values()), default=None),
+        }
+
+    def load_dict(self, metadata: Dict[str, Any]):
+        """Remplace le contenu du journal (ex: snapshot, ancien fichier JSON)."""
+        def statements(conn):
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM files")
+            for file_key, info in metadata.get("indexed_files", {}).items():
+                chunk_ids = info.get("chunk_ids", [])
+                conn.execute(
+                    "INSERT INTO files"
+                    " (file_key, hash, size, mtime_ns, chunk_count, last_indexed, run_id)"
+                    " VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                    (
+                        file_key, info.get("hash", ""), info.get("size"), info.get("mtime_ns"),
+                        len(chunk_ids), info.get("last_indexed") or time.time(),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO chunks (file_key, position, chunk_id) VALUES (?, ?, ?)",
+                    [(file_key, position, chunk_id) for position, chunk_id in enumerate(chunk_ids)],
+                )
+        self._transaction(statements)
+
+    def import_json(self, json_path: Path) -> bool:
+        """
+        Reprend un ancien `index_metadata.json` si le journal est vide ; le
+        fichier est renommé en `.migrated`.
+        """
+        if not json_path.exists() or self.file_keys():
+            return False
+        with open(json_path, "r", encoding="utf-8") as f:
+            self.load_dict(json.load(f))
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
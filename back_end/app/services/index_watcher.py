@@ -0,0 +1,190 @@
+"""
+Indexation incrémentale en continu (mode --watch).
+
+Le répertoire de données est surveillé (inotify via `watchfiles`, ou un
+parcours périodique des dates de modification si `watchfiles` est absent
+ou si le polling est forcé). Les modifications sont regroupées jusqu'à un
+moment de calme, pour qu'une rafale d'écritures (un passage du scraper)
+donne un seul lot, puis seuls les fichiers touchés repassent par le
+pipeline d'indexation ; les chunks des fichiers supprimés sont retirés.
+
+Chaque écriture incrémente la génération de l'index : l'API invalide son
+cache de résultats et voit les nouveaux documents sans redémarrer.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+
+def _watch_filter(change, path: str) -> bool:
+    # Les répertoires (ajoutés ou supprimés) passent : leurs fichiers sont recherchés à l'indexation
+    return path.endswith(".md") or not os.path.isfile(path)
+
+
+class IndexWatcher:
+    """
+    Surveille `indexer.data_dir` et réindexe les fichiers modifiés par lots.
+
+    Args:
+        indexer: `DocumentIndexingService`
+        debounce: Secondes sans nouvelle modification avant d'indexer un lot
+        max_delay: Délai maximal entre la première modification d'un lot et
+            son indexation, même si les écritures continuent
+        poll_interval: Période du parcours en mode polling (secondes)
+        force_polling: Parcours périodique même si inotify est disponible
+        initial_scan: Indexation complète au démarrage, pour rattraper les
+            modifications faites pendant l'arrêt du démon
+    """
+
+    def __init__(
+        self,
+        indexer,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        poll_interval: float = 1.0,
+        force_polling: bool = False,
+        initial_scan: bool = True,
+    ):
+        self.indexer = indexer
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.initial_scan = initial_scan
+        self.batches = 0
+
+    @property
+    def uses_polling(self) -> bool:
+        if self.force_polling:
+            return True
+        try:
+            import watchfiles  # noqa: F401
+        except ImportError:
+            return True
+        return False
+
+    async def run(
+        self,
+        stop_event: Optional[asyncio.Event] = None,
+        on_batch: Optional[Callable[[Set[Path], Dict[str, Any]], None]] = None,
+    ):
+        """
+        Boucle jusqu'à `stop_event` (ou l'annulation) ; `on_batch` reçoit
+        les chemins de chaque lot et les statistiques de son indexation.
+        """
+        stop_event = stop_event or asyncio.Event()
+        changes: asyncio.Queue = asyncio.Queue()
+        # Surveillance lancée avant le parcours initial : rien n'est manqué entre les deux
+        producer = asyncio.create_task(self._produce(changes, stop_event))
+        try:
+            if self.initial_scan:
+                await self.indexer.index_all_documents()
+            mode = "polling" if self.uses_polling else "inotify"
+            print(f"Surveillance de {self.indexer.data_dir} ({mode})...")
+            while True:
+                paths = await self._next_batch(changes, stop_event, producer)
+                if paths is None:
+                    break
+                # Reconstruction publiée entre-temps : rattrapage complet sur la
+                # nouvelle génération (les fichiers inchangés ne sont pas relus)
+                if self.indexer.follow_generation():
+                    stats = await self.indexer.index_all_documents()
+                else:
+                    stats = await self.indexer.index_paths(paths)
+                self.batches += 1
+                print(
+                    f"{len(paths)} chemin(s) modifié(s) : {stats['indexed_files']} fichier(s) "
+                    f"réindexé(s), {stats['deleted_files']} supprimé(s), "
+                    f"{stats['embedded_chunks']} chunk(s) encodé(s)"
+                )
+                if on_batch is not None:
+                    on_batch(paths, stats)
+        finally:
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+
+    async def _next_batch(
+        self,
+        changes: asyncio.Queue,
+        stop_event: asyncio.Event,
+        producer: asyncio.Task,
+    ) -> Optional[Set[Path]]:
+        """
+        Attend une modification puis regroupe les suivantes jusqu'à
+        `debounce` secondes de calme (au plus `max_delay`). None à l'arrêt.
+        """
+        get = asyncio.ensure_future(changes.get())
+        stop = asyncio.ensure_future(stop_event.wait())
+        try:
+            await asyncio.wait({get, stop, producer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+            if not get.done():
+                get.cancel()
+        if producer.done():
+            # Erreur de surveillance : remontée plutôt que d'attendre indéfiniment
+            producer.result()
+        if not get.done() or get.cancelled():
+            return None
+
+        paths = set(get.result())
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            timeout = min(self.debounce, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                paths |= await asyncio.wait_for(changes.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return paths
+
+    async def _produce(self, changes: asyncio.Queue, stop_event: asyncio.Event):
+        if self.uses_polling:
+            await self._poll(changes, stop_event)
+        else:
+            await self._watch(changes, stop_event)
+
+    async def _watch(self, changes: asyncio.Queue, stop_event: asyncio.Event):
+        from watchfiles import awatch
+
+        self.indexer.data_dir.mkdir(parents=True, exist_ok=True)
+        # watchfiles regroupe déjà les événements très rapprochés ; le
+        # regroupement des rafales est fait par `_next_batch`
+        async for batch in awatch(
+            self.indexer.data_dir,
+            watch_filter=_watch_filter,
+            debounce=200,
+            stop_event=stop_event,
+        ):
+            await changes.put({Path(path) for _, path in batch})
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        if not self.indexer.data_dir.exists():
+            return snapshot
+        for path in self.indexer.iter_markdown_files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    async def _poll(self, changes: asyncio.Queue, stop_event: asyncio.Event):
+        """Repli sans inotify : compare taille et date des fichiers à chaque période."""
+        previous = await asyncio.to_thread(self._scan)
+        while not stop_event.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+            current = await asyncio.to_thread(self._scan)
+            changed = {path for path, stat in current.items() if previous.get(path) != stat}
+            changed |= previous.keys() - current.keys()
+            previous = current
+            if changed:
+                await changes.put(changed)
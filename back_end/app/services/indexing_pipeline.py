@@ -0,0 +1,352 @@
+"""
+Pipeline d'indexation concurrent : découverte → découpage → embeddings → écriture.
+
+Étapes, reliées par des files bornées (la mémoire reste plafonnée quelle
+que soit la taille du corpus) :
+    1. découverte : les fichiers sont consommés au fil de l'eau depuis un
+       itérateur, sans liste complète préalable ;
+    2. lecture, hachage et découpage dans un pool de processus (un fichier
+       inchangé est lu une seule fois puis écarté) ;
+    3. regroupement des chunks de plusieurs fichiers en lots pleins pour
+       l'API d'embeddings, avec un nombre borné de lots en vol ;
+    4. un seul écrivain qui insère chaque lot dans la base vectorielle puis
+       supprime les anciens chunks des fichiers terminés.
+
+Les IDs de chunks dérivent de leur contenu : pour un fichier modifié, les
+chunks déjà présents sous le même ID ne sont pas ré-encodés, seules leurs
+métadonnées sont rafraîchies.
+
+Ce module ne dépend que du chunker : les processus du pool l'importent sans
+charger la base vectorielle.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .indexing_telemetry import IndexingTelemetry
+from .search_filters import build_chunk_metadata
+from .text_chunker import DocumentIndexer, MarkdownChunker, TextChunk
+
+
+def enhance_chunk_text(chunk: TextChunk) -> str:
+    """Améliore le texte du chunk avec du contexte des métadonnées."""
+    enhanced_text = chunk.content
+
+    # Ajouter le titre de la section si disponible
+    section_header = chunk.metadata.get('section_header', '')
+    if section_header and section_header not in enhanced_text:
+        enhanced_text = f"Section: {section_header}\n\n{enhanced_text}"
+
+    # Ajouter le titre du document si disponible
+    doc_title = chunk.metadata.get('title', '')
+    if doc_title and doc_title not in enhanced_text and doc_title != section_header:
+        enhanced_text = f"Document: {doc_title}\n{enhanced_text}"
+
+    return enhanced_text
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def prepare_file(
+    path: str,
+    chunker: MarkdownChunker,
+    known_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Lit, hache et découpe un fichier (exécuté dans un processus du pool).
+
+    Returns:
+        {"hash", "unchanged"} si le contenu a le hash `known_hash`, sinon
+        {"hash", "ids", "texts", "metadatas"} ; avec dans les deux cas les
+        durées de lecture/hachage et de découpage ("timings")
+    """
+    start = time.perf_counter()
+    file_path = Path(path)
+    content = file_path.read_text(encoding='utf-8')
+    file_hash = hash_content(content)
+    timings = {"hash": time.perf_counter() - start}
+    if known_hash is not None and file_hash == known_hash:
+        return {"hash": file_hash, "unchanged": True, "timings": timings}
+
+    start = time.perf_counter()
+
+    ids, texts, metadatas = [], [], []
+    occurrences: Dict[str, int] = {}
+    for i, chunk in enumerate(chunker.chunk_markdown_content(content, file_path)):
+        text = enhance_chunk_text(chunk)
+        # ID dérivé du texte encodé ; un contenu répété reçoit un suffixe
+        base_id = DocumentIndexer.generate_chunk_id(chunk, text)
+        occurrence = occurrences.get(base_id, 0)
+        occurrences[base_id] = occurrence + 1
+        ids.append(DocumentIndexer.generate_chunk_id(chunk, text, occurrence))
+        texts.append(text)
+        # La position sert à recoller les chunks voisins
+        chunk.metadata["chunk_index"] = i
+        metadatas.append(build_chunk_metadata(chunk.metadata))
+    timings["chunk"] = time.perf_counter() - start
+    return {"hash": file_hash, "ids": ids, "texts": texts, "metadatas": metadatas, "timings": timings}
+
+
+@dataclass
+class FileJob:
+    """Un fichier à (ré)indexer et son avancement dans le pipeline."""
+    key: str
+    path: Path
+    previous_ids: List[str] = field(default_factory=list)
+    known_hash: Optional[str] = None
+    # False pour une réindexation forcée : tous les chunks sont ré-encodés
+    reuse_existing: bool = True
+    size: Optional[int] = None
+    mtime_ns: Optional[int] = None
+    hash: str = ""
+    ids: List[str] = field(default_factory=list)
+    # Chunks déjà indexés à l'identique : (id, texte, métadonnées), non ré-encodés
+    kept: List[tuple] = field(default_factory=list)
+    new_chunks: int = 0
+    unchanged: bool = False
+    error: Optional[str] = None
+    remaining: int = 0
+
+
+@dataclass
+class _Batch:
+    texts: List[str] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    owners: List[FileJob] = field(default_factory=list)
+    # Fichiers dont le dernier chunk (ou aucun chunk) est dans ce lot
+    finished: List[FileJob] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+    error: Optional[str] = None
+
+
+def default_chunk_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+class IndexingPipeline:
+    """
+    Indexe un flux de fichiers avec des étapes concurrentes et un seul écrivain.
+
+    Args:
+        vector_service: `VectorService` ou index partitionné
+        chunker: Découpeur (transmis aux processus du pool)
+        chunk_workers: Processus de découpage (0 : découpage dans un thread)
+        embed_batch_size: Chunks par appel d'embeddings
+        embed_concurrency: Lots d'embeddings en vol au maximum
+        queue_size: Capacité des files entre étapes
+        telemetry: Mesures par étape de l'exécution (créées si absentes)
+    """
+
+    def __init__(
+        self,
+        vector_service,
+        chunker: MarkdownChunker,
+        chunk_workers: Optional[int] = None,
+        embed_batch_size: int = 128,
+        embed_concurrency: int = 4,
+        queue_size: int = 32,
+        telemetry: Optional[IndexingTelemetry] = None,
+    ):
+        self.vector_service = vector_service
+        self.chunker = chunker
+        self.chunk_workers = default_chunk_workers() if chunk_workers is None else chunk_workers
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.queue_size = queue_size
+        self.telemetry = telemetry or IndexingTelemetry(getattr(vector_service, "encoder", None))
+
+    def _make_executor(self) -> Optional[Executor]:
+        if self.chunk_workers <= 0:
+            return None
+        # "spawn" : le processus parent a des threads (pool ChromaDB)
+        return ProcessPoolExecutor(
+            max_workers=self.chunk_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def run(self, jobs: Iterable[FileJob], on_done: Callable[[FileJob], None]):
+        """
+        Indexe les fichiers de `jobs` ; `on_done` est appelé une fois par
+        fichier (inchangé, indexé ou en erreur), depuis la boucle asyncio.
+        """
+        prepared: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=self.embed_concurrency)
+        executor = self._make_executor()
+        tasks = [
+            asyncio.create_task(self._prepare(
+                self.telemetry.timed_iter("discover", jobs), prepared, executor, on_done
+            )),
+            asyncio.create_task(self._embed(prepared, embedded)),
+            asyncio.create_task(self._write(embedded, on_done)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    async def _prepare(self, jobs, prepared: asyncio.Queue, executor, on_done):
+        """Étapes 1 et 2 : découverte au fil de l'eau, lecture, hachage et découpage."""
+        loop = asyncio.get_running_loop()
+        in_flight: Dict[asyncio.Future, FileJob] = {}
+        limit = max(1, self.chunk_workers) * 2
+
+        async def drain(return_when):
+            done, _ = await asyncio.wait(in_flight, return_when=return_when)
+            for future in done:
+                job = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    job.error = f"Erreur avec {job.path}: {e}"
+                    on_done(job)
+                    continue
+                for stage, seconds in result.get("timings", {}).items():
+                    self.telemetry.observe(stage, seconds)
+                job.hash = result["hash"]
+                if result.get("unchanged"):
+                    job.unchanged = True
+                    on_done(job)
+                    continue
+                await prepared.put((job, result))
+
+        for job in jobs:
+            future = loop.run_in_executor(
+                executor, prepare_file, str(job.path), self.chunker, job.known_hash
+            )
+            in_flight[future] = job
+            if len(in_flight) >= limit:
+                await drain(asyncio.FIRST_COMPLETED)
+        if in_flight:
+            await drain(asyncio.ALL_COMPLETED)
+        await prepared.put(None)
+
+    async def _embed(self, prepared: asyncio.Queue, embedded: asyncio.Queue):
+        """Étape 3 : lots pleins de chunks de plusieurs fichiers, concurrence bornée."""
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        pending: List[asyncio.Task] = []
+        batch = _Batch()
+
+        encoder = self.vector_service.encoder
+        estimate = getattr(encoder, "estimate_tokens", None)
+
+        async def encode(batch: _Batch):
+            try:
+                if batch.texts:
+                    start = time.perf_counter()
+                    batch.embeddings = await encoder.encode_batch(batch.texts)
+                    self.telemetry.record_embed(batch.texts, time.perf_counter() - start, estimate)
+            except Exception as e:
+                batch.error = str(e)
+            finally:
+                semaphore.release()
+            await embedded.put(batch)
+
+        async def flush():
+            nonlocal batch
+            await semaphore.acquire()
+            pending[:] = [task for task in pending if not task.done()]
+            pending.append(asyncio.create_task(encode(batch)))
+            batch = _Batch()
+
+        while True:
+            item = await prepared.get()
+            if item is None:
+                break
+            job, result = item
+            job.ids = result["ids"]
+            # IDs dérivés du contenu : seuls les chunks absents de l'index sont encodés
+            previous = set(job.previous_ids) if job.reuse_existing else set()
+            new = []
+            for doc_id, text, metadata in zip(result["ids"], result["texts"], result["metadatas"]):
+                if doc_id in previous:
+                    job.kept.append((doc_id, text, metadata))
+                else:
+                    new.append((doc_id, text, metadata))
+            job.new_chunks = job.remaining = len(new)
+            if not new:
+                batch.finished.append(job)
+            for i, (doc_id, text, metadata) in enumerate(new):
+                batch.texts.append(text)
+                batch.ids.append(doc_id)
+                batch.metadatas.append(metadata)
+                batch.owners.append(job)
+                if i == len(new) - 1:
+                    batch.finished.append(job)
+                if len(batch.texts) >= self.embed_batch_size:
+                    await flush()
+        if batch.texts or batch.finished:
+            await flush()
+        await asyncio.gather(*pending)
+        await embedded.put(None)
+
+    async def _write(self, embedded: asyncio.Queue, on_done):
+        """Étape 4 : seul écrivain de la base vectorielle."""
+        # Les lots peuvent arriver dans le désordre : un fichier n'est
+        # terminé qu'une fois tous ses chunks écrits
+        waiting: List[FileJob] = []
+        while True:
+            batch = await embedded.get()
+            if batch is None:
+                break
+            if batch.error is None and batch.texts:
+                try:
+                    with self.telemetry.stage("write"):
+                        await self.vector_service.upsert_batch(
+                            batch.texts, batch.ids, batch.embeddings, batch.metadatas
+                        )
+                    self.telemetry.count("chunks_written", len(batch.texts))
+                except Exception as e:
+                    batch.error = str(e)
+            for job in batch.owners:
+                job.remaining -= 1
+                if batch.error is not None and job.error is None:
+                    job.error = f"Échec de l'indexation de {job.path}: {batch.error}"
+            waiting.extend(batch.finished)
+
+            completed = [job for job in waiting if job.remaining == 0]
+            waiting = [job for job in waiting if job.remaining > 0]
+            await self._finish(completed, on_done)
+        await self._finish(waiting, on_done)
+
+    async def _finish(self, jobs: List[FileJob], on_done):
+        """
+        Rafraîchit les métadonnées (position, titres) des chunks conservés
+        puis supprime en une fois les chunks disparus des fichiers terminés.
+        """
+        kept, stale = [], []
+        for job in jobs:
+            if job.error is None:
+                kept.extend(job.kept)
+                current = set(job.ids)
+                stale.extend(doc_id for doc_id in job.previous_ids if doc_id not in current)
+        try:
+            if kept:
+                ids, texts, metadatas = (list(column) for column in zip(*kept))
+                with self.telemetry.stage("write"):
+                    await self.vector_service.update_metadatas(ids, texts, metadatas)
+            if stale:
+                with self.telemetry.stage("delete"):
+                    await self.vector_service.delete_many(stale)
+                self.telemetry.count("chunks_deleted", len(stale))
+        except Exception as e:
+            for job in jobs:
+                if job.error is None:
+                    job.error = f"Erreur lors de la mise à jour des chunks de {job.path}: {e}"
+        for job in jobs:
+            on_done(job)
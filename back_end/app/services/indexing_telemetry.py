@@ -0,0 +1,307 @@
+"""
+Télémétrie d'une exécution d'indexation.
+
+Durées par étape du pipeline, avec histogrammes :
+    - "discover" : parcours du répertoire, stat et lecture du journal ;
+    - "hash" : lecture et hachage d'un fichier (processus du pool) ;
+    - "chunk" : découpage d'un fichier (processus du pool) ;
+    - "embed" : un lot d'embeddings (attente de l'API et des nouveaux essais comprise) ;
+    - "write" : écriture d'un lot ou rafraîchissement des métadonnées ;
+    - "delete" : suppression des chunks périmés ou des fichiers disparus.
+
+S'y ajoutent les débits (chunks/s, tokens/s), la distribution de la taille
+des lots et les appels de l'encodeur (nouveaux essais, rate-limit) : de quoi
+savoir si une exécution lente attendait le découpage, l'API d'embeddings ou
+les écritures.
+
+Le rapport est un dict JSON (`report`) écrit à la fin de chaque exécution ;
+`MetricsServer` expose en plus les mêmes mesures au format Prometheus
+pendant l'exécution.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+STAGES = ("discover", "hash", "chunk", "embed", "write", "delete")
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+# Compteurs relevés sur l'encodeur (`Encoder`) : nom dans le rapport -> attribut
+ENCODER_COUNTERS = {
+    "requests": "request_count",
+    "retries": "retry_count",
+    "rate_limited": "rate_limited_count",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # Même estimation que `Encoder.estimate_tokens` (~3 caractères par token)
+    return len(text) // 3 + 1
+
+
+class Histogram:
+    """
+    Histogramme cumulatif à la Prometheus, avec un échantillon borné des
+    dernières valeurs pour les percentiles du rapport.
+    """
+
+    def __init__(self, buckets: Iterable[float], window: int = 10000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self._recent.append(value)
+
+    def cumulative(self) -> List[int]:
+        return np.cumsum(self.counts).tolist() if self.counts else []
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self._recent:
+            return {}
+        p50, p95, p99 = np.percentile(np.asarray(self._recent), [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class IndexingTelemetry:
+    """
+    Mesures d'une exécution : alimentées par le pipeline depuis la boucle
+    asyncio, lues par le rapport final et par `MetricsServer` (autre thread).
+
+    Args:
+        encoder: Encodeur dont les compteurs `request_count`, `retry_count`
+            et `rate_limited_count` sont relevés (différence depuis le début
+            de l'exécution) ; un encodeur sans ces compteurs compte pour 0
+        run_id: Exécution du journal d'indexation, reprise dans le rapport
+    """
+
+    def __init__(self, encoder=None, run_id: Optional[int] = None):
+        self.encoder = encoder
+        self.run_id = run_id
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stages = {stage: Histogram(DURATION_BUCKETS) for stage in STAGES}
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.counters = {
+            "files_indexed": 0,
+            "files_skipped": 0,
+            "files_failed": 0,
+            "files_deleted": 0,
+            "chunks_embedded": 0,
+            "tokens_embedded": 0,
+            "chunks_written": 0,
+            "chunks_deleted": 0,
+        }
+        self._encoder_baseline = self._encoder_counters()
+
+    def _encoder_counters(self) -> Dict[str, int]:
+        return {
+            name: getattr(self.encoder, attribute, 0)
+            for name, attribute in ENCODER_COUNTERS.items()
+        }
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Chronomètre une étape (durée enregistrée même en cas d'échec)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """Chronomètre la production de chaque élément d'un itérateur (ex: découverte)."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.observe(stage, time.perf_counter() - start)
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def record_embed(self, texts: List[str], seconds: float, estimate: Optional[Callable[[str], int]] = None):
+        estimate = estimate or estimate_tokens
+        tokens = sum(estimate(text) for text in texts)
+        with self._lock:
+            self.stages["embed"].observe(seconds)
+            self.batch_sizes.observe(len(texts))
+            self.counters["chunks_embedded"] += len(texts)
+            self.counters["tokens_embedded"] += tokens
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def finish(self):
+        self._end = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self._end if self._end is not None else time.perf_counter()) - self._start
+
+    def embedding_calls(self) -> Dict[str, int]:
+        current = self._encoder_counters()
+        return {name: current[name] - self._encoder_baseline[name] for name in current}
+
+    def report(self) -> Dict[str, Any]:
+        """Rapport sérialisable en JSON (durées en millisecondes)."""
+        elapsed = self.elapsed
+        with self._lock:
+            stages = {}
+            for name, histogram in self.stages.items():
+                stages[name] = {
+                    "count": histogram.count,
+                    "total_ms": round(histogram.sum * 1000, 3),
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 3) if histogram.count else 0.0,
+                    "max_ms": round(histogram.max * 1000, 3),
+                    **{key: round(value * 1000, 3) for key, value in histogram.percentiles().items()},
+                    "buckets_ms": {
+                        **{
+                            f"{bound * 1000:g}": count
+                            for bound, count in zip(histogram.buckets, histogram.counts)
+                        },
+                        "+Inf": histogram.count - sum(histogram.counts),
+                    },
+                }
+            batch_sizes = {
+                **{
+                    str(bound): count
+                    for bound, count in zip(self.batch_sizes.buckets, self.batch_sizes.counts)
+                },
+                "+Inf": self.batch_sizes.count - sum(self.batch_sizes.counts),
+            }
+            counters = dict(self.counters)
+            batches = self.batch_sizes.count
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "elapsed_s": round(elapsed, 3),
+            "stages": stages,
+            "throughput": {
+                "chunks_per_s": round(counters["chunks_embedded"] / elapsed, 3) if elapsed else 0.0,
+                "tokens_per_s": round(counters["tokens_embedded"] / elapsed, 3) if elapsed else 0.0,
+                "files_per_s": round(counters["files_indexed"] / elapsed, 3) if elapsed else 0.0,
+            },
+            "embedding": {
+                "batches": batches,
+                "mean_batch_size": round(counters["chunks_embedded"] / batches, 3) if batches else 0.0,
+                "batch_sizes": batch_sizes,
+                **self.embedding_calls(),
+            },
+            "counters": counters,
+        }
+
+    def write_report(self, path: str) -> Dict[str, Any]:
+        report = self.report()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def summary(self) -> str:
+        """Une ligne par étape : nombre, total et p95."""
+        lines = []
+        for name, stage in self.report()["stages"].items():
+            if stage["count"]:
+                lines.append(
+                    f"   {name:<8} {stage['count']:>6} x  total {stage['total_ms'] / 1000:8.2f}s"
+                    f"  p95 {stage.get('p95', 0.0):8.1f}ms"
+                )
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """Mesures au format d'exposition texte de Prometheus."""
+        lines = []
+
+        def histogram(name: str, hist: Histogram, labels: str = ""):
+            for bound, count in zip(hist.buckets, hist.cumulative()):
+                sep = "," if labels else ""
+                lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            sep = "," if labels else ""
+            lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {hist.sum}")
+            lines.append(f"{name}_count{suffix} {hist.count}")
+
+        with self._lock:
+            lines.append("# HELP indexing_stage_duration_seconds Durée des étapes du pipeline d'indexation")
+            lines.append("# TYPE indexing_stage_duration_seconds histogram")
+            for name, hist in self.stages.items():
+                histogram("indexing_stage_duration_seconds", hist, f'stage="{name}"')
+            lines.append("# HELP indexing_embed_batch_size Chunks par appel d'embeddings")
+            lines.append("# TYPE indexing_embed_batch_size histogram")
+            histogram("indexing_embed_batch_size", self.batch_sizes)
+            counters = dict(self.counters)
+        for name, value in counters.items():
+            lines.append(f"# TYPE indexing_{name}_total counter")
+            lines.append(f"indexing_{name}_total {value}")
+        for name, value in self.embedding_calls().items():
+            lines.append(f"# TYPE indexing_embedding_{name}_total counter")
+            lines.append(f"indexing_embedding_{name}_total {value}")
+        lines.append("# TYPE indexing_run_elapsed_seconds gauge")
+        lines.append(f"indexing_run_elapsed_seconds {self.elapsed}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Expose `/metrics` (format Prometheus) dans un thread, pendant toute la
+    durée du processus d'indexation.
+
+    Args:
+        source: Retourne la télémétrie de l'exécution en cours (ou None)
+        port: Port d'écoute (0 : port libre choisi par le système)
+    """
+
+    def __init__(self, source: Callable[[], Optional[IndexingTelemetry]], port: int = 9464, host: str = "0.0.0.0"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                telemetry = source()
+                body = (telemetry.prometheus() if telemetry is not None else "").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
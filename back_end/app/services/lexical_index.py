@@ -0,0 +1,212 @@
+"""
+Index lexical BM25 sur disque, tenu à jour avec l'index vectoriel.
+
+La recherche par embeddings rate les identifiants exacts collés par les
+utilisateurs (noms de modèles, codes d'erreur, méthodes du SDK). Cet index
+inversé, stocké dans une base SQLite (mode WAL) à côté de la collection, les
+retrouve sans aucun appel à l'API d'embeddings.
+
+Tables :
+    - `docs(doc_id, length, metadata)` : longueur en tokens et métadonnées
+      (JSON, pour appliquer les mêmes filtres `where` que la recherche
+      vectorielle) ;
+    - `postings(term, doc_id, tf)` : listes de postings, clé (term, doc_id).
+
+Comme `EmbeddingCache`, les méthodes sont synchrones : les appelants
+asynchrones passent par le pool de `ChromaExecutor`.
+"""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .numpy_store import matches_where
+
+
+# Un identifiant composé ("mistral-large-latest", "client.chat.complete")
+# est indexé tel quel et par morceaux
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/:]\w+)*")
+SUB_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte en termes (minuscules), identifiants composés inclus."""
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        parts = SUB_TOKEN_PATTERN.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Index inversé BM25 persistant, mis à jour document par document.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                metadata TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_postings_doc_id ON postings(doc_id)"
+        )
+
+    def _delete_rows(self, doc_ids: List[str]):
+        # SQLite limite le nombre de paramètres par requête
+        for start in range(0, len(doc_ids), 500):
+            batch = doc_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM docs WHERE doc_id IN ({placeholders})", batch)
+
+    def upsert(
+        self,
+        doc_ids: List[str],
+        texts: List[str],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ):
+        """Indexe (ou réindexe) des documents en une transaction."""
+        if not doc_ids:
+            return
+        metadatas = metadatas or [None] * len(doc_ids)
+        docs = []
+        postings = []
+        for doc_id, text, metadata in zip(doc_ids, texts, metadatas):
+            counts = Counter(tokenize(text or ""))
+            docs.append((doc_id, sum(counts.values()), json.dumps(metadata) if metadata else None))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(list(doc_ids))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO docs (doc_id, length, metadata) VALUES (?, ?, ?)", docs
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, doc_ids: List[str]):
+        """Retire des documents de l'index."""
+        if not doc_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(list(doc_ids))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()
+        return count
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Recherche BM25.
+
+        Args:
+            where: Filtre sur les métadonnées (format ChromaDB), appliqué aux
+                documents candidats avant le calcul des scores
+
+        Returns:
+            Les couples (doc_id, score) triés par score décroissant
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or n_results <= 0:
+            return []
+
+        with self._lock:
+            total_docs, total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+            ).fetchone()
+            if not total_docs:
+                return []
+            placeholders = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                "SELECT p.term, p.doc_id, p.tf, d.length, d.metadata "
+                "FROM postings p JOIN docs d ON d.doc_id = p.doc_id "
+                f"WHERE p.term IN ({placeholders})",
+                terms,
+            ).fetchall()
+
+        allowed: Dict[str, bool] = {}
+        postings: Dict[str, List[Tuple[str, int, int]]] = {}
+        for term, doc_id, tf, length, metadata in rows:
+            if where is not None:
+                if doc_id not in allowed:
+                    allowed[doc_id] = matches_where(json.loads(metadata) if metadata else None, where)
+                if not allowed[doc_id]:
+                    continue
+            postings.setdefault(term, []).append((doc_id, tf, length))
+
+        # La fréquence documentaire reste calculée sur tout le corpus
+        document_frequency = Counter(row[0] for row in rows)
+        average_length = total_length / total_docs
+        scores: Dict[str, float] = {}
+        for term, matches in postings.items():
+            df = document_frequency[term]
+            idf = math.log((total_docs - df + 0.5) / (df + 0.5) + 1)
+            for doc_id, tf, length in matches:
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n_results]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,17 +1,24 @@
-from mistralai import Mistral, SDKError
 from dotenv import load_dotenv
 
 import time 
 import os 
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 import asyncio
 
+# Import différé : `mistralai` n'est chargé qu'à la création du client
+if TYPE_CHECKING:
+    from mistralai import Mistral
+
+# Préfixe des messages renvoyés à la place d'une réponse en cas d'échec
+ERROR_PREFIX = "Error generating response: "
+
 class MistralService:
     def __init__(
         self,
         model_name: str | None = None,
         api_key: str | None = None,
         api_base: str | None = None,
+        client: "Mistral | None" = None,
     ):
         load_dotenv()
         self.model_name = (
@@ -22,7 +29,10 @@ class MistralService:
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
             raise ValueError("MISTRAL_API_KEY environment variable not set")
-        self.client = Mistral(api_key=self.api_key)
+        if client is None:
+            from mistralai import Mistral
+            client = Mistral(api_key=self.api_key)
+        self.client = client
 
 
     async def chat_complete_async(
@@ -33,7 +43,8 @@ class MistralService:
             retries: int = 5,
             backoff: float = 2.0
             ):
-        
+        from mistralai import SDKError
+
         for attempt in range(retries):
             try:
                 resp = await self.client.chat.complete_async(
@@ -78,6 +89,6 @@ class MistralService:
             
             return response.choices[0].message.content
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            return f"{ERROR_PREFIX}{str(e)}"
 
 
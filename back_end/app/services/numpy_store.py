@@ -0,0 +1,412 @@
+"""
+Moteur vectoriel exact en NumPy, adossé à une matrice memory-mappée.
+
+Pour quelques milliers de chunks, une recherche exacte (un produit
+matrice-vecteur puis `argpartition`) est plus simple et plus rapide que
+l'index HNSW + SQLite de ChromaDB. `NumpyCollection` reproduit le
+sous-ensemble de l'API `chromadb.Collection` utilisé par `VectorService`
+(add, upsert, update, delete, get, query, count) avec les mêmes formats de
+retour et la même distance (L2 au carré).
+
+Organisation sur disque (`<persist_directory>/<collection>.npstore/`) :
+    - `embeddings.<n>.bin` : matrice float32 (ou float16) contiguë, en mmap ;
+    - `state.json`         : version, dimension, nombre de lignes et tableaux
+                             annexes (IDs, documents, métadonnées) ;
+    - `lock`               : verrou inter-processus des écritures.
+
+Les lignes déjà écrites ne sont jamais modifiées : un ajout écrit après la
+dernière ligne, une suppression ou un remplacement marque l'ancienne ligne
+comme morte. Un lecteur qui travaille sur une version antérieure voit donc
+toujours des données cohérentes, et plusieurs workers partagent les mêmes
+pages mmap via le cache du système. Lorsque les lignes mortes dépassent un
+quart de la matrice, elle est compactée dans un nouveau fichier.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+STATE_FILE = "state.json"
+INITIAL_CAPACITY = 1024
+# Taille des blocs convertis en float32 lors d'une recherche sur une matrice float16
+FLOAT16_BLOCK_ROWS = 8192
+
+
+class NumpyCollection:
+    """
+    Collection vectorielle exacte compatible avec l'API de `chromadb.Collection`.
+    """
+
+    def __init__(self, name: str, persist_directory: str, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.name = name
+        self.directory = Path(persist_directory) / f"{name}.npstore"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+
+        self._lock = threading.RLock()
+        self._state_stamp = None
+        self._matrix: Optional[np.ndarray] = None
+        self._sq_norms: Optional[np.ndarray] = None
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._positions: Dict[str, int] = {}
+        self._state: Dict[str, Any] = {}
+
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # État partagé entre processus
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, open(self.directory / "lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Un autre processus a peut-être écrit depuis notre dernière lecture
+                self._refresh()
+                yield
+            except Exception:
+                # L'état en mémoire a pu diverger : le prochain accès relira le disque
+                self._state_stamp = None
+                raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Recharge l'état si un autre processus (ou instance) l'a modifié."""
+        path = self.directory / STATE_FILE
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if self._state_stamp is None:
+                self._load_state({
+                    "version": 0,
+                    "dtype": self.dtype,
+                    "dim": None,
+                    "rows": 0,
+                    "capacity": 0,
+                    "file": None,
+                    "ids": [],
+                    "documents": [],
+                    "metadatas": [],
+                })
+                self._state_stamp = (0, 0)
+            return
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._state_stamp:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self._load_state(state)
+        self._state_stamp = stamp
+
+    def _load_state(self, state: Dict[str, Any]):
+        self._state = state
+        self.dtype = state["dtype"]
+        self._ids = state["ids"]
+        self._documents = state["documents"]
+        self._metadatas = state["metadatas"]
+        self._positions = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        self._map_matrix()
+
+    def _map_matrix(self, new_rows: int = 0):
+        """(Re)mappe la matrice ; seules les `new_rows` dernières normes sont à calculer."""
+        rows = self._state["rows"]
+        if not self._state["file"] or not self._state["capacity"]:
+            self._matrix = None
+            self._sq_norms = np.zeros(0, dtype=np.float32)
+            return
+        self._matrix = np.memmap(
+            self.directory / self._state["file"],
+            dtype=self._state["dtype"],
+            mode="r",
+            shape=(self._state["capacity"], self._state["dim"]),
+        )
+        if new_rows and self._sq_norms is not None and len(self._sq_norms) == rows - new_rows:
+            self._sq_norms = np.concatenate([self._sq_norms, self._row_sq_norms(rows - new_rows, rows)])
+        else:
+            self._sq_norms = self._row_sq_norms(0, rows)
+
+    def _row_sq_norms(self, start: int, stop: int) -> np.ndarray:
+        block = np.asarray(self._matrix[start:stop], dtype=np.float32)
+        return np.einsum("ij,ij->i", block, block)
+
+    def _save_state(self):
+        self._state["version"] += 1
+        self._state["ids"] = self._ids
+        self._state["documents"] = self._documents
+        self._state["metadatas"] = self._metadatas
+        tmp_path = self.directory / f"{STATE_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / STATE_FILE)
+        stat = (self.directory / STATE_FILE).stat()
+        self._state_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    # ------------------------------------------------------------------
+    # Écriture des lignes
+    # ------------------------------------------------------------------
+
+    def _new_file_name(self) -> str:
+        return f"embeddings.{self._state['version'] + 1}.bin"
+
+    def _ensure_capacity(self, extra_rows: int, dim: int):
+        state = self._state
+        if state["dim"] is None:
+            state["dim"] = dim
+        elif state["dim"] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimension {state['dim']}")
+
+        needed = state["rows"] + extra_rows
+        if state["file"] and needed <= state["capacity"]:
+            return
+        capacity = max(INITIAL_CAPACITY, state["capacity"])
+        while capacity < needed:
+            capacity *= 2
+        if not state["file"]:
+            state["file"] = self._new_file_name()
+        # Agrandir le fichier ne touche pas aux pages déjà mappées par les lecteurs
+        itemsize = np.dtype(state["dtype"]).itemsize
+        with open(self.directory / state["file"], "ab") as f:
+            f.truncate(capacity * dim * itemsize)
+        state["capacity"] = capacity
+
+    def _append_rows(self, ids: List[str], embeddings: np.ndarray, documents: List[Optional[str]], metadatas: List[Optional[Dict[str, Any]]]):
+        self._ensure_capacity(len(ids), embeddings.shape[1])
+        start = self._state["rows"]
+        stop = start + len(ids)
+        writable = np.memmap(
+            self.directory / self._state["file"],
+            dtype=self._state["dtype"],
+            mode="r+",
+            shape=(self._state["capacity"], self._state["dim"]),
+        )
+        writable[start:stop] = embeddings
+        writable.flush()
+        del writable
+
+        for offset, doc_id in enumerate(ids):
+            self._kill(doc_id)
+            self._positions[doc_id] = start + offset
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._metadatas.extend(metadatas)
+        self._state["rows"] = stop
+        self._map_matrix(new_rows=len(ids))
+
+    def _kill(self, doc_id: str):
+        row = self._positions.pop(doc_id, None)
+        if row is not None:
+            self._ids[row] = None
+            self._documents[row] = None
+            self._metadatas[row] = None
+
+    def _maybe_compact(self):
+        rows = self._state["rows"]
+        alive = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+        if rows == 0 or rows - len(alive) <= rows // 4:
+            return
+        old_file = self._state["file"]
+        matrix = np.asarray(self._matrix[alive]) if alive else None
+        self._state.update({"rows": 0, "capacity": 0, "file": None})
+        ids = [self._ids[row] for row in alive]
+        documents = [self._documents[row] for row in alive]
+        metadatas = [self._metadatas[row] for row in alive]
+        self._ids, self._documents, self._metadatas, self._positions = [], [], [], {}
+        if matrix is not None:
+            self._state["file"] = self._new_file_name()
+            self._append_rows(ids, matrix, documents, metadatas)
+        else:
+            self._map_matrix()
+        # Les lecteurs qui ont encore l'ancien fichier mappé le gardent jusqu'au rechargement
+        if old_file and old_file != self._state["file"]:
+            (self.directory / old_file).unlink(missing_ok=True)
+
+    @staticmethod
+    def _as_matrix(embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        return matrix
+
+    # ------------------------------------------------------------------
+    # API compatible chromadb.Collection
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._positions)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Comme ChromaDB : les IDs déjà présents sont ignorés."""
+        with self._write_lock():
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._positions]
+            if keep:
+                self._write(ids, embeddings, documents, metadatas, keep)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        with self._write_lock():
+            self._write(ids, embeddings, documents, metadatas, range(len(ids)))
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        """Comme ChromaDB : les IDs absents sont ignorés, les champs omis conservés."""
+        with self._write_lock():
+            keep = [i for i, doc_id in enumerate(ids) if doc_id in self._positions]
+            if not keep:
+                return
+            rows = {i: self._positions[ids[i]] for i in keep}
+            if embeddings is None:
+                current = np.asarray(self._matrix[[rows[i] for i in keep]], dtype=np.float32)
+                embeddings = dict(zip(keep, current))
+            if documents is None:
+                documents = {i: self._documents[rows[i]] for i in keep}
+            if metadatas is None:
+                metadatas = {i: self._metadatas[rows[i]] for i in keep}
+            self._write(ids, embeddings, documents, metadatas, keep)
+
+    def _write(self, ids, embeddings, documents, metadatas, keep):
+        keep = list(keep)
+        # En cas d'IDs dupliqués dans un même appel, la dernière occurrence l'emporte
+        last = {ids[i]: i for i in keep}
+        keep = sorted(last.values())
+        matrix = self._as_matrix([embeddings[i] for i in keep])
+        self._append_rows(
+            [ids[i] for i in keep],
+            matrix,
+            [documents[i] if documents is not None else None for i in keep],
+            [metadatas[i] if metadatas is not None else None for i in keep],
+        )
+        self._maybe_compact()
+        self._save_state()
+
+    def delete(self, ids=None, where=None):
+        with self._write_lock():
+            targets = set(ids or [])
+            if where is not None:
+                targets |= {
+                    doc_id for doc_id, row in self._positions.items()
+                    if matches_where(self._metadatas[row], where)
+                }
+            if not any(doc_id in self._positions for doc_id in targets):
+                return
+            for doc_id in targets:
+                self._kill(doc_id)
+            self._maybe_compact()
+            self._save_state()
+
+    def _select_rows(self, ids=None, where=None) -> List[int]:
+        if ids is not None:
+            rows = [self._positions[doc_id] for doc_id in ids if doc_id in self._positions]
+        else:
+            rows = sorted(self._positions.values())
+        if where is not None:
+            rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+        return rows
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = include if include is not None else ["metadatas", "documents"]
+        with self._lock:
+            self._refresh()
+            rows = self._select_rows(ids, where)
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "embeddings": np.asarray(self._matrix[rows], dtype=np.float32) if "embeddings" in include and rows else ([] if "embeddings" in include else None),
+                "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+                "included": include,
+            }
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        """Recherche exacte ; plusieurs requêtes donnent un produit matrice-matrice."""
+        include = include if include is not None else ["metadatas", "documents", "distances"]
+        queries = self._as_matrix(query_embeddings)
+        with self._lock:
+            self._refresh()
+            candidates = np.asarray(self._select_rows(where=where), dtype=np.int64)
+            ids, documents, metadatas, distances, embeddings = [], [], [], [], []
+            if len(candidates) == 0:
+                empty = [[] for _ in range(len(queries))]
+                ids, documents, metadatas, distances, embeddings = empty, empty, empty, empty, empty
+            else:
+                all_distances = self._distances(queries, candidates)
+                k = min(n_results, len(candidates))
+                for row_distances in all_distances:
+                    top = np.argpartition(row_distances, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+                    top = top[np.argsort(row_distances[top], kind="stable")]
+                    rows = candidates[top]
+                    ids.append([self._ids[row] for row in rows])
+                    documents.append([self._documents[row] for row in rows])
+                    metadatas.append([self._metadatas[row] for row in rows])
+                    distances.append(row_distances[top].astype(float).tolist())
+                    if "embeddings" in include:
+                        embeddings.append(np.asarray(self._matrix[rows], dtype=np.float32))
+
+            return {
+                "ids": ids,
+                "documents": documents if "documents" in include else None,
+                "metadatas": metadatas if "metadatas" in include else None,
+                "distances": distances if "distances" in include else None,
+                "embeddings": embeddings if "embeddings" in include else None,
+                "included": include,
+            }
+
+    def _distances(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Distance L2 au carré : |q|² + |x|² - 2 q·x (comme ChromaDB)."""
+        contiguous = len(rows) == self._state["rows"]
+        if self.dtype == "float32":
+            matrix = self._matrix[: self._state["rows"]] if contiguous else self._matrix[rows]
+            dots = queries @ np.asarray(matrix).T
+        else:
+            dots = np.empty((len(queries), len(rows)), dtype=np.float32)
+            for start in range(0, len(rows), FLOAT16_BLOCK_ROWS):
+                block_rows = rows[start:start + FLOAT16_BLOCK_ROWS]
+                block = np.asarray(self._matrix[block_rows], dtype=np.float32)
+                dots[:, start:start + len(block_rows)] = queries @ block.T
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        distances = query_norms + self._sq_norms[rows][None, :] - 2 * dots
+        return np.maximum(distances, 0)
+
+
+def matches_where(metadata: Optional[Dict[str, Any]], where: Dict[str, Any]) -> bool:
+    """Évalue un filtre `where` au format ChromaDB ($and, $or, $eq, $ne, $in, $nin)."""
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq" and value != expected:
+                return False
+            if operator == "$ne" and value == expected:
+                return False
+            if operator == "$in" and value not in expected:
+                return False
+            if operator == "$nin" and value in expected:
+                return False
+    return True
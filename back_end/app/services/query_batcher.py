@@ -0,0 +1,113 @@
+"""
+Regroupement des embeddings de requêtes concurrentes.
+
+Sous charge, chaque appel à `/api/search` ou `/api/chat` encode sa propre
+requête. Le batcher retient les textes quelques millisecondes (ou jusqu'à
+N requêtes en attente) puis les envoie en un seul appel d'embeddings ;
+les requêtes identiques déjà en vol partagent le même résultat.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from .vector_service import Encoder
+
+
+class QueryEmbeddingBatcher:
+    """
+    Micro-batcher asyncio devant `Encoder`, compatible avec `Encoder.encode`.
+    """
+
+    def __init__(
+        self,
+        encoder: "Encoder",
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 32,
+    ):
+        self.encoder = encoder
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Références fortes : la boucle ne garde qu'une référence faible aux tâches
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.requests = 0
+        self.coalesced = 0
+        self.api_batches = 0
+
+    async def encode(self, text: str) -> List[List[float]]:
+        """Même contrat que `Encoder.encode` : une liste contenant un embedding."""
+        self.requests += 1
+        future = self._in_flight.get(text) or self._pending.get(text)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+
+        # shield : l'annulation d'un appelant ne doit pas annuler les autres
+        embedding = await asyncio.shield(future)
+        return [embedding]
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = {}
+        self._in_flight.update(batch)
+        self.api_batches += 1
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: Dict[str, asyncio.Future]):
+        texts = list(batch)
+        try:
+            embeddings = await self.encoder.encode_batch(texts)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for text, embedding in zip(texts, embeddings):
+                if not batch[text].done():
+                    batch[text].set_result(embedding)
+        finally:
+            for text in texts:
+                if self._in_flight.get(text) is batch[text]:
+                    del self._in_flight[text]
+
+    async def aclose(self):
+        """Annule le flush programmé et fait échouer les requêtes encore en attente."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        error = RuntimeError("Query embedding batcher closed")
+        for future in list(self._pending.values()) + list(self._in_flight.values()):
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "api_batches": self.api_batches,
+        }
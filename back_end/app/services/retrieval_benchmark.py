@@ -0,0 +1,359 @@
+"""
+Banc d'essai hors ligne de la recherche : rappel contre latence.
+
+Un jeu de requêtes étiquetées est tiré du corpus lui-même :
+    - les titres de section ("header"), pertinents pour les chunks de cette
+      section du même fichier ;
+    - une phrase par chunk ("sentence"), pertinente pour les chunks du même
+      fichier qui la contiennent.
+
+La pertinence est jugée sur le contenu et non sur les IDs : le même jeu de
+requêtes sert à comparer des découpages différents.
+
+Chaque configuration (découpage, backend "chroma" avec ses paramètres HNSW
+ou "numpy" pour la recherche exacte) est indexée dans un répertoire
+temporaire avec le vrai pipeline (`DocumentIndexingService.index_file`).
+Elle est ensuite interrogée via `VectorService.search`, sans cache de
+résultats. Le rapport donne recall@k, MRR, les latences p50/p95/p99 et la
+taille de l'index sur disque. Pour une configuration HNSW, `ann_recall`
+mesure le recouvrement de ses top-k avec la recherche exacte du même
+découpage.
+
+Aucun appel à l'API : les embeddings sont déterministes (`HashingEncoder`)
+ou lus dans le cache d'embeddings (`StoredEncoder`).
+"""
+
+import contextlib
+import hashlib
+import io
+import random
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .document_indexer import DocumentIndexingService
+from .embedding_cache import EmbeddingCache
+from .lexical_index import tokenize
+from .search_cache import SearchResultCache
+from .search_filters import build_chunk_metadata
+from .text_chunker import MarkdownChunker, TextChunk
+from .vector_service import VectorService
+
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+# Titres, tableaux et blocs de code ne font pas de bonnes requêtes
+SKIPPED_LINE_PREFIXES = ("#", "|", "```", "- ", "* ")
+MIN_SENTENCE_CHARS = 40
+MAX_SENTENCE_CHARS = 300
+
+
+class HashingEncoder:
+    """
+    Encodeur déterministe par hachage des termes (signe et case par hash).
+
+    Sans valeur sémantique, mais stable d'une exécution à l'autre : il
+    suffit pour comparer des index entre eux.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term in tokenize(text):
+            digest = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    async def encode(self, text: str) -> List[List[float]]:
+        return [self._embed(text)]
+
+    async def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class StoredEncoder:
+    """
+    Embeddings réels lus dans le cache d'embeddings, sans appel à l'API.
+
+    Raises:
+        LookupError: si un texte n'a pas d'embedding en cache
+    """
+
+    def __init__(self, cache: Optional[EmbeddingCache] = None, model_name: str = "mistral-embed"):
+        self.cache = cache or EmbeddingCache()
+        self.model_name = model_name
+
+    async def encode(self, text: str) -> List[List[float]]:
+        return await self.encode_batch([text])
+
+    async def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.cache.get_many(self.model_name, texts)
+        missing = sum(embedding is None for embedding in embeddings)
+        if missing:
+            raise LookupError(f"{missing} texts have no stored '{self.model_name}' embedding")
+        return embeddings
+
+
+@dataclass
+class LabeledQuery:
+    text: str
+    kind: str
+    source_file: str
+    anchor: str
+
+
+@dataclass
+class BenchmarkConfig:
+    name: str
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    min_chunk_size: int = 100
+    backend: str = "chroma"
+    hnsw: Optional[Dict[str, Any]] = None
+
+    @property
+    def chunking(self) -> tuple:
+        return (self.chunk_size, self.chunk_overlap, self.min_chunk_size)
+
+    def make_chunker(self) -> MarkdownChunker:
+        return MarkdownChunker(*self.chunking)
+
+
+@dataclass
+class BenchmarkResult:
+    config: BenchmarkConfig
+    metrics: Dict[str, Any]
+    top_ids: List[List[str]] = field(default_factory=list, repr=False)
+
+
+def _normalize_source(source_file: Optional[str]) -> str:
+    # Même normalisation que les métadonnées stockées
+    return build_chunk_metadata({"source_file": source_file or ""}).get("source_file", "")
+
+
+def build_queries(
+    chunks: List[TextChunk],
+    max_queries: int = 200,
+    seed: int = 0,
+) -> List[LabeledQuery]:
+    """
+    Tire des requêtes étiquetées d'un découpage de référence : autant de
+    titres de section que de phrases, dans la limite de `max_queries`.
+    """
+    rng = random.Random(seed)
+    headers: Dict[tuple, LabeledQuery] = {}
+    sentences: List[LabeledQuery] = []
+    for chunk in chunks:
+        source_file = _normalize_source(chunk.metadata.get("source_file"))
+        header = chunk.metadata.get("section_header", "")
+        if len(tokenize(header)) >= 2:
+            headers.setdefault((source_file, header), LabeledQuery(header, "header", source_file, header))
+
+        candidates = [
+            sentence.strip() for sentence in SENTENCE_PATTERN.split(chunk.content)
+            if MIN_SENTENCE_CHARS <= len(sentence.strip()) <= MAX_SENTENCE_CHARS
+            and not sentence.strip().startswith(SKIPPED_LINE_PREFIXES)
+        ]
+        if candidates:
+            sentence = rng.choice(candidates)
+            sentences.append(LabeledQuery(sentence, "sentence", source_file, sentence))
+
+    header_queries = list(headers.values())
+    rng.shuffle(header_queries)
+    rng.shuffle(sentences)
+    half = max_queries // 2
+    queries = header_queries[:half] + sentences[:max_queries - min(half, len(header_queries))]
+    return queries[:max_queries]
+
+
+def is_relevant(query: LabeledQuery, text: str, metadata: Dict[str, Any]) -> bool:
+    if _normalize_source(metadata.get("source_file")) != query.source_file:
+        return False
+    if query.kind == "header":
+        return metadata.get("section_header") == query.anchor
+    return query.anchor in text
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+async def build_index(
+    config: BenchmarkConfig,
+    files: List[Path],
+    encoder,
+    directory: Path,
+) -> VectorService:
+    """Indexe les fichiers avec le pipeline de l'indexeur, cache de résultats désactivé."""
+    service = VectorService(
+        collection_name="benchmark",
+        persist_directory=str(directory),
+        encoder=encoder,
+        backend=config.backend,
+        use_lexical_index=False,
+        result_cache=SearchResultCache(max_entries=0),
+        hnsw=config.hnsw,
+    )
+    indexer = DocumentIndexingService(vector_service=service, chunker=config.make_chunker())
+    # L'indexeur est bavard : un message par fichier
+    with contextlib.redirect_stdout(io.StringIO()):
+        for file_path in files:
+            if await indexer.index_file(file_path) is None:
+                raise RuntimeError(f"Indexing {file_path} failed")
+    return service
+
+
+async def evaluate(
+    config: BenchmarkConfig,
+    service: VectorService,
+    queries: List[LabeledQuery],
+    query_embeddings: List[List[float]],
+    k: int,
+) -> BenchmarkResult:
+    """Interroge l'index et calcule recall@k, MRR et latences."""
+    # Ensemble pertinent de chaque requête pour ce découpage
+    relevant: List[set] = [set() for _ in queries]
+    chunks = 0
+    for ids, documents, metadatas, _ in service.snapshot_pages():
+        chunks += len(ids)
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            for i, query in enumerate(queries):
+                if is_relevant(query, text or "", metadata or {}):
+                    relevant[i].add(doc_id)
+
+    # Première requête hors mesure : chargement de l'index
+    if queries:
+        await service.search(queries[0].text, k, mode="vector", query_embedding=query_embeddings[0])
+
+    recalls, reciprocal_ranks, latencies, top_ids = [], [], [], []
+    for query, embedding, targets in zip(queries, query_embeddings, relevant):
+        start = time.perf_counter()
+        results = (await service.search(query.text, k, mode="vector", query_embedding=embedding))["result"]
+        latencies.append(time.perf_counter() - start)
+        ids = [result["id"] for result in results]
+        top_ids.append(ids)
+        if not targets:
+            # Phrase coupée entre deux chunks par ce découpage
+            continue
+        recalls.append(len(targets.intersection(ids)) / min(len(targets), k))
+        rank = next((position for position, doc_id in enumerate(ids, 1) if doc_id in targets), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    metrics = {
+        "queries": len(recalls),
+        "unanswerable": len(queries) - len(recalls),
+        f"recall@{k}": float(np.mean(recalls)) if recalls else 0.0,
+        "mrr": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else 0.0,
+        **percentiles(latencies),
+        "chunks": chunks,
+    }
+    return BenchmarkResult(config=config, metrics=metrics, top_ids=top_ids)
+
+
+async def run_benchmark(
+    data_dir: str,
+    configs: List[BenchmarkConfig],
+    encoder=None,
+    k: int = 5,
+    max_queries: int = 200,
+    seed: int = 0,
+    work_dir: Optional[str] = None,
+) -> List[BenchmarkResult]:
+    """
+    Évalue chaque configuration sur le même jeu de requêtes, tiré du
+    découpage par défaut du corpus.
+    """
+    encoder = encoder or HashingEncoder()
+    files = sorted(Path(data_dir).rglob("*.md"))
+    reference = MarkdownChunker()
+    chunks = [chunk for file_path in files for chunk in reference.chunk_markdown_file(file_path)]
+    queries = build_queries(chunks, max_queries, seed)
+    query_embeddings = await encoder.encode_batch([query.text for query in queries])
+
+    results: List[BenchmarkResult] = []
+    exact: Dict[tuple, BenchmarkResult] = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as root:
+        for position, config in enumerate(configs):
+            slug = re.sub(r"[^\w.-]", "_", config.name)
+            directory = Path(root) / f"{position:02d}-{slug}"
+            service = await build_index(config, files, encoder, directory)
+            try:
+                result = await evaluate(config, service, queries, query_embeddings, k)
+            finally:
+                service.close()
+            result.metrics["index_bytes"] = directory_size(directory)
+            if config.backend == "numpy":
+                exact.setdefault(config.chunking, result)
+            results.append(result)
+
+    # Recouvrement des top-k HNSW avec la recherche exacte du même découpage
+    for result in results:
+        reference_result = exact.get(result.config.chunking)
+        if result.config.backend == "numpy" or reference_result is None:
+            continue
+        overlaps = [
+            len(set(ids) & set(exact_ids)) / len(exact_ids)
+            for ids, exact_ids in zip(result.top_ids, reference_result.top_ids) if exact_ids
+        ]
+        result.metrics["ann_recall"] = float(np.mean(overlaps)) if overlaps else 0.0
+    return results
+
+
+def default_configs(
+    ef_search: Sequence[int] = (10, 50, 200),
+    max_neighbors: Sequence[int] = (16, 32),
+    chunk_sizes: Sequence[int] = (500, 1000, 2000),
+) -> List[BenchmarkConfig]:
+    """Recherche exacte, grille HNSW (M × ef_search) puis variantes de découpage."""
+    configs = [BenchmarkConfig("exact", backend="numpy")]
+    for m in max_neighbors:
+        for ef in ef_search:
+            configs.append(BenchmarkConfig(
+                f"hnsw M={m} ef={ef}", hnsw={"max_neighbors": m, "ef_search": ef}
+            ))
+    for size in chunk_sizes:
+        if size == 1000:
+            continue
+        overlap = size // 5
+        configs.append(BenchmarkConfig(
+            f"exact chunk={size}", chunk_size=size, chunk_overlap=overlap,
+            min_chunk_size=size // 10, backend="numpy",
+        ))
+    return configs
+
+
+def format_report(results: List[BenchmarkResult], k: int = 5) -> str:
+    """Tableau texte, une ligne par configuration."""
+    columns = [
+        ("config", 24), (f"recall@{k}", 10), ("mrr", 7), ("ann_recall", 10),
+        ("p50_ms", 8), ("p95_ms", 8), ("p99_ms", 8), ("chunks", 7), ("index_bytes", 12),
+    ]
+    lines = [" ".join(name.rjust(width) if i else name.ljust(width) for i, (name, width) in enumerate(columns))]
+    for result in results:
+        cells = [result.config.name.ljust(columns[0][1])]
+        for name, width in columns[1:]:
+            value = result.metrics.get(name)
+            if value is None:
+                text = "-"
+            elif isinstance(value, float):
+                text = f"{value:.3f}"
+            else:
+                text = str(value)
+            cells.append(text.rjust(width))
+        lines.append(" ".join(cells))
+    return "\n".join(lines)
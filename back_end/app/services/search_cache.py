@@ -0,0 +1,134 @@
+"""
+Cache des résultats de recherche, invalidé par génération d'index.
+
+Les questions populaires reviennent de nombreuses fois par heure sur
+`/api/search` et sur l'étape RAG de `/api/chat`. Un hit évite à la fois
+l'embedding de la requête et la recherche dans la collection.
+
+Chaque écriture dans la collection incrémente un numéro de génération
+stocké dans un petit fichier à côté d'elle, partagé entre l'indexeur et les
+workers de l'API. Une entrée du cache est étiquetée avec la génération
+observée avant la recherche : après une réindexation, elle n'est plus
+servie.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class IndexGeneration:
+    """
+    Compteur de génération d'un index, persistant et partagé entre processus.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._value = 0
+
+    def current(self) -> int:
+        """Génération courante (un simple `stat` si le fichier n'a pas changé)."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            self._value = int(self.path.read_text(encoding="utf-8") or 0)
+            self._stamp = stamp
+        return self._value
+
+    def bump(self) -> int:
+        """Incrémente la génération et retourne la nouvelle valeur."""
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            value = self.current() + 1
+            # Remplacement atomique : un lecteur ne voit jamais un fichier partiel
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(str(value), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        return value
+
+
+def make_search_key(
+    query: str,
+    n_results: int,
+    where: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+) -> Hashable:
+    """Clé du cache : requête normalisée (casse, espaces), n_results, filtres et mode."""
+    normalized = " ".join(query.lower().split())
+    return (normalized, n_results, json.dumps(where, sort_keys=True), mode)
+
+
+class SearchResultCache:
+    """
+    Cache LRU en mémoire avec TTL, dont les entrées portent une génération d'index.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[List[Dict[str, Any]]]:
+        """Résultats en cache pour `key`, ou None (absents, expirés ou d'une autre génération)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_generation, expires_at, results = entry
+            if entry_generation != generation or time.monotonic() >= expires_at:
+                if entry_generation != generation:
+                    self.stale += 1
+                else:
+                    self.expired += 1
+                self.misses += 1
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: Hashable, generation: int, results: List[Dict[str, Any]]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic() + self.ttl_seconds, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs de hits/misses pour le suivi du cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
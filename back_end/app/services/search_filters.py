@@ -0,0 +1,86 @@
+"""
+Métadonnées stockées avec chaque chunk et filtres de recherche associés.
+
+Les filtres sont traduits en clause `where` (format ChromaDB, comprise aussi
+par le backend numpy) et appliqués avant le calcul des distances : une
+requête limitée à une partie de la documentation ne parcourt que celle-ci.
+
+ChromaDB ne sait pas filtrer une métadonnée par préfixe. Chaque chunk porte
+donc un champ par répertoire ancêtre de son fichier source (`path_1`,
+`path_2`, ...) et un filtre de préfixe devient une simple égalité.
+"""
+
+from typing import Any, Dict, Optional
+
+
+# Métadonnées du chunker conservées dans la base vectorielle
+STORED_METADATA_FIELDS = (
+    "source_file",
+    "title",
+    "section_header",
+    "language",
+    "chunk_type",
+    "doc_type",
+    "chunk_index",
+)
+PATH_FIELD_PREFIX = "path_"
+
+
+def _path_parts(path: str) -> list[str]:
+    return [part for part in path.replace("\\", "/").split("/") if part]
+
+
+def build_chunk_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Métadonnées à stocker pour un chunk (valeurs scalaires uniquement).
+
+    Ajoute un champ `path_<n>` pour chaque répertoire ancêtre du fichier source.
+    """
+    stored = {
+        key: metadata[key]
+        for key in STORED_METADATA_FIELDS
+        if isinstance(metadata.get(key), (str, int, float, bool))
+    }
+    parts = _path_parts(stored.get("source_file", ""))
+    if parts:
+        stored["source_file"] = "/".join(parts)
+    for depth in range(1, len(parts)):
+        stored[f"{PATH_FIELD_PREFIX}{depth}"] = "/".join(parts[:depth])
+    return stored
+
+
+def build_where(
+    path_prefix: Optional[str] = None,
+    language: Optional[str] = None,
+    doc_type: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Construit la clause `where` correspondant aux filtres demandés.
+
+    Args:
+        path_prefix: Répertoire (ex: "docs.mistral.ai/guides") ou fichier
+            source exact, relatif à data/scraping
+        language: Langue du document ("en", "fr")
+        doc_type: Type de document (métadonnée `doc_type` du chunker)
+
+    Returns:
+        La clause `where`, ou None si aucun filtre n'est demandé
+    """
+    clauses = []
+    parts = _path_parts(path_prefix or "")
+    if parts:
+        prefix = "/".join(parts)
+        if prefix.endswith(".md"):
+            clauses.append({"source_file": prefix})
+        else:
+            clauses.append({f"{PATH_FIELD_PREFIX}{len(parts)}": prefix})
+    if language:
+        clauses.append({"language": language})
+    if doc_type:
+        clauses.append({"doc_type": doc_type})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
@@ -0,0 +1,172 @@
+"""
+Registre des services partagés par processus.
+
+Les services coûteux (client ChromaDB, encodeur, client Mistral) sont créés
+une seule fois au démarrage de l'application puis distribués aux endpoints
+via les dépendances FastAPI. Le chat et les embeddings partagent un même
+pool de connexions HTTP keep-alive.
+
+L'index d'une collection est la génération publiée sous son répertoire
+(voir `index_generations`) : quand une reconstruction en publie une
+nouvelle, les requêtes suivantes reçoivent un service ouvert sur celle-ci.
+L'ancien service reste utilisable par les requêtes en cours et n'est fermé
+qu'après `INDEX_RETIRE_SECONDS`.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from .answer_cache import AnswerCache
+from .chroma_executor import ChromaExecutor
+from .index_generations import IndexGenerations
+from .mistral_service import MistralService
+from .query_batcher import QueryEmbeddingBatcher
+from .sharded_vector_service import ShardedVectorService, create_vector_service
+from .vector_service import Encoder, VectorService
+
+
+DEFAULT_COLLECTION = "mistral_docs"
+DEFAULT_PERSIST_DIRECTORY = "data/mistral_doc"
+
+
+class ServiceRegistry:
+    """
+    Crée et conserve les instances de services pour toute la durée du processus.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+    ):
+        load_dotenv()
+        self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
+        if not self.api_key:
+            raise ValueError("MISTRAL_API_KEY environment variable not set")
+
+        # Un seul pool keep-alive pour le chat et les embeddings
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+        # Import différé : `mistralai` est lent à charger
+        from mistralai import Mistral
+        self.mistral_client = Mistral(api_key=self.api_key, async_client=self.http_client)
+
+        self.encoder = Encoder(api_key=self.api_key, client=self.mistral_client)
+        self.query_batcher = QueryEmbeddingBatcher(
+            self.encoder,
+            max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "5")),
+            max_batch_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+        )
+        self.mistral_service = MistralService(
+            model_name=os.getenv("MISTRAL_MODEL"),
+            api_key=self.api_key,
+            client=self.mistral_client,
+        )
+
+        # Pool de threads borné partagé par toutes les collections
+        self.chroma_executor = ChromaExecutor(
+            max_workers=int(os.getenv("CHROMA_MAX_WORKERS", "4"))
+        )
+        self._vector_services: Dict[Tuple[str, str], VectorService | ShardedVectorService] = {}
+        self._lock = threading.Lock()
+        # Générations d'index : service actif par (collection, racine), et
+        # services remplacés en attente de fermeture (échéance, service)
+        self._generations: Dict[str, IndexGenerations] = {}
+        self._active: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._retired: List[Tuple[float, VectorService | ShardedVectorService]] = []
+        self.retire_seconds = float(os.getenv("INDEX_RETIRE_SECONDS", "60"))
+
+        # Cache sémantique des réponses du chat, désactivé par défaut
+        self.answer_cache: Optional[AnswerCache] = None
+        if os.getenv("ANSWER_CACHE", "false").lower() in ("1", "true", "yes"):
+            self.answer_cache = AnswerCache(
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            )
+
+    def get_vector_service(
+        self,
+        collection_name: str = DEFAULT_COLLECTION,
+        persist_directory: str = DEFAULT_PERSIST_DIRECTORY,
+    ) -> VectorService | ShardedVectorService:
+        """
+        Retourne l'instance partagée pour la génération active d'une
+        collection, en la créant au besoin (premier appel ou nouvelle
+        génération publiée).
+        """
+        generations = self._generations.get(persist_directory)
+        if generations is None:
+            generations = self._generations.setdefault(
+                persist_directory, IndexGenerations(persist_directory)
+            )
+        key = (collection_name, generations.current_path())
+        service = self._vector_services.get(key)
+        if service is not None:
+            if self._retired:
+                self._close_retired()
+            return service
+
+        with self._lock:
+            service = self._vector_services.get(key)
+            if service is None:
+                service = create_vector_service(
+                    collection_name,
+                    key[1],
+                    encoder=self.encoder,
+                    query_encoder=self.query_batcher,
+                    executor=self.chroma_executor,
+                )
+                self._vector_services[key] = service
+                previous = self._active.get((collection_name, persist_directory))
+                self._active[(collection_name, persist_directory)] = key
+                if previous is not None and previous != key:
+                    self._retire(self._vector_services.pop(previous))
+                    print(f"Index {collection_name}: génération {key[1]} active")
+        return service
+
+    def _retire(self, service: VectorService | ShardedVectorService):
+        # Les requêtes en cours gardent leur référence jusqu'à la fermeture
+        self._retired.append((time.monotonic() + self.retire_seconds, service))
+        # Réponses en cache étiquetées avec le compteur de l'ancienne génération
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+
+    def _close_retired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [service for deadline, service in self._retired if deadline <= now]
+            self._retired = [(deadline, service) for deadline, service in self._retired if deadline > now]
+        for service in expired:
+            service.close()
+
+    def get_mistral_service(self) -> MistralService:
+        return self.mistral_service
+
+    def get_answer_cache(self) -> Optional[AnswerCache]:
+        return self.answer_cache
+
+    async def aclose(self):
+        """Ferme proprement les clients partagés."""
+        await self.query_batcher.aclose()
+        for service in self._vector_services.values():
+            service.close()
+        self._vector_services.clear()
+        for _, service in self._retired:
+            service.close()
+        self._retired.clear()
+        self.chroma_executor.shutdown(wait=False)
+        await self.http_client.aclose()
+        if self.encoder.cache is not None:
+            self.encoder.cache.close()
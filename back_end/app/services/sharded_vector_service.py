@@ -0,0 +1,377 @@
+"""
+Index vectoriel partitionné en shards.
+
+Chaque shard est un `VectorService` complet (collection, index BM25, cache
+de résultats, génération) dans son propre répertoire
+`<root_directory>/shard-<nom>`. Les chunks d'un même fichier source vont
+toujours dans le même shard, choisi :
+    - par domaine (`strategy="domain"`) : premier segment de `source_file`,
+      ex: "docs.mistral.ai" ;
+    - par hachage (`strategy="hash"`) : hash stable de `source_file` modulo
+      `num_shards`.
+
+Une recherche encode la requête une seule fois, interroge tous les shards
+en parallèle puis fusionne leurs listes triées avec un tas. Un shard peut
+être vidé et reconstruit seul, sans verrouiller ni réécrire les autres.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .chroma_executor import ChromaExecutor
+from .context_builder import ContextBuilder
+from .snapshot import bulk_load, check_embedding_model, read_snapshot, write_snapshot
+from .vector_service import SEARCH_MODES, Encoder, VectorService
+
+
+SHARD_PREFIX = "shard-"
+DEFAULT_SHARD = "default"
+
+
+class CompositeGeneration:
+    """Génération d'un index partitionné : change dès qu'un shard change."""
+
+    def __init__(self, index: "ShardedVectorService"):
+        self._index = index
+
+    def current(self) -> int:
+        return sum(shard.generation.current() for shard in self._index.shards.values())
+
+
+class ShardedVectorService:
+    """
+    Façade compatible avec `VectorService` au-dessus de plusieurs shards.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "mistral_docs",
+        root_directory: str = "data/mistral_doc",
+        strategy: str = "domain",
+        num_shards: int = 4,
+        encoder=None,
+        query_encoder=None,
+        executor=None,
+        **service_kwargs: Any,
+    ):
+        if strategy not in ("domain", "hash"):
+            raise ValueError(f"Unknown sharding strategy: {strategy}")
+        self.collection_name = collection_name
+        self.root_directory = Path(root_directory)
+        self.root_directory.mkdir(parents=True, exist_ok=True)
+        self.strategy = strategy
+        self.num_shards = num_shards
+        # Encodeur et pool de threads communs à tous les shards
+        self.encoder = encoder or Encoder()
+        self.query_encoder = query_encoder or self.encoder
+        self._owns_executor = executor is None
+        self.executor = executor or ChromaExecutor()
+        self._service_kwargs = service_kwargs
+
+        self.shards: Dict[str, VectorService] = {}
+        for directory in sorted(self.root_directory.glob(f"{SHARD_PREFIX}*")):
+            if directory.is_dir():
+                self.shard(directory.name[len(SHARD_PREFIX):])
+        if strategy == "hash":
+            for i in range(num_shards):
+                self.shard(f"{i:02d}")
+        self.generation = CompositeGeneration(self)
+
+    @property
+    def search_mode(self) -> str:
+        for shard in self.shards.values():
+            return shard.search_mode
+        return os.getenv("SEARCH_MODE", "vector")
+
+    def shard(self, name: str) -> VectorService:
+        """Retourne le shard `name`, en le créant au besoin."""
+        service = self.shards.get(name)
+        if service is None:
+            service = VectorService(
+                collection_name=self.collection_name,
+                persist_directory=str(self.root_directory / f"{SHARD_PREFIX}{name}"),
+                encoder=self.encoder,
+                query_encoder=self.query_encoder,
+                executor=self.executor,
+                **self._service_kwargs,
+            )
+            self.shards[name] = service
+        return service
+
+    def shard_name(self, source_file: Optional[str]) -> str:
+        """Nom du shard qui reçoit les chunks de `source_file`."""
+        parts = [part for part in (source_file or "").replace("\\", "/").split("/") if part]
+        if self.strategy == "domain":
+            return parts[0] if len(parts) > 1 else DEFAULT_SHARD
+        digest = hashlib.sha1("/".join(parts).encode("utf-8")).digest()
+        return f"{int.from_bytes(digest[:4], 'big') % self.num_shards:02d}"
+
+    def _route(
+        self,
+        doc_ids: List[str],
+        metadatas: Optional[List[Dict[str, Any]]],
+    ) -> Dict[str, List[int]]:
+        routes: Dict[str, List[int]] = {}
+        for i in range(len(doc_ids)):
+            metadata = metadatas[i] if metadatas else None
+            routes.setdefault(self.shard_name((metadata or {}).get("source_file")), []).append(i)
+        return routes
+
+    async def upsert_batch(
+        self,
+        texts: List[str],
+        doc_ids: List[str],
+        embeddings: Optional[List[List[float]]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[str]:
+        """Insère ou remplace des documents, chacun dans le shard de son fichier source."""
+        if not texts:
+            return []
+        if embeddings is None:
+            embeddings = await self.encoder.encode_batch(texts)
+        await asyncio.gather(*(
+            self.shard(name).upsert_batch(
+                [texts[i] for i in indices],
+                [doc_ids[i] for i in indices],
+                [embeddings[i] for i in indices],
+                [metadatas[i] for i in indices] if metadatas else None,
+            )
+            for name, indices in self._route(doc_ids, metadatas).items()
+        ))
+        return doc_ids
+
+    async def add_batch(
+        self,
+        texts: List[str],
+        doc_ids: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ):
+        if doc_ids is None:
+            doc_ids = [str(uuid.uuid4()) for _ in range(len(texts))]
+        await asyncio.gather(*(
+            self.shard(name).add_batch(
+                [texts[i] for i in indices],
+                [doc_ids[i] for i in indices],
+                [metadatas[i] for i in indices] if metadatas else None,
+            )
+            for name, indices in self._route(doc_ids, metadatas).items()
+        ))
+        return doc_ids
+
+    async def delete_many(self, doc_ids: List[str]) -> int:
+        """Supprime des documents (les IDs ne désignent pas leur shard : diffusion)."""
+        if not doc_ids:
+            return 0
+        await asyncio.gather(*(shard.delete_many(doc_ids) for shard in self.shards.values()))
+        return len(doc_ids)
+
+    async def update_metadatas(
+        self,
+        doc_ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> int:
+        if not doc_ids:
+            return 0
+        await asyncio.gather(*(
+            self.shard(name).update_metadatas(
+                [doc_ids[i] for i in indices],
+                [texts[i] for i in indices],
+                [metadatas[i] for i in indices],
+            )
+            for name, indices in self._route(doc_ids, metadatas).items()
+        ))
+        return len(doc_ids)
+
+    async def replace_documents(
+        self,
+        old_ids: List[str],
+        texts: List[str],
+        new_ids: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[str]:
+        """Même contrat que `VectorService.replace_documents`."""
+        previous = set(old_ids)
+        added = [i for i, doc_id in enumerate(new_ids) if doc_id not in previous]
+        kept = [i for i, doc_id in enumerate(new_ids) if doc_id in previous]
+        await self.upsert_batch(
+            [texts[i] for i in added],
+            [new_ids[i] for i in added],
+            metadatas=[metadatas[i] for i in added] if metadatas else None,
+        )
+        if kept and metadatas:
+            await self.update_metadatas(
+                [new_ids[i] for i in kept], [texts[i] for i in kept], [metadatas[i] for i in kept]
+            )
+
+        current = set(new_ids)
+        await self.delete_many([doc_id for doc_id in old_ids if doc_id not in current])
+        return new_ids
+
+    async def list_ids(self) -> List[str]:
+        pages = await asyncio.gather(*(shard.list_ids() for shard in self.shards.values()))
+        return [doc_id for page in pages for doc_id in page]
+
+    async def sync_lexical_index(self) -> int:
+        counts = await asyncio.gather(*(shard.sync_lexical_index() for shard in self.shards.values()))
+        return sum(counts)
+
+    async def clear(self) -> int:
+        counts = await asyncio.gather(*(shard.clear() for shard in self.shards.values()))
+        return sum(counts)
+
+    async def export_snapshot(
+        self,
+        path: str,
+        dtype: str = "float32",
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Un seul snapshot pour tous les shards ; le routage est refait au chargement."""
+        extra = {
+            "collection": self.collection_name,
+            "embedding_model": getattr(self.encoder, "model_name", None),
+            **(extra or {}),
+        }
+        pages = itertools.chain.from_iterable(
+            shard.snapshot_pages() for shard in self.shards.values()
+        )
+        return await self.executor.run("snapshot", write_snapshot, path, pages, extra, dtype)
+
+    async def load_snapshot(
+        self,
+        path: str,
+        replace: bool = True,
+        batch_size: int = 5000,
+    ) -> Dict[str, Any]:
+        snapshot = await self.executor.run("snapshot", read_snapshot, path)
+        check_embedding_model(snapshot, getattr(self.encoder, "model_name", None))
+        if replace:
+            await self.clear()
+        await bulk_load(self, snapshot, batch_size)
+        return snapshot.extra
+
+    async def clear_shard(self, name: str) -> int:
+        """Vide un shard avant sa reconstruction ; les autres ne sont pas touchés."""
+        if name not in self.shards:
+            return 0
+        return await self.shards[name].clear()
+
+    async def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Recherche sur tous les shards en parallèle puis fusion des top-k."""
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        shards = list(self.shards.values())
+        if not shards:
+            return {'query': query, 'result': []}
+
+        # Requête encodée une seule fois pour tous les shards
+        query_embedding = None
+        if mode != "lexical":
+            query_embedding = (await self.query_encoder.encode(query))[0]
+        per_shard = await asyncio.gather(*(
+            shard.search(query, n_results, where, mode, query_embedding=query_embedding)
+            for shard in shards
+        ))
+
+        # Chaque liste est déjà triée : fusion par tas
+        if mode == "vector":
+            key = lambda result: result["distance"]
+        else:
+            key = lambda result: -result["score"]
+        merged = heapq.merge(*(results["result"] for results in per_shard), key=key)
+        return {
+            'query': query,
+            'result': list(itertools.islice(merged, n_results))
+        }
+
+    async def search_many(
+        self,
+        queries: List[str],
+        n_results: int | List[int] = 10,
+        wheres: Optional[List[Optional[Dict[str, Any]]]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        if isinstance(n_results, int):
+            n_results = [n_results] * len(queries)
+        wheres = wheres if wheres is not None else [None] * len(queries)
+        return list(await asyncio.gather(*(
+            self.search(query, n, where, mode)
+            for query, n, where in zip(queries, n_results, wheres)
+        )))
+
+    async def retrieve_context(
+        self,
+        query: str,
+        n_results: int = 5,
+        builder: Optional[ContextBuilder] = None,
+        candidates: Optional[int] = None,
+        where: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        builder = builder or ContextBuilder()
+        return await builder.retrieve(
+            self, query, n_results, candidates, where, mode or self.search_mode
+        )
+
+    async def get_embeddings(self, doc_ids: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        for embeddings in await asyncio.gather(
+            *(shard.get_embeddings(doc_ids) for shard in self.shards.values())
+        ):
+            found.update(embeddings)
+        return found
+
+    async def warmup(self) -> int:
+        counts = await asyncio.gather(*(shard.warmup() for shard in self.shards.values()))
+        return sum(counts)
+
+    async def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        for document in await asyncio.gather(
+            *(shard.get_document(doc_id) for shard in self.shards.values())
+        ):
+            if document:
+                return document
+        return None
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        if self._owns_executor:
+            self.executor.shutdown()
+
+
+def create_vector_service(
+    collection_name: str,
+    persist_directory: str,
+    **kwargs: Any,
+):
+    """
+    Crée l'index d'une collection selon la configuration : un `VectorService`
+    simple, ou un `ShardedVectorService` si `VECTOR_SHARDING` vaut "domain"
+    ou "hash" (`VECTOR_SHARDS` shards pour le hachage).
+    """
+    strategy = os.getenv("VECTOR_SHARDING", "none")
+    if strategy == "none":
+        return VectorService(
+            collection_name=collection_name, persist_directory=persist_directory, **kwargs
+        )
+    return ShardedVectorService(
+        collection_name=collection_name,
+        root_directory=persist_directory,
+        strategy=strategy,
+        num_shards=int(os.getenv("VECTOR_SHARDS", "4")),
+        **kwargs,
+    )
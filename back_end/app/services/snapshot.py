@@ -0,0 +1,194 @@
+"""
+Snapshots binaires d'un index vectoriel.
+
+Un snapshot contient tout ce qu'il faut pour servir une collection sans
+aucun appel à l'API d'embeddings : IDs, textes, métadonnées, embeddings
+(float32 ou float16) et des données annexes (ex: `index_metadata.json`).
+
+Format (un seul fichier, entiers little-endian) :
+    - en-tête de 64 octets : magic, version, dtype, nombre de lignes,
+      dimension, taille de la section JSON, SHA-256 du contenu ;
+    - matrice des embeddings, contiguë, lisible directement en mmap ;
+    - section JSON (IDs, textes, métadonnées, données annexes).
+
+Le fichier est écrit à côté de sa destination puis renommé : un lecteur ne
+voit jamais un snapshot partiel.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+SNAPSHOT_MAGIC = b"MDSNAP\x00\x00"
+SNAPSHOT_VERSION = 1
+# magic, version, dtype, (padding), lignes, dimension, taille JSON, sha256
+HEADER_FORMAT = "<8sHBxQIQ32s"
+HEADER_SIZE = 64
+DTYPES = {1: np.float32, 2: np.float16}
+DTYPE_CODES = {"float32": 1, "float16": 2}
+HASH_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+class SnapshotError(ValueError):
+    """Snapshot illisible : format, version ou somme de contrôle invalide."""
+
+
+@dataclass
+class Snapshot:
+    ids: List[str]
+    documents: List[Optional[str]]
+    metadatas: List[Optional[Dict[str, Any]]]
+    embeddings: np.ndarray
+    extra: Dict[str, Any]
+
+
+def write_snapshot(
+    path: str,
+    pages: Iterable[Tuple[List[str], List[Optional[str]], List[Optional[Dict[str, Any]]], np.ndarray]],
+    extra: Optional[Dict[str, Any]] = None,
+    dtype: str = "float32",
+) -> Dict[str, Any]:
+    """
+    Écrit un snapshot à partir de pages (ids, documents, métadonnées, embeddings).
+
+    Les embeddings sont écrits au fil des pages ; seuls les IDs, textes et
+    métadonnées sont gardés en mémoire jusqu'à la section JSON.
+
+    Returns:
+        Un résumé (chemin, nombre de lignes, dimension, taille, sha256)
+    """
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    digest = hashlib.sha256()
+    ids: List[str] = []
+    documents: List[Optional[str]] = []
+    metadatas: List[Optional[Dict[str, Any]]] = []
+    dim = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"\x00" * HEADER_SIZE)
+            for page_ids, page_documents, page_metadatas, page_embeddings in pages:
+                if not page_ids:
+                    continue
+                matrix = np.ascontiguousarray(page_embeddings, dtype=DTYPES[DTYPE_CODES[dtype]])
+                if dim and matrix.shape[1] != dim:
+                    raise ValueError("Embeddings of different dimensions in one snapshot")
+                dim = matrix.shape[1]
+                data = matrix.tobytes()
+                digest.update(data)
+                f.write(data)
+                ids.extend(page_ids)
+                documents.extend(page_documents)
+                metadatas.extend(page_metadatas)
+
+            body = json.dumps(
+                {"ids": ids, "documents": documents, "metadatas": metadatas, "extra": extra or {}},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            digest.update(body)
+            f.write(body)
+
+            f.seek(0)
+            f.write(struct.pack(
+                HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, DTYPE_CODES[dtype],
+                len(ids), dim, len(body), digest.digest(),
+            ).ljust(HEADER_SIZE, b"\x00"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return {
+        "path": str(path),
+        "count": len(ids),
+        "dim": dim,
+        "dtype": dtype,
+        "bytes": path.stat().st_size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def read_snapshot(path: str, verify: bool = True) -> Snapshot:
+    """
+    Ouvre un snapshot ; la matrice des embeddings est un memmap en lecture seule.
+
+    Raises:
+        SnapshotError: si le fichier n'est pas un snapshot valide
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise SnapshotError(f"{path} is too short to be a snapshot")
+    magic, version, dtype_code, count, dim, body_size, checksum = struct.unpack_from(HEADER_FORMAT, header)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError(f"{path} is not a vector snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    if dtype_code not in DTYPES:
+        raise SnapshotError(f"Unknown snapshot dtype code {dtype_code}")
+
+    dtype = DTYPES[dtype_code]
+    matrix_bytes = count * dim * np.dtype(dtype).itemsize
+    if path.stat().st_size != HEADER_SIZE + matrix_bytes + body_size:
+        raise SnapshotError(f"{path} is truncated")
+
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if verify:
+        digest = hashlib.sha256()
+        for start in range(HEADER_SIZE, len(raw), HASH_BLOCK_BYTES):
+            digest.update(raw[start:min(start + HASH_BLOCK_BYTES, len(raw))])
+        if digest.digest() != checksum:
+            raise SnapshotError(f"{path} checksum mismatch")
+
+    body = json.loads(bytes(raw[HEADER_SIZE + matrix_bytes:]).decode("utf-8"))
+    if count and dim:
+        embeddings = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count, dim))
+    else:
+        embeddings = np.zeros((0, dim), dtype=dtype)
+    return Snapshot(
+        ids=body["ids"],
+        documents=body["documents"],
+        metadatas=body["metadatas"],
+        embeddings=embeddings,
+        extra=body["extra"],
+    )
+
+
+def check_embedding_model(snapshot: Snapshot, model_name: Optional[str]):
+    """Refuse un snapshot produit avec un autre modèle d'embeddings."""
+    snapshot_model = snapshot.extra.get("embedding_model")
+    if snapshot_model and model_name and snapshot_model != model_name:
+        raise SnapshotError(
+            f"Snapshot embeddings come from '{snapshot_model}', not '{model_name}'"
+        )
+
+
+async def bulk_load(service, snapshot: Snapshot, batch_size: int = 5000) -> int:
+    """
+    Insère le contenu d'un snapshot par lots via `service.upsert_batch`,
+    avec les embeddings stockés (aucun appel à l'API d'embeddings).
+    """
+    count = len(snapshot.ids)
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        await service.upsert_batch(
+            snapshot.documents[start:stop],
+            snapshot.ids[start:stop],
+            embeddings=np.asarray(snapshot.embeddings[start:stop], dtype=np.float32),
+            metadatas=snapshot.metadatas[start:stop],
+        )
+    return count
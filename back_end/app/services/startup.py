@@ -0,0 +1,76 @@
+"""
+Démarrage de l'API : phases chronométrées et préchauffage.
+
+Le lifespan crée le `ServiceRegistry` (phase "registry") puis lance le
+préchauffage en tâche de fond, pour que uvicorn accepte les connexions sans
+attendre :
+    - "vector_service" : import de chromadb et ouverture de la collection ;
+    - "index" : chargement du segment HNSW (ou de la matrice mmap) et de
+      l'index BM25 ;
+    - "embedding" (optionnel, `WARMUP_QUERY`) : un premier embedding ouvre
+      les connexions du pool HTTP.
+
+`/healthz` répond dès que le processus tourne ; `/readyz` attend la fin du
+préchauffage. La durée de chaque phase est affichée une fois l'API prête.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+class StartupState:
+    """
+    Durées des phases de démarrage et état de préparation de l'API.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.documents: Optional[int] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Chronomètre une phase (durée enregistrée même en cas d'échec)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        total = time.perf_counter() - self._started
+        return f"Startup {'ready' if self.ready else 'failed'} in {total * 1000:.0f}ms ({phases})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else ("failed" if self.error else "starting"),
+            "documents": self.documents,
+            "error": self.error,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+        }
+
+
+async def warm_up(registry, state: StartupState, warmup_query: Optional[str] = None):
+    """
+    Ouvre et charge l'index par défaut, puis marque l'API prête.
+
+    Une erreur est conservée dans `state.error` : `/readyz` reste en 503
+    mais le processus continue de servir `/healthz`.
+    """
+    try:
+        with state.phase("vector_service"):
+            service = await asyncio.to_thread(registry.get_vector_service)
+        with state.phase("index"):
+            state.documents = await service.warmup()
+        if warmup_query:
+            with state.phase("embedding"):
+                await registry.query_batcher.encode(warmup_query)
+        state.ready = True
+    except Exception as e:
+        state.error = str(e)
+    print(state.summary() if state.ready else f"{state.summary()}: {state.error}")
@@ -1,3 +1,4 @@
+import hashlib
 import re
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
@@ -225,16 +226,25 @@ class DocumentIndexer:
     """
     
     @staticmethod
-    def generate_chunk_id(chunk: TextChunk, index: int) -> str:
-        """Génère un ID unique pour un chunk."""
+    def generate_chunk_id(chunk: TextChunk, text: Optional[str] = None, occurrence: int = 0) -> str:
+        """
+        Génère l'ID d'un chunk à partir de son fichier source et de son
+        contenu normalisé (espaces), et non de sa position : un chunk
+        inchangé garde son ID quand le reste de la page est modifié.
+
+        Args:
+            chunk: Chunk à identifier
+            text: Texte réellement encodé (défaut : le contenu du chunk)
+            occurrence: Rang d'un contenu répété dans le même fichier
+        """
         source_file = chunk.metadata.get('source_file', 'unknown')
-        section = chunk.metadata.get('section_header', 'no_section')
+        normalized = " ".join((chunk.content if text is None else text).split())
+        digest = hashlib.sha256(f"{source_file}\0{normalized}".encode('utf-8')).hexdigest()[:24]
         
-        # Créer un ID basé sur le fichier, la section et l'index
+        # Le fichier reste lisible dans l'ID
         clean_file = re.sub(r'[^\w\-_.]', '_', source_file)
-        clean_section = re.sub(r'[^\w\-_]', '_', section)[:50]  # Limiter la longueur
-        
-        return f"{clean_file}_{clean_section}_{index:03d}"
+        chunk_id = f"{clean_file}_{digest}"
+        return f"{chunk_id}_{occurrence}" if occurrence else chunk_id
     
     @staticmethod
     def chunk_to_document_format(chunk: TextChunk) -> Dict[str, Any]:
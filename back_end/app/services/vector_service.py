@@ -1,52 +1,183 @@
-from mistralai import Mistral
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any
 import uuid
 
 
-import chromadb
+import httpx
+
+from .chroma_executor import ChromaExecutor
+from .context_builder import ContextBuilder
+from .embedding_cache import EmbeddingCache
+from .lexical_index import BM25Index
+from .numpy_store import NumpyCollection
+from .query_batcher import QueryEmbeddingBatcher
+from .search_cache import IndexGeneration, SearchResultCache, make_search_key
+from .snapshot import bulk_load, check_embedding_model, read_snapshot, write_snapshot
+
+# `mistralai` et `chromadb` sont lents à importer : ils ne le sont qu'à la
+# construction des services, pas à l'import du module
+if TYPE_CHECKING:
+    from mistralai import Mistral
 
 class Encoder:
     def __init__(
         self,
         api_key: str | None = None,
+        client: Optional["Mistral"] = None,
+        cache: Optional[EmbeddingCache] = None,
+        use_cache: bool = True,
+        max_batch_size: int = 128,
+        max_batch_tokens: int = 16000,
+        max_concurrency: int = 4,
+        retries: int = 5,
+        backoff: float = 2.0,
     ):
         load_dotenv()
         self.model_name = "mistral-embed"
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
             raise ValueError("MISTRAL_API_KEY environment variable not set")
-        self.client = Mistral(api_key=self.api_key)
+        # Un client Mistral peut être partagé avec MistralService (pool HTTP commun)
+        if client is None:
+            from mistralai import Mistral
+            client = Mistral(api_key=self.api_key)
+        self.client = client
+        # Cache partagé entre les workers et l'indexeur
+        if cache is None and use_cache:
+            cache = EmbeddingCache()
+        self.cache = cache
+
+        # Limites par requête de l'API d'embeddings
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Appels à l'API, relevés par la télémétrie d'indexation
+        self.request_count = 0
+        self.retry_count = 0
+        self.rate_limited_count = 0
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Estimation volontairement pessimiste (~3 caractères par token)
+        return len(text) // 3 + 1
+
+    def split_batches(self, texts: list[str]) -> list[list[str]]:
+        """Découpe les textes en sous-batches respectant les limites de l'API."""
+        batches = []
+        current = []
+        current_tokens = 0
+        for text in texts:
+            tokens = self.estimate_tokens(text)
+            if current and (
+                len(current) >= self.max_batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Seuls le rate-limit, les erreurs serveur et réseau méritent un nouvel essai."""
+        if isinstance(error, httpx.TransportError):
+            return True
+        from mistralai import SDKError
+        if isinstance(error, SDKError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    async def _request_sub_batch(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.request_count += 1
+                    resp = await self.client.embeddings.create_async(
+                        model=self.model_name,
+                        inputs=texts
+                    )
+                return [item.embedding for item in resp.data]
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.retries or not self.is_retryable(e):
+                    raise
+                self.retry_count += 1
+                if getattr(e, "status_code", None) == 429:
+                    self.rate_limited_count += 1
+            # Seul ce sous-batch est rejoué ; le backoff libère le slot de concurrence
+            await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+    async def _request_embeddings(self, texts: list[str]) -> list[list[float]]:
+        batches = self.split_batches(texts)
+        results = await asyncio.gather(
+            *(self._request_sub_batch(batch) for batch in batches)
+        )
+        return [embedding for batch in results for embedding in batch]
+
+    async def _encode_with_cache(self, texts: list[str]) -> list[list[float]]:
+        if self.cache is None:
+            return await self._request_embeddings(texts)
+
+        # Le niveau disque (SQLite) peut bloquer : il est interrogé hors de la boucle
+        embeddings = await asyncio.to_thread(self.cache.get_many, self.model_name, texts)
+        # Seuls les textes absents du cache (dédoublonnés) partent vers l'API
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if missing:
+            fetched = await self._request_embeddings(missing)
+            # On renvoie les vecteurs tels que stockés, identiques aux futurs hits
+            fetched = await asyncio.to_thread(
+                self.cache.put_many, self.model_name, missing, fetched
+            )
+            by_text = dict(zip(missing, fetched))
+            embeddings = [
+                embedding if embedding is not None else by_text[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
 
     async def encode(self, text:str) -> list[float]:
         try:
-            resp = await self.client.embeddings.create_async(
-                model=self.model_name,
-                inputs=[text]
-            )
-            embeddings = [item.embedding for item in resp.data]
-            return embeddings
+            return await self._encode_with_cache([text])
         except Exception as e:
             raise RuntimeError(f"Error encoding text: {str(e)}")
         
     async def encode_batch(self, texts: list[str]) -> list[list[float]]:
         try:
-            resp = await self.client.embeddings.create_async(
-                model=self.model_name,
-                inputs=texts
-            )
-            embeddings = [item.embedding for item in resp.data]
-            return embeddings
+            return await self._encode_with_cache(texts)
         except Exception as e:
             raise RuntimeError(f"Error encoding batch of texts: {str(e)}")
 
 
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# Constante de la fusion par rang réciproque (RRF)
+RRF_K = 60
+
+
 class VectorService:
     def __init__(self, 
         collection_name:str = 'documents',
         persist_directory: str = None,
-        encoder: Optional[Encoder]  = None
+        encoder: Optional[Encoder]  = None,
+        query_encoder: Optional[QueryEmbeddingBatcher] = None,
+        executor: Optional[ChromaExecutor] = None,
+        backend: Optional[str] = None,
+        lexical_index: Optional[BM25Index] = None,
+        use_lexical_index: Optional[bool] = None,
+        search_mode: Optional[str] = None,
+        result_cache: Optional[SearchResultCache] = None,
+        hnsw: Optional[Dict[str, Any]] = None
     ):
         if persist_directory is None:
             persist_directory = os.path.join("data", "doc")
@@ -55,11 +186,56 @@ class VectorService:
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.encoder = encoder or Encoder()
+        # Les requêtes de recherche peuvent passer par un micro-batcher
+        self.query_encoder = query_encoder or self.encoder
+        # Les appels ChromaDB (synchrones) s'exécutent hors de la boucle asyncio
+        self._owns_executor = executor is None
+        self.executor = executor or ChromaExecutor()
 
-        self.client = chromadb.PersistentClient(path=self.persist_directory)
+        # "chroma" (HNSW) ou "numpy" (recherche exacte sur matrice mmap)
+        self.backend = backend or os.getenv("VECTOR_BACKEND", "chroma")
+        if self.backend == "chroma":
+            import chromadb
+            # Chemin absolu : chromadb met en cache ses clients par chemin
+            self.client = chromadb.PersistentClient(path=os.path.abspath(self.persist_directory))
+            # Paramètres HNSW (ef_search, max_neighbors, ...) appliqués à la création
+            self.collection = self.client.get_or_create_collection(
+                name=self.collection_name,
+                configuration={"hnsw": hnsw} if hnsw else None,
+            )
+        elif self.backend == "numpy":
+            self.client = None
+            self.collection = NumpyCollection(
+                self.collection_name,
+                self.persist_directory,
+                dtype=os.getenv("VECTOR_NUMPY_DTYPE", "float32"),
+            )
+        else:
+            raise ValueError(f"Unknown vector backend: {self.backend}")
 
-        self.collection = self.client.get_or_create_collection(name=self.collection_name)
-        print(f"Collection {self.collection_name} ready to use")
+        # Index BM25 tenu à jour par les mêmes écritures que la collection
+        if use_lexical_index is None:
+            use_lexical_index = os.getenv("LEXICAL_INDEX", "true").lower() in ("1", "true", "yes")
+        self._owns_lexical_index = lexical_index is None and use_lexical_index
+        if self._owns_lexical_index:
+            lexical_index = BM25Index(
+                os.path.join(self.persist_directory, f"{self.collection_name}.bm25.sqlite3")
+            )
+        self.lexical_index = lexical_index
+        self.search_mode = search_mode or os.getenv("SEARCH_MODE", "vector")
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {self.search_mode}")
+
+        # Chaque écriture incrémente la génération, ce qui invalide le cache de
+        # résultats de tous les processus qui partagent la collection
+        self.generation = IndexGeneration(
+            os.path.join(self.persist_directory, f"{self.collection_name}.generation")
+        )
+        self.result_cache = result_cache or SearchResultCache(
+            max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "300")),
+        )
+        print(f"Collection {self.collection_name} ready to use ({self.backend})")
 
     async def add(self, text: str, doc_id: Optional[str] = None) -> str:
         embeddings = await self.encoder.encode(text)
@@ -67,78 +243,587 @@ class VectorService:
         if doc_id is None:
             doc_id = str(uuid.uuid4())
 
-        self.collection.add(
+        await self.executor.run(
+            "add",
+            self.collection.add,
             embeddings = embeddings,
             documents = [text],
             ids=[doc_id]
         )
+        await self._index_lexical([doc_id], [text])
+        self.generation.bump()
         return doc_id
 
-    async def add_batch(self, texts: list[str], doc_ids: Optional[list[str]] = None):
+    async def add_batch(
+            self,
+            texts: list[str],
+            doc_ids: Optional[list[str]] = None,
+            metadatas: Optional[list[Dict[str, Any]]] = None
+    ):
         embeddings = await self.encoder.encode_batch(texts)
 
         if doc_ids is None:
             doc_ids = [str(uuid.uuid4()) for _ in range(len(texts))]
 
-        self.collection.add(
+        await self.executor.run(
+            "add",
+            self.collection.add,
             embeddings = embeddings,
             documents = texts,
-            ids=doc_ids
+            ids=doc_ids,
+            metadatas=metadatas
         )
+        await self._index_lexical(doc_ids, texts, metadatas)
+        self.generation.bump()
         return doc_ids
     
 
+    async def upsert_batch(
+            self,
+            texts: list[str],
+            doc_ids: list[str],
+            embeddings: Optional[list[list[float]]] = None,
+            metadatas: Optional[list[Dict[str, Any]]] = None
+    ) -> list[str]:
+        """Insère ou remplace des documents en un seul appel ChromaDB."""
+        if not texts:
+            return []
+        if embeddings is None:
+            embeddings = await self.encoder.encode_batch(texts)
+
+        await self.executor.run(
+            "upsert",
+            self.collection.upsert,
+            ids=doc_ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
+        )
+        await self._index_lexical(doc_ids, texts, metadatas)
+        self.generation.bump()
+        return doc_ids
+
+    async def delete_many(self, doc_ids: list[str]) -> int:
+        """Supprime un ensemble de documents en un seul appel ChromaDB."""
+        if not doc_ids:
+            return 0
+        await self.executor.run("delete", self.collection.delete, ids=list(doc_ids))
+        if self.lexical_index is not None:
+            await self.executor.run("lexical_write", self.lexical_index.delete, list(doc_ids))
+        self.generation.bump()
+        return len(doc_ids)
+
+    async def _index_lexical(
+            self,
+            doc_ids: list[str],
+            texts: list[str],
+            metadatas: Optional[list[Dict[str, Any]]] = None
+    ):
+        if self.lexical_index is not None:
+            await self.executor.run(
+                "lexical_write", self.lexical_index.upsert, doc_ids, texts, metadatas
+            )
+
+    async def sync_lexical_index(self, page_size: int = 1000) -> int:
+        """
+        Reconstruit l'index BM25 depuis la collection s'il n'a pas le même
+        nombre de documents (ex: collection indexée avant l'index lexical).
+
+        Returns:
+            Le nombre de documents réindexés (0 si l'index était à jour)
+        """
+        if self.lexical_index is None:
+            return 0
+        expected = await self.executor.run("get", self.collection.count)
+        if await self.executor.run("get", self.lexical_index.count) == expected:
+            return 0
+
+        await self.executor.run("lexical_write", self.lexical_index.clear)
+        for offset in range(0, expected, page_size):
+            page = await self.executor.run(
+                "get",
+                self.collection.get,
+                limit=page_size,
+                offset=offset,
+                include=["documents", "metadatas"]
+            )
+            await self._index_lexical(page["ids"], page["documents"], page["metadatas"])
+        self.generation.bump()
+        return expected
+
+    async def clear(self, batch_size: int = 5000) -> int:
+        """
+        Supprime tous les documents de la collection et de l'index BM25.
+
+        Returns:
+            Le nombre de documents supprimés
+        """
+        doc_ids = (await self.executor.run("get", self.collection.get, include=[]))["ids"]
+        for start in range(0, len(doc_ids), batch_size):
+            await self.delete_many(doc_ids[start:start + batch_size])
+        if self.lexical_index is not None:
+            await self.executor.run("lexical_write", self.lexical_index.clear)
+        self.generation.bump()
+        return len(doc_ids)
+
+    async def list_ids(self, page_size: int = 5000) -> list[str]:
+        """Tous les IDs de la collection, lus par pages."""
+        total = await self.executor.run("get", self.collection.count)
+        ids: list[str] = []
+        for offset in range(0, total, page_size):
+            page = await self.executor.run(
+                "get", self.collection.get, limit=page_size, offset=offset, include=[]
+            )
+            ids.extend(page["ids"])
+        return ids
+
+    def snapshot_pages(self, page_size: int = 1000):
+        """Parcourt la collection par pages (appels synchrones, hors boucle asyncio)."""
+        total = self.collection.count()
+        for offset in range(0, total, page_size):
+            page = self.collection.get(
+                limit=page_size,
+                offset=offset,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            yield page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+
+    async def export_snapshot(
+            self,
+            path: str,
+            dtype: str = "float32",
+            extra: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Écrit la collection (IDs, textes, métadonnées, embeddings) dans un
+        snapshot binaire unique (voir `snapshot.py`).
+
+        Args:
+            dtype: "float32" ou "float16" (fichier deux fois plus petit)
+            extra: Données annexes à embarquer (ex: index_metadata.json)
+        """
+        extra = {
+            "collection": self.collection_name,
+            "embedding_model": getattr(self.encoder, "model_name", None),
+            **(extra or {}),
+        }
+        return await self.executor.run(
+            "snapshot", write_snapshot, path, self.snapshot_pages(), extra, dtype
+        )
+
+    async def load_snapshot(
+            self,
+            path: str,
+            replace: bool = True,
+            batch_size: int = 5000
+    ) -> Dict[str, Any]:
+        """
+        Charge un snapshot : lecture en mmap puis insertions par lots, sans
+        aucun appel à l'API d'embeddings.
+
+        Args:
+            replace: Vide la collection avant le chargement
+
+        Returns:
+            Les données annexes du snapshot
+        """
+        snapshot = await self.executor.run("snapshot", read_snapshot, path)
+        check_embedding_model(snapshot, getattr(self.encoder, "model_name", None))
+        if replace:
+            await self.clear()
+        await bulk_load(self, snapshot, batch_size)
+        return snapshot.extra
+
+    async def update_metadatas(
+            self,
+            doc_ids: list[str],
+            texts: list[str],
+            metadatas: list[Dict[str, Any]]
+    ) -> int:
+        """Met à jour les métadonnées de documents existants, sans les ré-encoder."""
+        if not doc_ids:
+            return 0
+        await self.executor.run(
+            "update", self.collection.update, ids=list(doc_ids), metadatas=metadatas
+        )
+        await self._index_lexical(doc_ids, texts, metadatas)
+        self.generation.bump()
+        return len(doc_ids)
+
+    async def replace_documents(
+            self,
+            old_ids: list[str],
+            texts: list[str],
+            new_ids: list[str],
+            metadatas: Optional[list[Dict[str, Any]]] = None
+    ) -> list[str]:
+        """
+        Remplace un ensemble de documents (ex: les chunks d'un fichier) par un autre.
+
+        Les IDs dérivent du contenu : un ID déjà présent dans `old_ids` garde
+        son embedding (seules ses métadonnées sont rafraîchies) et seuls les
+        nouveaux documents sont encodés. Les embeddings sont calculés avant
+        toute écriture : en cas d'échec de l'API, l'ancien ensemble reste
+        intact. Enfin les IDs disparus sont supprimés.
+        """
+        previous = set(old_ids)
+        added = [i for i, doc_id in enumerate(new_ids) if doc_id not in previous]
+        kept = [i for i, doc_id in enumerate(new_ids) if doc_id in previous]
+        added_texts = [texts[i] for i in added]
+        embeddings = await self.encoder.encode_batch(added_texts) if added_texts else []
+
+        await self.upsert_batch(
+            added_texts,
+            [new_ids[i] for i in added],
+            embeddings,
+            [metadatas[i] for i in added] if metadatas else None,
+        )
+        if kept and metadatas:
+            await self.update_metadatas(
+                [new_ids[i] for i in kept], [texts[i] for i in kept], [metadatas[i] for i in kept]
+            )
+
+        current = set(new_ids)
+        await self.delete_many([doc_id for doc_id in old_ids if doc_id not in current])
+        return new_ids
+
     async def search(
             self, 
             query: str, 
             n_results: int = 10,
+            where: Optional[Dict[str, Any]] = None,
+            mode: Optional[str] = None,
+            query_embedding: Optional[list[float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Recherche les documents les plus proches de la requête.
+
+        Args:
+            where: Filtre sur les métadonnées (voir `search_filters.build_where`),
+                appliqué avant le calcul des distances
+            mode: "vector" (embeddings), "lexical" (BM25, sans appel à l'API
+                d'embeddings) ou "hybrid" (les deux en parallèle, fusionnés
+                par rang réciproque). Par défaut, `self.search_mode`.
+            query_embedding: Embedding de la requête s'il est déjà calculé
+                (ex: une seule fois pour tous les shards d'un index partitionné)
+
+        Un hit du cache de résultats n'appelle ni l'encodeur ni la collection.
+        """
+        mode = self._check_mode(mode)
+
+        # Génération lue avant la recherche : une écriture concurrente rend
+        # l'entrée périmée au lieu de la faire passer pour fraîche
+        cache_key = make_search_key(query, n_results, where, mode)
+        generation = self.generation.current()
+        cached = self.result_cache.get(cache_key, generation)
+        if cached is not None:
+            return {
+                'query': query,
+                'result': cached
+            }
+
+        if mode == "vector":
+            results = await self._vector_search(query, n_results, where, query_embedding)
+        elif mode == "lexical":
+            results = await self._lexical_search(query, n_results, where)
+        else:
+            # Chaque moteur fournit plus de candidats que demandé pour la fusion
+            vector_results, lexical_results = await asyncio.gather(
+                self._vector_search(query, 2 * n_results, where, query_embedding),
+                self._lexical_search(query, 2 * n_results, where),
+            )
+            results = self.fuse_results([vector_results, lexical_results])[:n_results]
+
+        self.result_cache.put(cache_key, generation, results)
+        return {
+            'query': query,
+            'result': results
+        }
+
+    async def search_many(
+            self,
+            queries: list[str],
+            n_results: int | list[int] = 10,
+            wheres: Optional[list[Optional[Dict[str, Any]]]] = None,
+            mode: Optional[str] = None,
+    ) -> list[Dict[str, Any]]:
+        """
+        Exécute plusieurs recherches en un minimum d'appels.
 
+        Les requêtes absentes du cache sont encodées en un seul `encode_batch`
+        puis envoyées en une requête multi-vecteurs par filtre distinct (une
+        seule si elles partagent le même filtre).
+
+        Args:
+            n_results: Nombre de résultats commun ou par requête
+            wheres: Filtre par requête (None : aucun filtre)
+
+        Returns:
+            Un résultat au format de `search` par requête, dans le même ordre
+        """
+        mode = self._check_mode(mode)
+        if isinstance(n_results, int):
+            n_results = [n_results] * len(queries)
+        wheres = wheres if wheres is not None else [None] * len(queries)
+        if not len(queries) == len(n_results) == len(wheres):
+            raise ValueError("queries, n_results and wheres must have the same length")
+
+        generation = self.generation.current()
+        keys = [
+            make_search_key(query, n, where, mode)
+            for query, n, where in zip(queries, n_results, wheres)
+        ]
+        results = [self.result_cache.get(key, generation) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+
+        if misses:
+            # En mode hybride, chaque moteur fournit plus de candidats pour la fusion
+            factor = 2 if mode == "hybrid" else 1
+            miss_queries = [queries[i] for i in misses]
+            miss_n = [factor * n_results[i] for i in misses]
+            miss_wheres = [wheres[i] for i in misses]
+
+            async def no_results():
+                return [[] for _ in misses]
+
+            async def lexical_many():
+                return await asyncio.gather(*(
+                    self._lexical_search(query, n, where)
+                    for query, n, where in zip(miss_queries, miss_n, miss_wheres)
+                ))
+
+            vector_results, lexical_results = await asyncio.gather(
+                self._vector_search_many(miss_queries, miss_n, miss_wheres)
+                if mode != "lexical" else no_results(),
+                lexical_many() if mode != "vector" else no_results(),
+            )
+            for j, i in enumerate(misses):
+                if mode == "vector":
+                    result = vector_results[j]
+                elif mode == "lexical":
+                    result = lexical_results[j]
+                else:
+                    result = self.fuse_results([vector_results[j], lexical_results[j]])[:n_results[i]]
+                self.result_cache.put(keys[i], generation, result)
+                results[i] = result
+
+        return [
+            {'query': query, 'result': result}
+            for query, result in zip(queries, results)
+        ]
+
+    async def retrieve_context(
+            self,
+            query: str,
+            n_results: int = 5,
+            builder: Optional[ContextBuilder] = None,
+            candidates: Optional[int] = None,
+            where: Optional[Dict[str, Any]] = None,
+            mode: Optional[str] = None,
     ) -> Dict[str, Any]:
-        encoded_query = await self.encoder.encode(query)
-        results = self.collection.query(
-            query_embeddings=encoded_query[0],
-            n_results=n_results,
-            include=["documents", "distances"]
+        """
+        Recherche destinée au prompt : sélection MMR parmi `candidates`
+        résultats, fusion des chunks voisins et respect du budget du builder.
+
+        En mode lexical, aucun embedding n'est calculé et la sélection MMR
+        est remplacée par l'ordre BM25.
+
+        Returns:
+            Le format de `search`, chaque résultat étant un bloc (`ids` liste
+            les chunks fusionnés)
+        """
+        builder = builder or ContextBuilder()
+        return await builder.retrieve(
+            self, query, n_results, candidates, where, self._check_mode(mode)
+        )
 
+    async def get_embeddings(self, doc_ids: list[str]) -> Dict[str, list[float]]:
+        """Embeddings stockés des documents demandés, par ID."""
+        if not doc_ids:
+            return {}
+        stored = await self.executor.run(
+            "get",
+            self.collection.get,
+            ids=list(doc_ids),
+            include=["embeddings"]
         )
+        return dict(zip(stored["ids"], stored["embeddings"]))
 
+    async def warmup(self) -> int:
+        """
+        Charge l'index en mémoire avant la première requête : une recherche
+        sur un embedding stocké charge le segment HNSW (ou la matrice mmap)
+        et une lecture ouvre l'index BM25.
+
+        Returns:
+            Le nombre de documents de la collection
+        """
+        count = await self.executor.run("get", self.collection.count)
+        if count:
+            sample = await self.executor.run(
+                "get", self.collection.get, limit=1, include=["embeddings"]
+            )
+            await self.executor.run(
+                "query",
+                self.collection.query,
+                query_embeddings=[list(sample["embeddings"][0])],
+                n_results=1,
+                include=["distances"]
+            )
+        if self.lexical_index is not None:
+            await self.executor.run("lexical_query", self.lexical_index.count)
+        return count
+
+    def _check_mode(self, mode: Optional[str]) -> str:
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if mode != "vector" and self.lexical_index is None:
+            raise ValueError(f"Search mode '{mode}' requires a lexical index")
+        return mode
+
+    @staticmethod
+    def _format_query_results(
+            results: Dict[str, Any], row: int, limit: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
         formated_results = []
-        for i in range(len(results['ids'][0])):
+        for i in range(len(results['ids'][row][:limit])):
             formated_results.append({
-                "id": results['ids'][0][i],
-                "text": results['documents'][0][i],
-                "distance": results['distances'][0][i]
+                "id": results['ids'][row][i],
+                "text": results['documents'][row][i],
+                "distance": results['distances'][row][i],
+                "metadata": results['metadatas'][row][i] or {}
             })
+        return formated_results
 
-        return {
-            'query': query,
-            'result': formated_results
+    async def _vector_search(
+            self,
+            query: str,
+            n_results: int,
+            where: Optional[Dict[str, Any]],
+            query_embedding: Optional[list[float]] = None
+    ) -> list[Dict[str, Any]]:
+        if query_embedding is None:
+            query_embedding = (await self.query_encoder.encode(query))[0]
+        results = await self.executor.run(
+            "query",
+            self.collection.query,
+            query_embeddings=query_embedding,
+            n_results=n_results,
+            where=where,
+            include=["documents", "distances", "metadatas"]
+
+        )
+        return self._format_query_results(results, 0)
+
+    async def _vector_search_many(
+            self,
+            queries: list[str],
+            n_results: list[int],
+            wheres: list[Optional[Dict[str, Any]]]
+    ) -> list[list[Dict[str, Any]]]:
+        embeddings = await self.encoder.encode_batch(queries)
+
+        # Chroma n'accepte qu'un filtre par requête multi-vecteurs
+        groups: Dict[str, list[int]] = {}
+        for i, where in enumerate(wheres):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+
+        formated_results: list[list[Dict[str, Any]]] = [[] for _ in queries]
+
+        async def query_group(indices: list[int]):
+            results = await self.executor.run(
+                "query",
+                self.collection.query,
+                query_embeddings=[embeddings[i] for i in indices],
+                n_results=max(n_results[i] for i in indices),
+                where=wheres[indices[0]],
+                include=["documents", "distances", "metadatas"]
+            )
+            for row, i in enumerate(indices):
+                formated_results[i] = self._format_query_results(results, row, n_results[i])
+
+        await asyncio.gather(*(query_group(indices) for indices in groups.values()))
+        return formated_results
+
+    async def _lexical_search(
+            self, query: str, n_results: int, where: Optional[Dict[str, Any]]
+    ) -> list[Dict[str, Any]]:
+        ranked = await self.executor.run(
+            "lexical_query", self.lexical_index.search, query, n_results, where
+        )
+        if not ranked:
+            return []
+        documents = await self.executor.run(
+            "get",
+            self.collection.get,
+            ids=[doc_id for doc_id, _ in ranked],
+            include=["documents", "metadatas"]
+        )
+        by_id = {
+            doc_id: (text, metadata)
+            for doc_id, text, metadata in zip(
+                documents["ids"], documents["documents"], documents["metadatas"]
+            )
         }
+
+        formated_results = []
+        for doc_id, score in ranked:
+            if doc_id not in by_id:
+                continue
+            text, metadata = by_id[doc_id]
+            formated_results.append({
+                "id": doc_id,
+                "text": text,
+                "distance": None,
+                "score": score,
+                "metadata": metadata or {}
+            })
+        return formated_results
+
+    @staticmethod
+    def fuse_results(rankings: list[list[Dict[str, Any]]]) -> list[Dict[str, Any]]:
+        """
+        Fusionne plusieurs classements par rang réciproque (RRF).
+
+        Le score d'un document est la somme de 1 / (RRF_K + rang) sur les
+        classements où il apparaît ; la distance vectorielle est conservée.
+        """
+        fused: Dict[str, Dict[str, Any]] = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking, start=1):
+                entry = fused.setdefault(result["id"], {**result, "score": 0.0})
+                if entry.get("distance") is None:
+                    entry["distance"] = result.get("distance")
+                entry["score"] += 1.0 / (RRF_K + rank)
+        return sorted(fused.values(), key=lambda result: result["score"], reverse=True)
     
-    def get_document(self, doc_id: str) -> Dict[str, Any]:
+    async def get_document(self, doc_id: str) -> Dict[str, Any]:
         try:
-            result = self.collection.get(
+            result = await self.executor.run(
+                "get",
+                self.collection.get,
                 ids=[doc_id],
                 include=["documents"]
             )
-            if not result['documents'] or len(result['documents'][0]) == 0:
+            if not result['documents']:
                 return None
             
             return {
                 "id": doc_id,
-                "text": result['documents'][0][0]
+                "text": result['documents'][0]
             }
         except:
             print(f"Error getting document {doc_id}")
             return None
     
-    def delete_document(self, doc_id: str) -> bool:
+    async def delete_document(self, doc_id: str) -> bool:
         try:
-            result = self.collection.get(ids=[doc_id])
+            result = await self.executor.run("get", self.collection.get, ids=[doc_id])
             if not result["documents"] or len(result["documents"]) == 0:
                 return False
             
-            self.collection.delete(ids=[doc_id])
+            await self.delete_many([doc_id])
             return True
         except Exception as e:
             print(f"Error deleting document: {str(e)}")
@@ -148,7 +833,7 @@ class VectorService:
     async def update_document(self, doc_id: str, text: str) -> bool:
         try:
             # Vérifier d'abord si le document existe
-            result = self.collection.get(ids=[doc_id])
+            result = await self.executor.run("get", self.collection.get, ids=[doc_id])
             if not result["documents"] or len(result["documents"]) == 0:
                 return False
             
@@ -156,12 +841,23 @@ class VectorService:
             embeddings = await self.encoder.encode(text)
             
             # Mettre à jour le document
-            self.collection.update(
+            await self.executor.run(
+                "update",
+                self.collection.update,
                 ids=[doc_id],
                 embeddings=[embeddings[0]],  # Premier (et seul) embedding
                 documents=[text]
             )
+            await self._index_lexical([doc_id], [text], result["metadatas"])
+            self.generation.bump()
             return True
         except Exception as e:
             print(f"Error updating document: {str(e)}")
             return False
+
+    def close(self):
+        """Libère le pool de threads et l'index BM25 s'ils appartiennent à ce service."""
+        if self._owns_executor:
+            self.executor.shutdown()
+        if self._owns_lexical_index:
+            self.lexical_index.close()
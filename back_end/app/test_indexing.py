@@ -83,7 +83,7 @@ async def test_small_indexing():
         # Indexer chaque fichier
         total_chunks = 0
         for file_path in test_files:
-            chunk_ids = await indexer.index_file(file_path)
+            chunk_ids = await indexer.index_file(file_path) or []
             total_chunks += len(chunk_ids)
             print(f"   ✅ {file_path.name}: {len(chunk_ids)} chunks")
         
@@ -142,7 +142,7 @@ async def test_vector_service():
             return False
         
         # Tester la récupération du document
-        doc = vector_service.get_document(doc_id)
+        doc = await vector_service.get_document(doc_id)
         if doc:
             print(f"✅ Document récupéré: {doc['text'][:50]}...")
         else:
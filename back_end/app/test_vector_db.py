@@ -62,7 +62,7 @@ async def test_vector_db():
     print("\n4. Récupération d'un document par ID")
     print("-" * 30)
     
-    doc = db.get_document(doc_ids[0])
+    doc = await db.get_document(doc_ids[0])
     print(f"Document récupéré:")
     print(f"ID: {doc['id']}")
     print(f"Texte: {doc['text']}")
@@ -0,0 +1,42 @@
+import pytest
+
+from back_end.app.services.vector_service import VectorService
+
+
+class FakeEncoder:
+    """Encodeur déterministe : un axe par mot-clé connu."""
+
+    KEYWORDS = ["mistral", "embeddings", "chat", "python", "agents", "pricing"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def _embed(self, text):
+        lowered = text.lower()
+        vector = [float(lowered.count(word)) + 0.01 for word in self.KEYWORDS]
+        norm = sum(x * x for x in vector) ** 0.5
+        return [x / norm for x in vector]
+
+    async def encode(self, text):
+        self.calls += 1
+        return [self._embed(text)]
+
+    async def encode_batch(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+
+@pytest.fixture
+def fake_encoder():
+    return FakeEncoder()
+
+
+@pytest.fixture
+def vector_service(tmp_path, fake_encoder):
+    service = VectorService(
+        collection_name="test",
+        persist_directory=str(tmp_path / "chroma"),
+        encoder=fake_encoder,
+    )
+    yield service
+    service.close()
@@ -0,0 +1,30 @@
+from back_end.app.services.answer_cache import AnswerCache
+
+
+def test_hit_requires_similar_question_and_same_chunks():
+    cache = AnswerCache(threshold=0.95)
+    cache.store([1.0, 0.0], ["a", "b"], generation=1, answer="cached")
+
+    assert cache.lookup([1.0, 0.1], ["b", "a"], generation=1) == "cached"
+    assert cache.lookup([1.0, 0.1], ["a", "c"], generation=1) is None
+    assert cache.lookup([0.0, 1.0], ["a", "b"], generation=1) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["chunk_mismatches"]) == (1, 2, 1)
+    assert stats["near_miss_distance"]["p90"] > 0.9
+
+
+def test_generation_change_invalidates_entries():
+    cache = AnswerCache()
+    cache.store([1.0, 0.0], ["a"], generation=1, answer="cached")
+
+    assert cache.lookup([1.0, 0.0], ["a"], generation=2) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_not_served():
+    cache = AnswerCache(ttl_seconds=0)
+    cache.store([1.0, 0.0], ["a"], generation=1, answer="cached")
+
+    assert cache.lookup([1.0, 0.0], ["a"], generation=1) is None
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from back_end.app.services.chroma_executor import ChromaExecutor
+
+
+@pytest.mark.asyncio
+async def test_operations_run_off_the_event_loop():
+    executor = ChromaExecutor(max_workers=1)
+    loop_thread = threading.get_ident()
+
+    worker_thread = await executor.run("query", threading.get_ident)
+
+    assert worker_thread != loop_thread
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_during_slow_operation():
+    executor = ChromaExecutor(max_workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    task = asyncio.create_task(ticker())
+    await executor.run("add", time.sleep, 0.1)
+    task.cancel()
+
+    assert ticks > 5
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_queue_wait_metrics():
+    executor = ChromaExecutor(max_workers=1, timeouts={"query": 0.05})
+
+    with pytest.raises(TimeoutError):
+        await executor.run("query", time.sleep, 0.2)
+    # Le thread unique est encore occupé : cette opération attend dans la file
+    await executor.run("get", lambda: None)
+
+    metrics = executor.metrics()
+    assert metrics["query"]["timeouts"] == 1
+    assert metrics["get"]["count"] == 1
+    assert metrics["get"]["queue_wait_max"] > 0.05
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_writes_have_no_default_timeout():
+    executor = ChromaExecutor(max_workers=1, default_timeout=0.01)
+
+    await executor.run("upsert", time.sleep, 0.05)
+
+    assert executor.metrics()["upsert"]["timeouts"] == 0
+    executor.shutdown()
@@ -0,0 +1,54 @@
+from back_end.app.services.context_builder import ContextBuilder, mmr_select, split_context_header
+
+
+def chunk(doc_id, text, index, section="Usage", distance=0.1):
+    return {
+        "id": doc_id,
+        "text": f"Document: Chat\nSection: {section}\n\n{text}",
+        "distance": distance,
+        "metadata": {"source_file": "guides/chat.md", "section_header": section, "chunk_index": index},
+    }
+
+
+def test_mmr_prefers_diverse_candidates():
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.7, 0.7]]
+
+    assert mmr_select([1.0, 0.0], embeddings, k=2, lambda_=0.3) == [0, 2]
+    assert mmr_select([1.0, 0.0], embeddings, k=2, lambda_=1.0) == [0, 1]
+
+
+def test_split_context_header():
+    assert split_context_header("Section: Usage\n\nbody") == ("Section: Usage\n\n", "body")
+    assert split_context_header("plain body") == ("", "plain body")
+
+
+def test_overlapping_and_adjacent_chunks_are_stitched():
+    overlap = "Shared sentence between chunks. "
+    results = [
+        chunk("b", overlap + "Second part.", 1, distance=0.2),
+        chunk("a", "First part. " + overlap.strip(), 0, distance=0.3),
+        chunk("c", "Third part.", 2, distance=0.4),
+        chunk("d", "Other section.", 5, section="Pricing", distance=0.5),
+    ]
+
+    blocks = ContextBuilder().build(results, k=4)
+
+    assert [block["ids"] for block in blocks] == [["a", "b", "c"], ["d"]]
+    assert blocks[0]["text"] == (
+        "Document: Chat\nSection: Usage\n\n"
+        "First part. Shared sentence between chunks. Second part.\nThird part."
+    )
+    assert blocks[0]["distance"] == 0.2
+
+
+def test_budget_keeps_most_relevant_blocks():
+    results = [
+        chunk("a", "x" * 50, 0, section="One"),
+        chunk("b", "y" * 500, 0, section="Two"),
+        chunk("c", "z" * 50, 0, section="Three"),
+    ]
+
+    blocks = ContextBuilder(max_chars=200).build(results, k=3)
+
+    assert [block["id"] for block in blocks] == ["a", "c"]
+    assert len(ContextBuilder(max_chars=20).build(results, k=3)[0]["text"]) == 20
@@ -0,0 +1,240 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService
+
+
+SECTION = "Mistral chat and python embeddings are documented here in detail. " * 3
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = Path("data/scraping/docs.mistral.ai")
+    (root / "guides").mkdir(parents=True)
+    (root / "index.md").write_text(f"# Home\n\n## Intro\n\n{SECTION}\n", encoding="utf-8")
+    (root / "guides" / "chat.md").write_text(
+        f"# Chat\n\n## Usage\n\n{SECTION}\n\n## Pricing\n\n{SECTION}\n", encoding="utf-8"
+    )
+    return root
+
+
+@pytest.fixture
+def indexer(docs_dir, vector_service):
+    indexer = DocumentIndexingService(vector_service=vector_service, data_dir="data/scraping")
+    yield indexer
+    indexer.journal.close()
+
+
+@pytest.mark.asyncio
+async def test_index_all_documents_indexes_every_chunk(indexer, vector_service):
+    stats = await indexer.index_all_documents()
+
+    assert stats["indexed_files"] == 2
+    assert vector_service.collection.count() == stats["total_chunks"] == 5
+
+
+@pytest.mark.asyncio
+async def test_changed_file_replaces_its_chunks(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    (docs_dir / "guides" / "chat.md").write_text(f"# Chat\n\n## Usage\n\n{SECTION}\n", encoding="utf-8")
+
+    stats = await indexer.index_all_documents()
+
+    assert stats["indexed_files"] == 1
+    assert stats["skipped_files"] == 1
+    assert vector_service.collection.count() == 4
+
+
+@pytest.mark.asyncio
+async def test_remove_file_chunks_deletes_in_bulk(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    metadata = indexer.load_index_metadata()
+
+    await indexer.remove_file_chunks(docs_dir / "guides" / "chat.md", metadata)
+
+    assert vector_service.collection.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_emptied_file_drops_its_chunks(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    (docs_dir / "guides" / "chat.md").write_text("", encoding="utf-8")
+
+    stats = await indexer.index_all_documents()
+
+    assert not stats["errors"]
+    assert vector_service.collection.count() == 2
+    assert indexer.load_index_metadata()["indexed_files"]["docs.mistral.ai/guides/chat.md"]["chunk_ids"] == []
+    # Le fichier vide est à jour au passage suivant
+    assert (await indexer.index_all_documents())["skipped_files"] == 2
+
+
+@pytest.mark.asyncio
+async def test_search_is_filtered_by_chunk_metadata(indexer, vector_service):
+    await indexer.index_all_documents()
+
+    results = await indexer.search_documents(
+        "python embeddings", n_results=10, path_prefix="docs.mistral.ai/guides/", language="en"
+    )
+
+    assert len(results["result"]) == 3
+    assert {r["metadata"]["source_file"] for r in results["result"]} == {"docs.mistral.ai/guides/chat.md"}
+    assert {r["metadata"]["section_header"] for r in results["result"]} == {"Chat", "Usage", "Pricing"}
+    single_file = await indexer.search_documents("chat", path_prefix="docs.mistral.ai/index.md")
+    assert len(single_file["result"]) == 2
+    assert (await indexer.search_documents("chat", language="fr"))["result"] == []
+
+
+@pytest.mark.asyncio
+async def test_snapshot_restores_index_metadata(indexer, vector_service, fake_encoder):
+    await indexer.index_all_documents()
+    await indexer.export_snapshot("index.snap")
+    await vector_service.clear()
+    indexer.journal.clear()
+
+    await indexer.load_snapshot("index.snap")
+    calls = fake_encoder.calls
+    stats = await indexer.index_all_documents()
+
+    assert vector_service.collection.count() == 5
+    assert stats["skipped_files"] == 2
+    assert fake_encoder.calls == calls
+
+
+@pytest.mark.asyncio
+async def test_unchanged_stat_skips_reading_the_file(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    page = docs_dir / "index.md"
+    stat = page.stat()
+    # Même taille, même date : le contenu n'est pas relu
+    page.write_text(page.read_text(encoding="utf-8").replace("Intro", "Intra"), encoding="utf-8")
+    os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    stats = await indexer.index_all_documents()
+
+    assert stats["skipped_files"] == 2
+    assert stats["indexed_files"] == 0
+
+
+@pytest.mark.asyncio
+async def test_touched_file_is_hashed_once_then_skipped(indexer, fake_encoder, docs_dir):
+    await indexer.index_all_documents()
+    calls = fake_encoder.calls
+    page = docs_dir / "index.md"
+    os.utime(page, ns=(page.stat().st_atime_ns, page.stat().st_mtime_ns + 10**9))
+
+    stats = await indexer.index_all_documents()
+
+    assert stats["skipped_files"] == 2
+    assert fake_encoder.calls == calls
+    entry = indexer.load_index_metadata()["indexed_files"]["docs.mistral.ai/index.md"]
+    assert entry["mtime_ns"] == page.stat().st_mtime_ns
+
+
+@pytest.mark.asyncio
+async def test_deleted_file_drops_its_chunks(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    (docs_dir / "guides" / "chat.md").unlink()
+
+    stats = await indexer.index_all_documents()
+
+    assert stats["deleted_files"] == 1
+    assert vector_service.collection.count() == 2
+    assert list(indexer.load_index_metadata()["indexed_files"]) == ["docs.mistral.ai/index.md"]
+
+
+@pytest.mark.asyncio
+async def test_compact_removes_orphans_and_incomplete_entries(indexer, vector_service):
+    await indexer.index_all_documents()
+    await vector_service.upsert_batch(["orphan chunk"], ["orphan"])
+    chat_ids = indexer.load_index_metadata()["indexed_files"]["docs.mistral.ai/guides/chat.md"]["chunk_ids"]
+    await vector_service.delete_many(chat_ids[:1])
+
+    result = await indexer.compact()
+
+    assert result == {"orphan_chunks": 3, "missing_files": 0, "incomplete_files": 1}
+    assert vector_service.collection.count() == 2
+    assert list(indexer.load_index_metadata()["indexed_files"]) == ["docs.mistral.ai/index.md"]
+    # Le fichier incomplet est réindexé au passage suivant
+    assert (await indexer.index_all_documents())["indexed_files"] == 1
+    assert vector_service.collection.count() == 5
+
+
+@pytest.mark.asyncio
+async def test_edited_section_only_embeds_new_chunks(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    before = indexer.load_index_metadata()["indexed_files"]["docs.mistral.ai/guides/chat.md"]["chunk_ids"]
+    (docs_dir / "guides" / "chat.md").write_text(
+        f"# Chat\n\n## Intro\n\nA new paragraph at the top of the page, long enough to be kept.\n\n"
+        f"## Usage\n\n{SECTION}\n\n## Pricing\n\n{SECTION}\n",
+        encoding="utf-8",
+    )
+
+    stats = await indexer.index_all_documents()
+
+    after = indexer.load_index_metadata()["indexed_files"]["docs.mistral.ai/guides/chat.md"]["chunk_ids"]
+    assert stats["embedded_chunks"] == 1
+    # Les sections inchangées gardent leur ID malgré le décalage
+    assert set(before[1:]) <= set(after)
+    assert vector_service.collection.count() == 6
+    usage = vector_service.collection.get(ids=[before[1]])["metadatas"][0]
+    assert usage["chunk_index"] == 2
+
+
+@pytest.mark.asyncio
+async def test_legacy_manifest_is_migrated_into_the_journal(indexer, vector_service, fake_encoder):
+    await indexer.index_all_documents()
+    legacy = indexer.load_index_metadata()
+    indexer.journal.close()
+    indexer.index_journal_file.unlink()
+    indexer.index_metadata_file.write_text(json.dumps(legacy), encoding="utf-8")
+
+    calls = fake_encoder.calls
+    indexer = DocumentIndexingService(vector_service=vector_service, data_dir="data/scraping")
+    stats = await indexer.index_all_documents()
+
+    assert stats["skipped_files"] == 2
+    assert fake_encoder.calls == calls
+    assert indexer.journal.chunk_ids("docs.mistral.ai/index.md") == (
+        legacy["indexed_files"]["docs.mistral.ai/index.md"]["chunk_ids"]
+    )
+    assert not indexer.index_metadata_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_index_paths_only_touches_the_given_paths(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    (docs_dir / "guides" / "chat.md").write_text(f"# Chat\n\n## Usage\n\n{SECTION}\n", encoding="utf-8")
+    (docs_dir / "guides" / "agents.md").write_text(f"# Agents\n\n## Intro\n\n{SECTION}\n", encoding="utf-8")
+    (docs_dir / "index.md").unlink()
+
+    stats = await indexer.index_paths([
+        docs_dir / "guides" / "chat.md",
+        (docs_dir / "guides" / "agents.md").resolve(),
+        docs_dir / "index.md",
+        docs_dir / "guides" / "notes.txt",
+    ])
+
+    assert stats["indexed_files"] == 2
+    assert stats["deleted_files"] == 1
+    assert sorted(indexer.journal.file_keys()) == [
+        "docs.mistral.ai/guides/agents.md", "docs.mistral.ai/guides/chat.md"
+    ]
+    assert vector_service.collection.count() == indexer.journal.total_chunks() == 4
+
+
+@pytest.mark.asyncio
+async def test_index_paths_drops_a_deleted_directory(indexer, vector_service, docs_dir):
+    await indexer.index_all_documents()
+    (docs_dir / "guides" / "chat.md").unlink()
+    (docs_dir / "guides").rmdir()
+
+    stats = await indexer.index_paths([docs_dir / "guides"])
+
+    assert stats["deleted_files"] == 1
+    assert indexer.journal.file_keys() == ["docs.mistral.ai/index.md"]
+    assert vector_service.collection.count() == 2
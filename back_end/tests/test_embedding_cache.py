@@ -0,0 +1,103 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from back_end.app.services.embedding_cache import EmbeddingCache
+from back_end.app.services.vector_service import Encoder
+
+
+def make_response(embeddings):
+    response = MagicMock()
+    response.data = [MagicMock(embedding=embedding) for embedding in embeddings]
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), memory_size=2)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def encoder(cache):
+    encoder = Encoder(api_key="test-key", cache=cache)
+    encoder.client = MagicMock()
+    encoder.client.embeddings.create_async = AsyncMock(
+        side_effect=lambda model, inputs: make_response(
+            [[float(len(text)), 1.0] for text in inputs]
+        )
+    )
+    return encoder
+
+
+def test_cache_roundtrip_and_counters(cache):
+    assert cache.get_many("m", ["a", "b"]) == [None, None]
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+
+    # "a" est sorti du LRU mémoire (taille 2) mais reste sur disque
+    assert cache.get_many("m", ["a", "c"]) == [[1.0], [3.0]]
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_cache_is_keyed_by_model(cache):
+    cache.put_many("model-a", ["text"], [[1.0]])
+    assert cache.get_many("model-b", ["text"]) == [None]
+
+
+def test_memory_and_disk_tiers_return_the_same_vector(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    writer = EmbeddingCache(path=path)
+    stored = writer.put_many("m", ["t"], [[0.1, 1 / 3]])
+    reader = EmbeddingCache(path=path)
+
+    assert writer.get_many("m", ["t"]) == reader.get_many("m", ["t"]) == [stored[0]]
+    writer.close()
+    reader.close()
+
+
+def test_reads_do_not_write_to_disk(cache):
+    cache.put_many("m", ["a"], [[1.0]])
+    changes = cache._conn.total_changes
+    cache._memory.clear()
+
+    assert cache.get_many("m", ["a", "b"]) == [[1.0], None]
+    assert cache._conn.total_changes == changes
+
+
+def test_disk_eviction_is_size_bounded(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "c.sqlite3"), max_disk_entries=2)
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    (count,) = cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert count == 2
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_cache_is_shared_across_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    writer = EmbeddingCache(path=path)
+    writer.put_many("m", ["shared"], [[0.5, 0.25]])
+    reader = EmbeddingCache(path=path)
+    assert reader.get_many("m", ["shared"]) == [[0.5, 0.25]]
+    writer.close()
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_only_sends_misses(encoder):
+    await encoder.encode_batch(["aa", "bbb"])
+    embeddings = await encoder.encode_batch(["bbb", "c", "c", "aa"])
+
+    assert embeddings == [[3.0, 1.0], [1.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+    last_call = encoder.client.embeddings.create_async.call_args
+    assert last_call.kwargs["inputs"] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_encode_hit_skips_api(encoder):
+    await encoder.encode("hello")
+    await encoder.encode("hello")
+    assert encoder.client.embeddings.create_async.call_count == 1
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService, build_generation
+from back_end.app.services.index_generations import IndexGenerations, IndexValidationError
+
+
+SECTION = "Mistral chat and python embeddings are documented here in detail. " * 3
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = Path("data/scraping/docs.mistral.ai")
+    root.mkdir(parents=True)
+    (root / "index.md").write_text(f"# Home\n\n## Intro\n\n{SECTION}\n", encoding="utf-8")
+    (root / "chat.md").write_text(f"# Chat\n\n## Usage\n\n{SECTION}\n", encoding="utf-8")
+    return root
+
+
+def test_publish_switches_atomically_and_cleanup_waits_for_grace(tmp_path):
+    generations = IndexGenerations(str(tmp_path / "index"))
+    assert generations.current_path() == str(tmp_path / "index")
+
+    blue, blue_path = generations.create()
+    green, green_path = generations.create()
+    failed, _ = generations.create()
+    building, _ = generations.create()
+    generations.publish(blue)
+    generations.publish(green)
+    generations.mark_failed(failed)
+
+    assert generations.current_id() == green
+    assert generations.current_path() == green_path
+    assert generations.cleanup(grace_seconds=3600) == []
+    # Le retrait est daté : rien n'est supprimé avant la fin du délai de grâce
+    assert sorted(generations.cleanup(grace_seconds=0)) == sorted([blue, failed])
+    assert generations.list() == sorted([green, building])
+    assert not os.path.exists(blue_path)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_is_published_only_after_validation(docs_dir, fake_encoder):
+    first = await build_generation(encoder=fake_encoder, chunk_workers=0)
+    generations = IndexGenerations("data/mistral_doc")
+
+    assert generations.current_id() == first["generation"]
+    assert first["previous"] is None
+    assert first["validation"]["chunks"] == 4
+
+    (docs_dir / "agents.md").write_text(f"# Agents\n\n## Tools\n\n{SECTION}\n", encoding="utf-8")
+    second = await build_generation(encoder=fake_encoder, chunk_workers=0)
+
+    assert generations.current_id() == second["generation"]
+    assert second["previous"] == first["generation"]
+    assert second["validation"]["chunks"] == 6
+    assert (Path(generations.path(first["generation"])) / "RETIRED").exists()
+
+    # La génération publiée a son propre journal : l'indexation incrémentale reprend là
+    assert (Path(generations.path(second["generation"])) / "index_journal.db").exists()
+
+
+@pytest.mark.asyncio
+async def test_failed_validation_keeps_the_current_generation(docs_dir, fake_encoder):
+    first = await build_generation(encoder=fake_encoder, chunk_workers=0)
+    for page in docs_dir.iterdir():
+        page.unlink()
+    (docs_dir / "index.md").write_text(f"# Home\n\n## Intro\n\n{SECTION}\n", encoding="utf-8")
+
+    # Moitié moins de chunks que la génération précédente : refusé
+    with pytest.raises(IndexValidationError):
+        await build_generation(encoder=fake_encoder, chunk_workers=0, min_ratio=0.75)
+
+    generations = IndexGenerations("data/mistral_doc")
+    assert generations.current_id() == first["generation"]
+    rejected = [gen for gen in generations.list() if gen != first["generation"]]
+    assert (Path(generations.path(rejected[0])) / "FAILED").exists()
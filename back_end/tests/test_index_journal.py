@@ -0,0 +1,38 @@
+from back_end.app.services.index_journal import IndexJournal
+
+
+def test_record_file_replaces_its_chunks(tmp_path):
+    journal = IndexJournal(str(tmp_path / "journal.db"))
+    journal.record_file("a.md", "h1", ["a_1", "a_2", "a_3"], size=10, mtime_ns=1)
+    journal.record_file("a.md", "h2", ["a_4", "a_1"], size=12, mtime_ns=2)
+
+    assert journal.chunk_ids("a.md") == ["a_4", "a_1"]
+    assert journal.get_file("a.md")["hash"] == "h2"
+    assert journal.total_chunks() == 2
+    journal.close()
+
+
+def test_files_indexed_since(tmp_path):
+    journal = IndexJournal(str(tmp_path / "journal.db"))
+    journal.load_dict({"indexed_files": {"old.md": {"hash": "h", "chunk_ids": ["o_1"], "last_indexed": 100.0}}})
+    journal.record_file("new.md", "h", ["n_1"])
+
+    assert journal.files_indexed_since(1000.0) == ["new.md"]
+    assert journal.files_indexed_since(0) == ["old.md", "new.md"]
+    journal.close()
+
+
+def test_stale_running_run_becomes_resumable(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = IndexJournal(path)
+    run_id = journal.begin_run(force=True, shard="shard-1")
+    journal.close()
+
+    # Processus tué : l'exécution est restée "running"
+    journal = IndexJournal(path)
+    assert journal.interrupted_run()["run_id"] == run_id
+    assert journal.resume_run() == {"run_id": run_id, "force": True, "shard": "shard-1"}
+    journal.finish_run(run_id)
+    assert journal.interrupted_run() is None
+    assert journal.resume_run() is None
+    journal.close()
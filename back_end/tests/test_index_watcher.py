@@ -0,0 +1,75 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService
+from back_end.app.services.index_watcher import IndexWatcher
+
+
+SECTION = "Mistral chat and python embeddings are documented here in detail. " * 3
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = Path("data/scraping/docs.mistral.ai")
+    root.mkdir(parents=True)
+    (root / "index.md").write_text(f"# Home\n\n## Intro\n\n{SECTION}\n", encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def indexer(docs_dir, vector_service):
+    indexer = DocumentIndexingService(vector_service=vector_service, data_dir="data/scraping", chunk_workers=0)
+    yield indexer
+    indexer.journal.close()
+
+
+async def wait_until(condition, timeout=10):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.02)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("force_polling", [True, False], ids=["polling", "inotify"])
+async def test_burst_of_writes_is_indexed_as_one_batch(indexer, vector_service, docs_dir, force_polling):
+    batches = []
+    stop = asyncio.Event()
+    watcher = IndexWatcher(indexer, debounce=0.5, poll_interval=0.05, force_polling=force_polling)
+    task = asyncio.create_task(watcher.run(stop, on_batch=lambda paths, stats: batches.append(stats)))
+    try:
+        await wait_until(lambda: vector_service.collection.count() == 2)
+        # Laisse la surveillance s'installer après le parcours initial
+        await asyncio.sleep(0.3)
+
+        for i in range(3):
+            (docs_dir / f"page{i}.md").write_text(f"# Page {i}\n\n## Usage\n\n{SECTION}\n", encoding="utf-8")
+            await asyncio.sleep(0.05)
+        await wait_until(lambda: batches)
+
+        assert len(batches) == 1
+        assert batches[0]["indexed_files"] == 3
+        assert vector_service.collection.count() == 8
+
+        (docs_dir / "index.md").unlink()
+        await wait_until(lambda: len(batches) == 2)
+
+        assert batches[1]["deleted_files"] == 1
+        assert vector_service.collection.count() == 6
+    finally:
+        stop.set()
+        await asyncio.wait_for(task, 10)
+
+
+@pytest.mark.asyncio
+async def test_watcher_stops_when_cancelled(indexer):
+    watcher = IndexWatcher(indexer, force_polling=True, poll_interval=0.05, initial_scan=False)
+    task = asyncio.create_task(watcher.run())
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, 5)
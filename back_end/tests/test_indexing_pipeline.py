@@ -0,0 +1,142 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService
+from back_end.app.services.vector_service import VectorService
+
+
+SECTION = "Mistral chat and python embeddings are documented here in detail. " * 3
+
+
+class SlowEncoder:
+    """Encodeur qui mesure le nombre d'appels simultanés."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_on = fail_on
+
+    async def encode_batch(self, texts):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_on and any(self.fail_on in text for text in texts):
+                raise RuntimeError("embedding failed")
+            self.batches.append(len(texts))
+            return [[float(len(text)), 1.0] for text in texts]
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = Path("data/scraping/docs.mistral.ai")
+    root.mkdir(parents=True)
+    for i in range(6):
+        (root / f"page{i}.md").write_text(
+            f"# Page {i}\n\n## Usage\n\n{SECTION}\n\n## Pricing\n\n{SECTION}\n", encoding="utf-8"
+        )
+    return root
+
+
+def make_indexer(encoder, **kwargs):
+    service = VectorService(collection_name="test", persist_directory="chroma", encoder=encoder)
+    return DocumentIndexingService(
+        vector_service=service, data_dir="data/scraping", chunk_workers=0, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_chunks_of_many_files_share_full_batches(docs_dir):
+    encoder = SlowEncoder()
+    indexer = make_indexer(encoder, embed_batch_size=4)
+
+    stats = await indexer.index_all_documents()
+
+    assert stats["indexed_files"] == 6
+    assert stats["total_chunks"] == indexer.vector_service.collection.count() == 18
+    assert encoder.batches == [4, 4, 4, 4, 2]
+    indexer.vector_service.close()
+
+
+@pytest.mark.asyncio
+async def test_embedding_concurrency_is_bounded(docs_dir):
+    encoder = SlowEncoder()
+    indexer = make_indexer(encoder, embed_batch_size=2, embed_concurrency=2)
+
+    await indexer.index_all_documents()
+
+    assert encoder.max_active == 2
+    indexer.vector_service.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_only_fails_the_files_it_contains(docs_dir):
+    (docs_dir / "page0.md").write_text(f"# Broken\n\n## Usage\n\nboom {SECTION}\n", encoding="utf-8")
+    encoder = SlowEncoder(fail_on="boom")
+    indexer = make_indexer(encoder, embed_batch_size=3)
+
+    stats = await indexer.index_all_documents()
+
+    failed = len(stats["errors"])
+    assert any("page0.md" in error for error in stats["errors"])
+    # Un lot de 3 chunks touche au plus deux fichiers
+    assert failed <= 2
+    assert stats["indexed_files"] == 6 - failed
+    assert "docs.mistral.ai/page0.md" not in indexer.load_index_metadata()["indexed_files"]
+    # Les fichiers en échec sont retentés au passage suivant
+    encoder.fail_on = None
+    assert (await indexer.index_all_documents())["indexed_files"] == failed
+    indexer.vector_service.close()
+
+
+class StallingEncoder(SlowEncoder):
+    """Encodeur qui se bloque à partir du n-ième lot, jusqu'à l'annulation."""
+
+    def __init__(self, stall_at):
+        super().__init__()
+        self.stall_at = stall_at
+
+    async def encode_batch(self, texts):
+        if len(self.batches) + 1 >= self.stall_at:
+            await asyncio.Event().wait()
+        return await super().encode_batch(texts)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_forced_run_resumes_after_committed_files(docs_dir):
+    indexer = make_indexer(SlowEncoder(), embed_batch_size=6, embed_concurrency=1)
+    await indexer.index_all_documents()
+    started = time.time()
+
+    # Deux lots de 6 chunks (4 fichiers) sont écrits, puis l'exécution est coupée
+    indexer.vector_service.encoder = StallingEncoder(stall_at=3)
+    run = asyncio.create_task(indexer.index_all_documents(force_reindex=True))
+
+    async def committed(count):
+        while len(indexer.journal.files_indexed_since(started)) < count:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(committed(4), timeout=10)
+    run.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run
+    assert indexer.journal.interrupted_run()["status"] == "interrupted"
+
+    encoder = SlowEncoder()
+    indexer.vector_service.encoder = encoder
+    stats = await indexer.index_all_documents(resume=True)
+
+    # Le mode forcé est repris, mais seuls les fichiers non validés sont ré-encodés
+    assert stats["indexed_files"] == 2
+    assert stats["skipped_files"] == 4
+    assert encoder.batches == [6]
+    assert indexer.journal.interrupted_run() is None
+    assert indexer.vector_service.collection.count() == indexer.journal.total_chunks() == 18
+    indexer.close()
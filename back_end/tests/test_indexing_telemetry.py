@@ -0,0 +1,101 @@
+import json
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService
+from back_end.app.services.indexing_telemetry import IndexingTelemetry, MetricsServer
+from back_end.app.services.vector_service import Encoder
+
+
+SECTION = "Mistral chat and python embeddings are documented here in detail. " * 3
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch, vector_service):
+    monkeypatch.chdir(tmp_path)
+    root = Path("data/scraping/docs.mistral.ai")
+    root.mkdir(parents=True)
+    for i in range(3):
+        (root / f"page{i}.md").write_text(
+            f"# Page {i}\n\n## Usage\n\n{SECTION}\n\n## Pricing\n\n{SECTION}\n", encoding="utf-8"
+        )
+    indexer = DocumentIndexingService(
+        vector_service=vector_service, data_dir="data/scraping", chunk_workers=0, embed_batch_size=4
+    )
+    yield indexer
+    indexer.journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_writes_a_per_stage_report(indexer):
+    stats = await indexer.index_all_documents()
+
+    report = json.loads(indexer.report_file(stats["run_id"]).read_text(encoding="utf-8"))
+    assert report == stats["telemetry"]
+    stages = report["stages"]
+    assert stages["hash"]["count"] == stages["chunk"]["count"] == 3
+    assert stages["embed"]["count"] == report["embedding"]["batches"] == 3
+    assert stages["write"]["count"] >= 3
+    assert stages["discover"]["count"] >= 3
+    assert {"p50", "p95", "p99", "total_ms", "buckets_ms"} <= set(stages["embed"])
+    # Lots de 4 chunks au plus : 9 chunks -> 4, 4, 1
+    assert report["embedding"]["batch_sizes"]["4"] == 2
+    assert report["embedding"]["batch_sizes"]["1"] == 1
+    assert report["counters"]["chunks_embedded"] == report["counters"]["chunks_written"] == 9
+    assert report["counters"]["files_indexed"] == 3
+    assert report["throughput"]["chunks_per_s"] > 0
+    assert report["throughput"]["tokens_per_s"] > 0
+
+
+@pytest.mark.asyncio
+async def test_deleted_files_are_timed(indexer):
+    await indexer.index_all_documents()
+    (indexer.data_dir / "docs.mistral.ai" / "page0.md").unlink()
+
+    stats = await indexer.index_all_documents()
+
+    report = stats["telemetry"]
+    assert report["stages"]["delete"]["count"] == 1
+    assert report["counters"]["files_deleted"] == 1
+    assert report["counters"]["chunks_deleted"] == 3
+    assert report["counters"]["files_skipped"] == 2
+    assert report["stages"]["embed"]["count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_encoder_retries_are_reported():
+    response = MagicMock(data=[MagicMock(embedding=[1.0, 0.0])])
+    client = MagicMock()
+    client.embeddings.create_async = AsyncMock(side_effect=[httpx.ConnectError("reset"), response])
+    encoder = Encoder(api_key="test", client=client, use_cache=False, backoff=0)
+    telemetry = IndexingTelemetry(encoder)
+
+    await encoder.encode_batch(["hello"])
+
+    assert telemetry.report()["embedding"]["requests"] == 2
+    assert telemetry.report()["embedding"]["retries"] == 1
+    assert telemetry.report()["embedding"]["rate_limited"] == 0
+
+
+def test_metrics_server_exposes_prometheus_text():
+    telemetry = IndexingTelemetry()
+    telemetry.observe("embed", 0.2)
+    telemetry.count("chunks_written", 5)
+    server = MetricsServer(lambda: telemetry, port=0, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/", timeout=5)
+    finally:
+        server.close()
+
+    assert 'indexing_stage_duration_seconds_bucket{stage="embed",le="0.25"} 1' in body
+    assert 'indexing_stage_duration_seconds_count{stage="embed"} 1' in body
+    assert "indexing_chunks_written_total 5" in body
+    assert "indexing_embedding_retries_total 0" in body
@@ -0,0 +1,46 @@
+import pytest
+
+from back_end.app.services.lexical_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    index.upsert(
+        ["large", "small", "error"],
+        [
+            "Use mistral-large-latest for complex reasoning.",
+            "mistral-small is cheaper than the large model.",
+            "Error 429 means the rate limit was exceeded.",
+        ],
+        [{"language": "en"}, {"language": "fr"}, {"language": "en"}],
+    )
+    yield index
+    index.close()
+
+
+def test_tokenize_keeps_compound_identifiers():
+    assert tokenize("Call client.chat.complete()") == [
+        "call", "client.chat.complete", "client", "chat", "complete"
+    ]
+
+
+def test_exact_identifier_ranks_first(index):
+    assert index.search("mistral-large-latest")[0][0] == "large"
+    assert [doc_id for doc_id, _ in index.search("429")] == ["error"]
+
+
+def test_where_filter_and_delete(index):
+    assert [doc_id for doc_id, _ in index.search("mistral", where={"language": "fr"})] == ["small"]
+
+    index.delete(["small"])
+
+    assert index.count() == 2
+    assert index.search("cheaper") == []
+
+
+def test_upsert_replaces_postings(index):
+    index.upsert(["error"], ["Error 500 is a server error."])
+
+    assert index.search("429") == []
+    assert index.search("500")[0][0] == "error"
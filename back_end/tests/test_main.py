@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from back_end.app import main
+from back_end.app.services.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def mistral_service():
+    service = MagicMock()
+    service.generate_response = AsyncMock(return_value="generated")
+    return service
+
+
+@pytest.fixture
+def client(vector_service, mistral_service):
+    main.app.dependency_overrides.update({
+        main.get_vector_service: lambda: vector_service,
+        main.get_mistral_service: lambda: mistral_service,
+    })
+    # Cache partagé entre les requêtes du test
+    cache = AnswerCache()
+    main.app.dependency_overrides[main.get_answer_cache] = lambda: cache
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def ask(client, *messages):
+    return client.post("/api/chat", json={
+        "messages": [{"role": role, "content": content} for role, content in messages]
+    })
+
+
+def test_standalone_question_is_answered_from_cache(client, vector_service, mistral_service):
+    ask(client, ("user", "Mistral chat API"))
+    response = ask(client, ("user", "mistral chat api"))
+
+    assert response.json() == {"response": "generated"}
+    assert mistral_service.generate_response.await_count == 1
+
+
+def test_questions_with_history_bypass_cache(client, mistral_service):
+    ask(client, ("user", "Mistral chat API"))
+    ask(client, ("user", "hello"), ("assistant", "hi"), ("user", "Mistral chat API"))
+
+    assert mistral_service.generate_response.await_count == 2
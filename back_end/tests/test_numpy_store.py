@@ -0,0 +1,90 @@
+import chromadb
+import numpy as np
+import pytest
+
+from back_end.app.services.numpy_store import NumpyCollection
+from back_end.app.services.vector_service import VectorService
+
+
+DIM = 16
+
+
+def random_vectors(n, seed):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def collections(tmp_path):
+    chroma = chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_or_create_collection("parity")
+    numpy_collection = NumpyCollection("parity", str(tmp_path / "numpy"))
+    vectors = random_vectors(200, seed=0)
+    ids = [f"doc-{i}" for i in range(200)]
+    documents = [f"text {i}" for i in range(200)]
+    metadatas = [{"group": i % 3} for i in range(200)]
+    for collection in (chroma, numpy_collection):
+        collection.add(ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas)
+    return chroma, numpy_collection
+
+
+def assert_same_results(chroma, numpy_collection, queries, **kwargs):
+    expected = chroma.query(query_embeddings=queries.tolist(), n_results=10, **kwargs)
+    actual = numpy_collection.query(query_embeddings=queries.tolist(), n_results=10, **kwargs)
+    assert actual["ids"] == expected["ids"]
+    np.testing.assert_allclose(actual["distances"], expected["distances"], atol=1e-4)
+    assert actual["documents"] == expected["documents"]
+
+
+def test_query_parity_with_chroma(collections):
+    assert_same_results(*collections, random_vectors(5, seed=1))
+
+
+def test_filtered_query_parity_with_chroma(collections):
+    assert_same_results(*collections, random_vectors(3, seed=2), where={"group": 1})
+
+
+def test_write_parity_with_chroma(collections):
+    chroma, numpy_collection = collections
+    new_vectors = random_vectors(3, seed=3).tolist()
+    for collection in collections:
+        collection.upsert(ids=["doc-1", "doc-2", "new"], embeddings=new_vectors, documents=["a", "b", "c"])
+        collection.delete(ids=[f"doc-{i}" for i in range(10, 80)])
+        collection.add(ids=["doc-3"], embeddings=[new_vectors[0]], documents=["ignored"])
+
+    assert numpy_collection.count() == chroma.count() == 131
+    assert numpy_collection.get(ids=["doc-1", "doc-3"])["documents"] == chroma.get(ids=["doc-1", "doc-3"])["documents"]
+    assert_same_results(chroma, numpy_collection, random_vectors(5, seed=4))
+
+
+def test_instances_share_the_same_store(tmp_path):
+    writer = NumpyCollection("shared", str(tmp_path))
+    reader = NumpyCollection("shared", str(tmp_path))
+    writer.add(ids=["a"], embeddings=[[1.0, 0.0]], documents=["x"])
+
+    assert reader.count() == 1
+    writer.delete(ids=["a"])
+    assert reader.get()["ids"] == []
+
+
+def test_float16_storage(tmp_path):
+    collection = NumpyCollection("half", str(tmp_path), dtype="float16")
+    vectors = random_vectors(50, seed=5)
+    collection.add(ids=[str(i) for i in range(50)], embeddings=vectors.tolist())
+
+    result = collection.query(query_embeddings=vectors[7].tolist(), n_results=1)
+
+    assert result["ids"] == [["7"]]
+    assert result["distances"][0][0] < 1e-2
+
+
+@pytest.mark.asyncio
+async def test_vector_service_numpy_backend(tmp_path, fake_encoder):
+    service = VectorService(
+        collection_name="docs", persist_directory=str(tmp_path), encoder=fake_encoder, backend="numpy"
+    )
+    await service.add_batch(["Mistral chat API", "Python embeddings client"], ["chat", "embeddings"])
+
+    results = await service.search("embeddings in python", n_results=1)
+
+    assert results["result"][0]["id"] == "embeddings"
+    service.close()
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from back_end.app.services.query_batcher import QueryEmbeddingBatcher
+
+
+@pytest.fixture
+def encoder():
+    encoder = AsyncMock()
+    encoder.encode_batch.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    return encoder
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_api_call(encoder):
+    batcher = QueryEmbeddingBatcher(encoder, max_wait_ms=10)
+
+    results = await asyncio.gather(
+        batcher.encode("a"), batcher.encode("bb"), batcher.encode("a")
+    )
+
+    assert results == [[[1.0]], [[2.0]], [[1.0]]]
+    encoder.encode_batch.assert_awaited_once_with(["a", "bb"])
+    assert batcher.stats() == {"requests": 3, "coalesced": 1, "api_batches": 1}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_without_waiting(encoder):
+    batcher = QueryEmbeddingBatcher(encoder, max_wait_ms=10_000, max_batch_size=2)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.encode("a"), batcher.encode("bb")), timeout=1
+    )
+
+    assert results == [[[1.0]], [[2.0]]]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated_to_every_caller(encoder):
+    encoder.encode_batch.side_effect = RuntimeError("api down")
+    batcher = QueryEmbeddingBatcher(encoder, max_wait_ms=1)
+
+    results = await asyncio.gather(
+        batcher.encode("a"), batcher.encode("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_aclose_fails_waiting_callers(encoder):
+    batcher = QueryEmbeddingBatcher(encoder, max_wait_ms=10_000)
+    waiting = asyncio.create_task(batcher.encode("a"))
+    await asyncio.sleep(0)
+
+    await batcher.aclose()
+
+    with pytest.raises(RuntimeError):
+        await waiting
+    encoder.encode_batch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_tasks_are_referenced_until_done(encoder):
+    release = asyncio.Event()
+
+    async def slow(texts):
+        await release.wait()
+        return [[1.0] for _ in texts]
+
+    encoder.encode_batch.side_effect = slow
+    batcher = QueryEmbeddingBatcher(encoder, max_batch_size=1)
+    waiting = asyncio.create_task(batcher.encode("a"))
+    await asyncio.sleep(0.01)
+
+    assert len(batcher._tasks) == 1
+    release.set()
+    assert await waiting == [[1.0]]
+    await asyncio.sleep(0)
+    assert not batcher._tasks
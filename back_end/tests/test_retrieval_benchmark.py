@@ -0,0 +1,81 @@
+import pytest
+
+from back_end.app.services.retrieval_benchmark import (
+    BenchmarkConfig,
+    HashingEncoder,
+    build_queries,
+    format_report,
+    is_relevant,
+    run_benchmark,
+)
+from back_end.app.services.text_chunker import TextChunk
+
+
+PAGES = {
+    "docs/chat.md": (
+        "# Chat completion\n\n## Streaming responses\n\n"
+        "Streaming lets the client display tokens as soon as they are generated. "
+        "Set the stream parameter to true when calling the chat endpoint.\n"
+    ),
+    "docs/embeddings.md": (
+        "# Embeddings API\n\n## Batch requests\n\n"
+        "The embeddings endpoint accepts a list of inputs in a single request. "
+        "Each vector has one thousand and twenty four dimensions.\n"
+    ),
+    "docs/agents.md": (
+        "# Agents overview\n\n## Function calling\n\n"
+        "Agents can call external tools described by a JSON schema. "
+        "The model returns the tool name and its arguments for your code to run.\n"
+    ),
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    for name, content in PAGES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_hashing_encoder_is_deterministic_and_normalized():
+    encoder = HashingEncoder(dim=64)
+    first, second = await encoder.encode_batch(["Mistral embeddings", "Mistral embeddings"])
+
+    assert first == second
+    assert sum(x * x for x in first) == pytest.approx(1.0)
+
+
+def test_queries_are_labeled_by_content():
+    chunk = TextChunk(
+        content="## Streaming responses\n\nStreaming lets the client display tokens as they arrive.",
+        metadata={"source_file": "docs/chat.md", "section_header": "Streaming responses"},
+    )
+    queries = build_queries([chunk], max_queries=10)
+
+    assert {query.kind for query in queries} == {"header", "sentence"}
+    sentence = next(query for query in queries if query.kind == "sentence")
+    assert is_relevant(sentence, "Section: x\n\n" + chunk.content, chunk.metadata)
+    assert not is_relevant(sentence, chunk.content, {"source_file": "docs/other.md"})
+
+
+@pytest.mark.asyncio
+async def test_benchmark_reports_recall_latency_and_size(corpus, tmp_path):
+    configs = [
+        BenchmarkConfig("exact", backend="numpy"),
+        BenchmarkConfig("hnsw", hnsw={"max_neighbors": 16, "ef_search": 10}),
+    ]
+    results = await run_benchmark(str(corpus), configs, k=3, work_dir=str(tmp_path))
+
+    exact, hnsw = results
+    assert exact.metrics["queries"] > 0
+    assert exact.metrics["recall@3"] == pytest.approx(1.0)
+    assert exact.metrics["index_bytes"] > 0
+    assert {"mrr", "p50_ms", "p95_ms", "p99_ms", "chunks"} <= set(exact.metrics)
+    # Les ex aequo (vecteurs orthogonaux) peuvent être départagés autrement
+    assert 0.5 <= hnsw.metrics["ann_recall"] <= 1.0
+    assert hnsw.metrics["recall@3"] == pytest.approx(1.0)
+    assert "ann_recall" not in exact.metrics
+    assert "hnsw" in format_report(results, k=3)
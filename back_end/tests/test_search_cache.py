@@ -0,0 +1,40 @@
+from back_end.app.services.search_cache import IndexGeneration, SearchResultCache, make_search_key
+
+
+def test_generation_is_shared_between_instances(tmp_path):
+    writer = IndexGeneration(str(tmp_path / "docs.generation"))
+    reader = IndexGeneration(str(tmp_path / "docs.generation"))
+    assert reader.current() == 0
+
+    writer.bump()
+    writer.bump()
+
+    assert reader.current() == 2
+
+
+def test_key_normalizes_query_text():
+    assert make_search_key("  How to  CHAT ", 5) == make_search_key("how to chat", 5)
+    assert make_search_key("chat", 5) != make_search_key("chat", 5, {"language": "fr"})
+
+
+def test_entries_from_another_generation_are_stale():
+    cache = SearchResultCache()
+    cache.put("k", 1, [{"id": "a"}])
+
+    assert cache.get("k", 1) == [{"id": "a"}]
+    assert cache.get("k", 2) is None
+    assert cache.stats()["stale"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_ttl_and_lru_eviction():
+    cache = SearchResultCache(max_entries=2, ttl_seconds=0)
+    cache.put("expired", 0, [])
+    assert cache.get("expired", 0) is None
+    assert cache.stats()["expired"] == 1
+
+    cache = SearchResultCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, 0, [])
+    assert cache.get("a", 0) is None
+    assert cache.stats()["evictions"] == 1
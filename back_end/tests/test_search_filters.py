@@ -0,0 +1,28 @@
+from back_end.app.services.search_filters import build_chunk_metadata, build_where
+
+
+def test_chunk_metadata_keeps_scalars_and_adds_path_prefixes():
+    metadata = build_chunk_metadata({
+        "source_file": "docs.mistral.ai\\guides\\chat.md",
+        "title": "Chat",
+        "language": "en",
+        "sentence_count": None,
+        "unused": "dropped",
+    })
+
+    assert metadata == {
+        "source_file": "docs.mistral.ai/guides/chat.md",
+        "title": "Chat",
+        "language": "en",
+        "path_1": "docs.mistral.ai",
+        "path_2": "docs.mistral.ai/guides",
+    }
+
+
+def test_build_where():
+    assert build_where() is None
+    assert build_where(path_prefix="/docs.mistral.ai/guides/") == {"path_2": "docs.mistral.ai/guides"}
+    assert build_where(path_prefix="docs.mistral.ai/index.md") == {"source_file": "docs.mistral.ai/index.md"}
+    assert build_where(language="fr", doc_type="mistral_documentation") == {
+        "$and": [{"language": "fr"}, {"doc_type": "mistral_documentation"}]
+    }
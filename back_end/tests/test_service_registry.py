@@ -0,0 +1,115 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from back_end.app.services.index_generations import IndexGenerations
+from back_end.app.services.service_registry import ServiceRegistry
+from back_end.app.services.startup import StartupState
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+
+
+@pytest.mark.asyncio
+async def test_registry_shares_instances_and_http_pool():
+    registry = ServiceRegistry()
+
+    first = registry.get_vector_service()
+    second = registry.get_vector_service()
+    other = registry.get_vector_service("documents", "data/doc")
+
+    assert first is second
+    assert first is not other
+    assert first.encoder is other.encoder
+    assert registry.mistral_service.client is registry.encoder.client
+    assert first.query_encoder is registry.query_batcher
+
+    await registry.aclose()
+    assert registry.http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_registry_switches_to_a_published_generation(monkeypatch):
+    monkeypatch.setenv("INDEX_RETIRE_SECONDS", "0")
+    registry = ServiceRegistry()
+    blue = registry.get_vector_service()
+    closed = []
+    blue.close = lambda: closed.append(blue)
+    generations = IndexGenerations("data/mistral_doc")
+    generation_id, path = generations.create()
+    generations.publish(generation_id)
+
+    green = registry.get_vector_service()
+
+    assert green is not blue
+    assert green.persist_directory == path
+    # L'ancien index sert encore les requêtes en cours, puis est fermé
+    assert closed == []
+    assert await blue.search("chat", mode="lexical") == {"query": "chat", "result": []}
+    assert registry.get_vector_service() is green
+    assert closed == [blue]
+
+    await registry.aclose()
+
+
+def test_app_lifespan_hands_out_shared_services():
+    from back_end.app.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/").json() == {"status": "API is running"}
+        registry = app.state.registry
+        assert registry.get_vector_service() is registry.get_vector_service()
+
+    assert registry.http_client.is_closed
+
+
+def wait_until_ready(client, attempts=50):
+    for _ in range(attempts):
+        response = client.get("/readyz")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.1)
+    return response
+
+
+def test_readyz_reports_warmup_phases():
+    from back_end.app.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        response = wait_until_ready(client)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["documents"] == 0
+    assert {"registry", "vector_service", "index"} <= set(body["phases_ms"])
+
+
+def test_readyz_is_unavailable_during_warmup(monkeypatch):
+    from back_end.app.main import app
+
+    monkeypatch.setattr(app.state, "startup", StartupState(), raising=False)
+    response = TestClient(app).get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+
+def test_importing_the_app_defers_heavy_imports():
+    code = (
+        "import sys, back_end.app.main; "
+        "print('chromadb' in sys.modules, 'mistralai' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+        cwd=Path(__file__).resolve().parents[2],
+    )
+    assert result.stdout.split() == ["False", "False"]
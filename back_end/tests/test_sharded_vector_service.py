@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from back_end.app.services.document_indexer import DocumentIndexingService
+from back_end.app.services.sharded_vector_service import ShardedVectorService
+
+
+def meta(source_file):
+    return {"source_file": source_file}
+
+
+@pytest.fixture
+def sharded(tmp_path, fake_encoder):
+    index = ShardedVectorService("docs", str(tmp_path / "index"), encoder=fake_encoder)
+    yield index
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_domain_shards_are_searched_together(sharded, fake_encoder, tmp_path):
+    await sharded.upsert_batch(
+        ["Mistral chat API", "Python embeddings client", "Agents pricing"],
+        ["chat", "embeddings", "pricing"],
+        metadatas=[meta("docs.mistral.ai/chat.md"), meta("sdk.example.com/python.md"), meta("docs.mistral.ai/agents.md")],
+    )
+    calls = fake_encoder.calls
+
+    results = await sharded.search("python embeddings and chat", n_results=2, mode="vector")
+
+    assert sorted(sharded.shards) == ["docs.mistral.ai", "sdk.example.com"]
+    assert (tmp_path / "index" / "shard-sdk.example.com").is_dir()
+    assert [r["id"] for r in results["result"]] == ["embeddings", "chat"]
+    distances = [r["distance"] for r in results["result"]]
+    assert distances == sorted(distances)
+    # Requête encodée une seule fois pour tous les shards
+    assert fake_encoder.calls == calls + 1
+
+
+@pytest.mark.asyncio
+async def test_shard_is_cleared_alone_and_reopened(sharded, tmp_path, fake_encoder):
+    await sharded.upsert_batch(
+        ["Mistral chat API", "Python embeddings client"],
+        ["chat", "embeddings"],
+        metadatas=[meta("docs.mistral.ai/chat.md"), meta("sdk.example.com/python.md")],
+    )
+
+    assert await sharded.clear_shard("docs.mistral.ai") == 1
+    assert sharded.shards["sdk.example.com"].collection.count() == 1
+
+    reopened = ShardedVectorService("docs", str(tmp_path / "index"), encoder=fake_encoder)
+    assert sorted(reopened.shards) == ["docs.mistral.ai", "sdk.example.com"]
+    reopened.close()
+
+
+def test_hash_strategy_keeps_a_file_in_one_shard(tmp_path, fake_encoder):
+    index = ShardedVectorService("docs", str(tmp_path), strategy="hash", num_shards=3, encoder=fake_encoder)
+
+    assert len(index.shards) == 3
+    assert index.shard_name("a/b.md") == index.shard_name("a\\b.md") in index.shards
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_indexer_rebuilds_one_shard(tmp_path, monkeypatch, sharded):
+    monkeypatch.chdir(tmp_path)
+    section = "Mistral chat and python embeddings are documented here in detail. " * 3
+    for domain in ("docs.mistral.ai", "sdk.example.com"):
+        root = Path("data/scraping") / domain
+        root.mkdir(parents=True)
+        (root / "index.md").write_text(f"# Home\n\n## Intro\n\n{section}\n", encoding="utf-8")
+    indexer = DocumentIndexingService(vector_service=sharded, data_dir="data/scraping")
+    await indexer.index_all_documents()
+
+    stats = await indexer.index_all_documents(force_reindex=True, shard="sdk.example.com")
+
+    assert stats["total_files"] == stats["indexed_files"] == 1
+    assert sharded.shards["sdk.example.com"].collection.count() == 2
+    assert sharded.shards["docs.mistral.ai"].collection.count() == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from back_end.app.services.snapshot import SnapshotError, read_snapshot
+from back_end.app.services.vector_service import VectorService
+
+
+@pytest.fixture
+async def populated(vector_service):
+    await vector_service.upsert_batch(
+        ["Mistral chat API", "Python embeddings client", "Agents pricing"],
+        ["chat", "embeddings", "pricing"],
+        metadatas=[{"language": "en"}, {"language": "en"}, None],
+    )
+    return vector_service
+
+
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip_without_embedding_calls(populated, tmp_path, fake_encoder):
+    path = str(tmp_path / "index.snap")
+    summary = await populated.export_snapshot(path, extra={"note": "x"})
+    assert summary["count"] == 3
+
+    replica = VectorService("replica", str(tmp_path / "replica"), encoder=fake_encoder, backend="numpy")
+    calls = fake_encoder.calls
+    extra = await replica.load_snapshot(path)
+
+    assert fake_encoder.calls == calls
+    assert extra["note"] == "x"
+    assert replica.collection.count() == 3
+    assert (await replica.get_document("pricing"))["text"] == "Agents pricing"
+    expected = await populated.search("python embeddings", n_results=3, mode="vector")
+    actual = await replica.search("python embeddings", n_results=3, mode="vector")
+    assert [r["id"] for r in actual["result"]] == [r["id"] for r in expected["result"]]
+    replica.close()
+
+
+@pytest.mark.asyncio
+async def test_float16_snapshot_is_smaller(populated, tmp_path):
+    full = await populated.export_snapshot(str(tmp_path / "full.snap"))
+    half = await populated.export_snapshot(str(tmp_path / "half.snap"), dtype="float16")
+
+    assert half["bytes"] < full["bytes"]
+    assert read_snapshot(str(tmp_path / "half.snap")).embeddings.dtype.name == "float16"
+
+
+@pytest.mark.asyncio
+async def test_corrupted_snapshot_is_rejected(populated, tmp_path):
+    path = tmp_path / "index.snap"
+    await populated.export_snapshot(str(path))
+    data = bytearray(path.read_bytes())
+    data[100] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
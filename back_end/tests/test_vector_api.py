@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from back_end.app.api import vector_api
+
+
+@pytest.fixture
+def client(vector_service):
+    app = FastAPI()
+    app.include_router(vector_api.router)
+    app.dependency_overrides[vector_api.get_db] = lambda: vector_service
+    return TestClient(app)
+
+
+def test_batch_endpoint_uses_one_embedding_call(client, vector_service, fake_encoder):
+    response = client.post(
+        "/vector/documents/batch", json={"texts": ["Mistral chat", "Agents", "Python"]}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()["ids"]) == 3
+    assert fake_encoder.calls == 1
+    assert vector_service.collection.count() == 3
+
+
+def test_stream_endpoint_commits_windows_and_reports_ids(client, vector_service, monkeypatch):
+    monkeypatch.setattr(vector_api, "STREAM_WINDOW_SIZE", 2)
+    body = "\n".join([
+        json.dumps({"text": "Mistral chat", "id": "first"}),
+        "not json",
+        json.dumps({"text": "Agents pricing"}),
+        "",
+        json.dumps({"text": "Python embeddings"}),
+    ])
+
+    response = client.post(
+        "/vector/documents/stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["line"] for record in records] == [2, 1, 3, 5]
+    assert "error" in records[0]
+    assert records[1]["id"] == "first"
+    assert vector_service.collection.count() == 3
+
+
+def test_stream_endpoint_rejects_bad_ids_per_line(client, vector_service):
+    body = "\n".join([
+        json.dumps({"text": "Mistral chat", "id": "same"}),
+        json.dumps({"text": "Agents", "id": "same"}),
+        json.dumps({"text": "Python", "id": 42}),
+        json.dumps({"text": "Pricing"}),
+    ])
+
+    response = client.post("/vector/documents/stream", content=body)
+
+    records = {record["line"]: record for record in map(json.loads, response.text.splitlines())}
+    assert "error" in records[2] and "error" in records[3]
+    assert records[1]["id"] == "same"
+    assert "id" in records[4]
+    assert vector_service.collection.count() == 2
+
+
+def test_stream_endpoint_bounds_line_length(client, vector_service, monkeypatch):
+    monkeypatch.setattr(vector_api, "STREAM_MAX_LINE_BYTES", 64)
+    body = json.dumps({"text": "x" * 200}) + "\n" + json.dumps({"text": "Mistral chat"})
+
+    response = client.post("/vector/documents/stream", content=body)
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0] == {"line": 1, "error": "line longer than 64 bytes"}
+    assert records[1]["line"] == 2 and "id" in records[1]
+
+
+def test_batch_endpoint_accepts_empty_list(client):
+    response = client.post("/vector/documents/batch", json={"texts": []})
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "ids": []}
+
+
+def test_batch_search_endpoint(client, vector_service, fake_encoder):
+    client.post("/vector/documents/batch", json={"texts": ["Mistral chat", "Agents pricing"]})
+
+    response = client.post("/vector/search/batch", json={
+        "queries": [{"query": "chat", "n_results": 1}, {"query": "pricing", "n_results": 2}],
+    })
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["result"][0]["text"] for r in results] == ["Mistral chat", "Agents pricing"]
+    assert len(results[1]["result"]) == 2
+    assert fake_encoder.calls == 2
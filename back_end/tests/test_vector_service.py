@@ -0,0 +1,288 @@
+import asyncio
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from back_end.app.services.vector_service import Encoder, VectorService
+
+
+def make_response(embeddings):
+    response = MagicMock()
+    response.data = [MagicMock(embedding=embedding) for embedding in embeddings]
+    return response
+
+
+def make_encoder(**kwargs):
+    kwargs.setdefault("backoff", 0)
+    encoder = Encoder(api_key="test-key", use_cache=False, **kwargs)
+    encoder.client = MagicMock()
+    encoder.client.embeddings.create_async = AsyncMock(
+        side_effect=lambda model, inputs: make_response(
+            [[float(text)] for text in inputs]
+        )
+    )
+    return encoder
+
+
+def test_split_batches_respects_item_and_token_limits():
+    encoder = make_encoder(max_batch_size=3, max_batch_tokens=10)
+    texts = ["a" * 3, "b" * 3, "c" * 3, "d" * 3, "e" * 27, "f"]
+
+    batches = encoder.split_batches(texts)
+
+    assert batches == [texts[0:3], texts[3:4], texts[4:5], texts[5:6]]
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_keeps_order_across_sub_batches():
+    encoder = make_encoder(max_batch_size=2)
+    texts = [str(i) for i in range(7)]
+
+    embeddings = await encoder.encode_batch(texts)
+
+    assert embeddings == [[float(i)] for i in range(7)]
+    assert encoder.client.embeddings.create_async.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_bounds_concurrency():
+    encoder = make_encoder(max_batch_size=1, max_concurrency=2)
+    in_flight = 0
+    peak = 0
+
+    async def create_async(model, inputs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_response([[float(text)] for text in inputs])
+
+    encoder.client.embeddings.create_async = create_async
+    await encoder.encode_batch([str(i) for i in range(6)])
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_retries_only_failed_sub_batch():
+    encoder = make_encoder(max_batch_size=2)
+    calls = []
+    failed = False
+
+    async def create_async(model, inputs):
+        nonlocal failed
+        calls.append(list(inputs))
+        if inputs == ["2", "3"] and not failed:
+            failed = True
+            raise httpx.ConnectError("boom")
+        return make_response([[float(text)] for text in inputs])
+
+    encoder.client.embeddings.create_async = create_async
+    embeddings = await encoder.encode_batch(["0", "1", "2", "3"])
+
+    assert embeddings == [[0.0], [1.0], [2.0], [3.0]]
+    assert calls.count(["0", "1"]) == 1
+    assert calls.count(["2", "3"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_add_batch_and_search_through_executor(vector_service):
+    await vector_service.add_batch(
+        ["Mistral chat API", "Python embeddings client", "Agents pricing"],
+        ["chat", "embeddings", "pricing"],
+    )
+
+    results = await vector_service.search("embeddings in python", n_results=2)
+
+    assert results["result"][0]["id"] == "embeddings"
+    assert vector_service.executor.metrics()["query"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_document(vector_service):
+    await vector_service.add("Mistral chat API", "doc")
+
+    assert await vector_service.update_document("doc", "Agents pricing")
+    assert not await vector_service.update_document("missing", "text")
+
+
+@pytest.mark.asyncio
+async def test_replace_documents_only_encodes_new_ids(vector_service, fake_encoder):
+    await vector_service.upsert_batch(["Mistral chat", "Agents"], ["a", "b"])
+    encoded = []
+    encode_batch = fake_encoder.encode_batch
+
+    async def spy(texts):
+        encoded.extend(texts)
+        return await encode_batch(texts)
+
+    fake_encoder.encode_batch = spy
+    await vector_service.replace_documents(
+        ["a", "b"], ["Agents", "Pricing"], ["b", "c"],
+        metadatas=[{"chunk_index": 0}, {"chunk_index": 1}],
+    )
+
+    stored = vector_service.collection.get(ids=["a", "b", "c"])
+    assert sorted(stored["ids"]) == ["b", "c"]
+    assert encoded == ["Pricing"]
+    # Le chunk conservé garde son embedding mais ses métadonnées suivent
+    assert vector_service.collection.get(ids=["b"])["metadatas"] == [{"chunk_index": 0}]
+
+
+@pytest.mark.asyncio
+async def test_delete_many(vector_service):
+    await vector_service.upsert_batch(["x", "y", "z"], ["1", "2", "3"])
+
+    assert await vector_service.delete_many(["1", "3"]) == 2
+    assert vector_service.collection.get()["ids"] == ["2"]
+    assert await vector_service.delete_many([]) == 0
+
+
+def sdk_error(status_code):
+    from mistralai import SDKError
+
+    return SDKError("error", httpx.Response(status_code, request=httpx.Request("POST", "http://x")))
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_does_not_retry_client_errors():
+    encoder = make_encoder(backoff=10)
+    encoder.client.embeddings.create_async = AsyncMock(side_effect=sdk_error(400))
+
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(encoder.encode_batch(["0"]), timeout=1)
+
+    assert encoder.client.embeddings.create_async.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_encode_batch_retries_rate_limits():
+    encoder = make_encoder(retries=3)
+    encoder.client.embeddings.create_async = AsyncMock(
+        side_effect=[sdk_error(429), sdk_error(503), make_response([[1.0]])]
+    )
+
+    assert await encoder.encode_batch(["1"]) == [[1.0]]
+
+
+@pytest.mark.asyncio
+async def test_get_and_delete_document_go_through_executor(vector_service):
+    await vector_service.add("Mistral chat API", "doc")
+
+    assert await vector_service.get_document("doc") == {"id": "doc", "text": "Mistral chat API"}
+    assert await vector_service.delete_document("doc")
+    assert await vector_service.get_document("doc") is None
+    assert not await vector_service.delete_document("doc")
+    assert vector_service.executor.metrics()["delete"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lexical_search_makes_no_embedding_call(vector_service, fake_encoder):
+    await vector_service.add_batch(
+        ["Mistral chat API", "Use mistral-embed for embeddings"], ["chat", "embed"]
+    )
+    calls = fake_encoder.calls
+
+    results = await vector_service.search("mistral-embed", n_results=2, mode="lexical")
+
+    assert results["result"][0]["id"] == "embed"
+    assert results["result"][0]["distance"] is None
+    assert fake_encoder.calls == calls
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_fuses_both_rankings(vector_service):
+    await vector_service.add_batch(
+        ["Python embeddings client", "Error code E1234 on chat", "Agents pricing"],
+        ["embeddings", "error", "pricing"],
+    )
+    await vector_service.delete_many(["pricing"])
+
+    results = await vector_service.search("E1234 python embeddings", n_results=3, mode="hybrid")
+
+    ids = [r["id"] for r in results["result"]]
+    assert set(ids) == {"embeddings", "error"}
+    assert all(r["score"] > 0 for r in results["result"])
+
+
+@pytest.mark.asyncio
+async def test_sync_lexical_index_backfills_existing_collection(tmp_path, fake_encoder):
+    path = str(tmp_path / "chroma")
+    service = VectorService("test", path, encoder=fake_encoder, use_lexical_index=False)
+    await service.add_batch(["Mistral chat API"], ["chat"])
+    service.close()
+
+    service = VectorService("test", path, encoder=fake_encoder)
+    assert await service.sync_lexical_index() == 1
+    assert await service.sync_lexical_index() == 0
+    assert (await service.search("chat", mode="lexical"))["result"][0]["id"] == "chat"
+    service.close()
+
+
+@pytest.mark.asyncio
+async def test_search_cache_skips_encoder_until_next_write(vector_service, fake_encoder):
+    await vector_service.add_batch(["Mistral chat API"], ["chat"])
+    await vector_service.search("Mistral chat", n_results=1)
+    calls = fake_encoder.calls
+
+    cached = await vector_service.search("  mistral CHAT ", n_results=1)
+
+    assert cached["result"][0]["id"] == "chat"
+    assert fake_encoder.calls == calls
+    assert vector_service.executor.metrics()["query"]["count"] == 1
+
+    await vector_service.add_batch(["Python embeddings client"], ["embeddings"])
+    await vector_service.search("Mistral chat", n_results=1)
+    assert fake_encoder.calls == calls + 2
+
+
+@pytest.mark.asyncio
+async def test_search_many_batches_embeddings_and_queries(vector_service, fake_encoder):
+    await vector_service.upsert_batch(
+        ["Mistral chat API", "Python embeddings client", "Agents pricing"],
+        ["chat", "embeddings", "pricing"],
+        metadatas=[{"language": "en"}, {"language": "en"}, {"language": "fr"}],
+    )
+    calls = fake_encoder.calls
+
+    results = await vector_service.search_many(
+        ["chat", "python embeddings", "agents"],
+        n_results=[1, 2, 3],
+        wheres=[None, None, {"language": "fr"}],
+    )
+
+    assert [r["query"] for r in results] == ["chat", "python embeddings", "agents"]
+    assert [r["result"][0]["id"] for r in results] == ["chat", "embeddings", "pricing"]
+    assert [len(r["result"]) for r in results] == [1, 2, 1]
+    assert fake_encoder.calls == calls + 1
+    # Une requête pour les deux recherches sans filtre, une pour le filtre "fr"
+    assert vector_service.executor.metrics()["query"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieve_context_returns_stitched_blocks(vector_service):
+    metadata = {"source_file": "chat.md", "section_header": "Chat"}
+    await vector_service.upsert_batch(
+        ["Mistral chat API basics. Use python to call it.", "Use python to call it. Chat streaming."],
+        ["chat-0", "chat-1"],
+        metadatas=[{**metadata, "chunk_index": 0}, {**metadata, "chunk_index": 1}],
+    )
+
+    context = await vector_service.retrieve_context("mistral chat python", n_results=2)
+
+    assert len(context["result"]) == 1
+    assert context["result"][0]["ids"] == ["chat-0", "chat-1"]
+    assert context["result"][0]["text"] == "Mistral chat API basics. Use python to call it. Chat streaming."
+
+
+@pytest.mark.asyncio
+async def test_warmup_loads_index_without_encoding(vector_service, fake_encoder):
+    assert await vector_service.warmup() == 0
+
+    await vector_service.upsert_batch(["Mistral chat", "Agents"], ["a", "b"])
+    calls = fake_encoder.calls
+
+    assert await vector_service.warmup() == 2
+    assert fake_encoder.calls == calls